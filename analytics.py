@@ -0,0 +1,297 @@
+"""Application lifecycle events and the placement funnel rollup.
+
+Every status change goes through :func:`transition_application`, which
+appends an ``ApplicationEvent`` in the caller's transaction. :func:`roll_up`
+folds events past its watermark, and late commits below it, into
+``FunnelRollup`` rows (one per day, job and status reached), and funnel and
+trend queries read only those rows.
+
+    flask rollup-funnel --backfill   # once, for applications older than the log
+"""
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, exists, func
+from extensions import db
+from models import ApplicationEvent, FunnelRollup, RollupGap, RollupState, Job, JobApplication
+from scheduler import scheduled
+
+FUNNEL_STATUSES = ('applied', 'shortlisted', 'interviewed', 'selected', 'rejected')
+GROUPS = {'department': FunnelRollup.department, 'company': FunnelRollup.company, 'job': FunnelRollup.job_id}
+INTERVALS = ('day', 'week', 'month')
+ROLLUP_NAME = 'funnel'
+
+
+def transition_application(application, status, actor_id=None, job=None):
+    """Move ``application`` to ``status`` and log the change; the caller commits.
+
+    A new (not yet flushed) application is logged as its submission.
+    Returns the event, or None when the status does not change.
+    """
+    state = inspect(application)
+    from_status = None if state.transient or state.pending else application.status
+    if from_status == status:
+        return None
+
+    job = job or application.job
+    now = datetime.utcnow()
+    if application.applied_at is None:
+        application.applied_at = now
+    application.status = status
+    event = ApplicationEvent(
+        application=application,
+        job_id=job.id,
+        department=job.department,
+        company=job.company,
+        from_status=from_status,
+        to_status=status,
+        actor_id=actor_id,
+        elapsed_seconds=(now - application.applied_at).total_seconds() if from_status else 0,
+        created_at=now
+    )
+    db.session.add(event)
+    return event
+
+
+def roll_up(batch_size=5000):
+    """Fold application events past the watermark into ``FunnelRollup``; return how many were folded.
+
+    Events are folded in id order. An id below the highest one folded may
+    still belong to a transaction that has not committed: the watermark
+    passes it, but records it as a ``RollupGap``. Each run first folds the
+    gaps whose events have committed since, so a slow transaction is counted
+    late rather than never. A gap still empty after ``ANALYTICS_GAP_SECONDS``
+    is taken for a rolled-back transaction and forgotten; an event that
+    commits later still is not counted.
+    """
+    folded = _fold_gaps()
+    events_table = ApplicationEvent.__table__
+    state_table = RollupState.__table__
+    gap_table = RollupGap.__table__
+
+    while True:
+        state = db.session.get(RollupState, ROLLUP_NAME)
+        if state is None:
+            db.session.execute(state_table.insert().values(name=ROLLUP_NAME, last_event_id=0))
+            watermark = 0
+        else:
+            watermark = state.last_event_id
+
+        events = db.session.execute(
+            db.select(*_EVENT_COLUMNS)
+            .where(events_table.c.id > watermark)
+            .order_by(events_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not events:
+            db.session.commit()
+            return folded
+
+        _fold(events)
+        now = datetime.utcnow()
+        expected = watermark + 1
+        gaps = []
+        for event in events:
+            gaps.extend(range(expected, event.id))
+            expected = event.id + 1
+        if gaps:
+            db.session.execute(gap_table.insert(), [
+                {'name': ROLLUP_NAME, 'event_id': event_id, 'found_at': now} for event_id in gaps
+            ])
+
+        # Only advance from the watermark we read: a concurrent rollup fails here
+        moved = db.session.execute(
+            state_table.update()
+            .where(state_table.c.name == ROLLUP_NAME, state_table.c.last_event_id == watermark)
+            .values(last_event_id=events[-1].id, updated_at=now)
+        )
+        if moved.rowcount != 1:
+            db.session.rollback()
+            raise RuntimeError('Another funnel rollup advanced the watermark concurrently')
+        db.session.commit()
+        folded += len(events)
+        if len(events) < batch_size:
+            return folded
+
+
+def _fold_gaps():
+    """Fold the events that have committed into gaps; forget expired gaps; return how many were folded"""
+    gap_table = RollupGap.__table__
+    events_table = ApplicationEvent.__table__
+    gaps = gap_table.c.name == ROLLUP_NAME
+    events = db.session.execute(
+        db.select(*_EVENT_COLUMNS)
+        .where(events_table.c.id.in_(db.select(gap_table.c.event_id).where(gaps)))
+        .order_by(events_table.c.id)
+    ).all()
+    if events:
+        _fold(events)
+        # Delete only the gaps we folded: a concurrent rollup fails here
+        closed = db.session.execute(
+            gap_table.delete().where(gaps, gap_table.c.event_id.in_([event.id for event in events]))
+        )
+        if closed.rowcount != len(events):
+            db.session.rollback()
+            raise RuntimeError('Another funnel rollup folded the same events concurrently')
+
+    expired = datetime.utcnow() - timedelta(seconds=current_app.config['ANALYTICS_GAP_SECONDS'])
+    db.session.execute(gap_table.delete().where(gaps, gap_table.c.found_at < expired))
+    db.session.commit()
+    return len(events)
+
+
+_EVENT_COLUMNS = tuple(ApplicationEvent.__table__.c[name] for name in (
+    'id', 'job_id', 'department', 'company', 'to_status', 'elapsed_seconds', 'created_at'
+))
+
+
+def _fold(events):
+    rollup = FunnelRollup.__table__
+    buckets = {}
+    for event in events:
+        key = (event.created_at.date(), event.job_id, event.to_status)
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = [event.department, event.company, 1, event.elapsed_seconds]
+        else:
+            bucket[2] += 1
+            bucket[3] += event.elapsed_seconds
+
+    for (day, job_id, status), (department, company, count, elapsed) in buckets.items():
+        result = db.session.execute(
+            rollup.update()
+            .where(rollup.c.day == day, rollup.c.job_id == job_id, rollup.c.status == status)
+            .values(count=rollup.c.count + count, elapsed_seconds=rollup.c.elapsed_seconds + elapsed)
+        )
+        if result.rowcount == 0:
+            db.session.execute(rollup.insert().values(
+                day=day, job_id=job_id, status=status, department=department, company=company,
+                count=count, elapsed_seconds=elapsed
+            ))
+
+
+def backfill_events(batch_size=5000):
+    """Log the current status of applications that predate the event log; return how many.
+
+    Applications are read a page of ``batch_size`` at a time, in id order,
+    and each page's events are inserted and committed before the next.
+    """
+    application = JobApplication.__table__
+    events_table = ApplicationEvent.__table__
+    query = db.select(application.c.id, application.c.job_id, application.c.status, application.c.applied_at,
+                      application.c.updated_at, application.c.shortlisted_by, Job.department, Job.company) \
+        .join(Job, Job.id == application.c.job_id) \
+        .where(~exists().where(events_table.c.application_id == application.c.id)) \
+        .order_by(application.c.id) \
+        .limit(batch_size)
+
+    backfilled = 0
+    after = None
+    while True:
+        page = query.where(application.c.id > after) if after is not None else query
+        rows = db.session.execute(page).all()
+        if not rows:
+            return backfilled
+        _log_current_status(rows, events_table)
+        db.session.commit()
+        backfilled += len(rows)
+        after = rows[-1].id
+
+
+def _log_current_status(rows, events_table):
+    events = []
+    for row in rows:
+        applied_at = row.applied_at or datetime.utcnow()
+        common = {'application_id': row.id, 'job_id': row.job_id, 'department': row.department,
+                  'company': row.company}
+        events.append(dict(common, from_status=None, to_status='applied', actor_id=None,
+                           elapsed_seconds=0, created_at=applied_at))
+        if row.status and row.status != 'applied':
+            changed_at = max(row.updated_at or applied_at, applied_at)
+            events.append(dict(common, from_status='applied', to_status=row.status, actor_id=row.shortlisted_by,
+                               elapsed_seconds=(changed_at - applied_at).total_seconds(), created_at=changed_at))
+
+    # Event ids follow time within the page
+    events.sort(key=lambda event: event['created_at'])
+    db.session.execute(events_table.insert(), events)
+
+
+def _period(day, interval):
+    if interval == 'day':
+        return day.isoformat()
+    if interval == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    return day.strftime('%Y-%m')
+
+
+def funnel(group_by='department', interval=None, start=None, end=None, **filters):
+    """Funnel counts per ``group_by`` key (and ``interval`` period) from the rollup.
+
+    ``filters`` restrict rollup columns, e.g. ``department='CSE'``.
+    """
+    key_column = GROUPS[group_by]
+    columns = [key_column, FunnelRollup.status]
+    if interval:
+        columns.insert(1, FunnelRollup.day)
+    query = db.select(*columns, func.sum(FunnelRollup.count), func.sum(FunnelRollup.elapsed_seconds)) \
+        .group_by(*columns)
+    for name, value in filters.items():
+        query = query.where(getattr(FunnelRollup, name) == value)
+    if start:
+        query = query.where(FunnelRollup.day >= start)
+    if end:
+        query = query.where(FunnelRollup.day <= end)
+
+    groups = {}
+    for row in db.session.execute(query):
+        if interval:
+            key, day, status, count, elapsed = row
+            group = (key, _period(day, interval))
+        else:
+            key, status, count, elapsed = row
+            group = (key, None)
+        totals = groups.setdefault(group, {}).setdefault(status, [0, 0.0])
+        totals[0] += count
+        totals[1] += elapsed
+
+    results = []
+    for (key, period), statuses in sorted(groups.items(), key=lambda item: (str(item[0][0]), item[0][1] or '')):
+        applied = statuses.get('applied', [0, 0.0])[0]
+        entry = {
+            group_by: key,
+            'counts': {status: statuses.get(status, [0])[0] for status in FUNNEL_STATUSES},
+            'conversion': {
+                status: round(statuses[status][0] / applied, 4)
+                for status in FUNNEL_STATUSES[1:] if status in statuses and applied
+            },
+            'avg_days_to': {
+                status: round(statuses[status][1] / statuses[status][0] / 86400, 2)
+                for status in FUNNEL_STATUSES[1:] if status in statuses and statuses[status][0]
+            },
+        }
+        if interval:
+            entry['period'] = period
+        results.append(entry)
+    return results
+
+
+def rolled_up_at():
+    state = db.session.get(RollupState, ROLLUP_NAME)
+    return state.updated_at if state else None
+
+
+@scheduled('FUNNEL_ROLLUP_INTERVAL')
+def rollup_funnel_task():
+    return f'{roll_up()} events rolled up'
+
+
+@click.command('rollup-funnel')
+@click.option('--backfill', is_flag=True, help='First log applications that have no events yet.')
+@click.option('--batch-size', default=5000, show_default=True)
+@with_appcontext
+def rollup_funnel_command(backfill, batch_size):
+    """Fold new application events into the placement funnel rollup."""
+    if backfill:
+        click.echo(f'Backfilled events for {backfill_events(batch_size)} applications')
+    click.echo(f'Rolled up {roll_up(batch_size)} events')
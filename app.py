@@ -1,56 +1,85 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from flask_socketio import SocketIO, emit, join_room, leave_room
-from flask_mail import Mail, Message
-from flask_cors import CORS
-from datetime import datetime, timedelta
-import os
-from werkzeug.utils import secure_filename
-import uuid
-import json
-
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = 'futuremesh_secret_key_2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///futuremesh.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = 'futuremesh_jwt_secret_2024'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Email configuration
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = 'futuremesh@example.com'
-app.config['MAIL_PASSWORD'] = 'your_app_password'
-
-# Initialize extensions
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
-mail = Mail(app)
-CORS(app)
-
-# Create upload directories
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'resumes'), exist_ok=True)
-os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'projects'), exist_ok=True)
-
-# Import routes after app initialization
-from routes import *
-from models import *
-from socket_events import *
+"""FutureMesh application factory.
+
+    flask init-db                        # create the tables and the default super admin
+    python app.py                        # development server, with the scheduler and outbox dispatcher
+    gunicorn -k eventlet -w 1 'app:create_app()'
+    flask run-scheduler                  # alongside gunicorn: periodic maintenance
+    flask dispatch-outbox                # alongside gunicorn: real-time events; needs SOCKETIO_MESSAGE_QUEUE
+"""
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from config import Config
+from extensions import db, bcrypt, jwt, socketio, mail, cors
+from json_provider import JSONProvider
+import compression
+import db_routing
+import outbox
+import scheduler
+
+
+def create_app(config=None):
+    """Build an application; ``config`` is a mapping or object overriding ``Config``"""
+    app = Flask(__name__)
+    app.json = JSONProvider(app)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    db_routing.configure(app)
+    db.init_app(app)
+    bcrypt.init_app(app)
+    jwt.init_app(app)
+    mail.init_app(app)
+    cors.init_app(app)
+    compression.init_app(app)
+
+    # Imported here rather than at module level: they register models, views,
+    # socket handlers and scheduled tasks on the extensions above
+    import routes
+    import socket_events
+    import metrics
+    import analytics
+    import job_expiry
+    import notification_retention
+    import chat_archive
+    import delivery
+    import mentor_recommendations
+    import user_import
+
+    metrics.init_app(app)
+    app.register_blueprint(routes.pages)
+    app.register_blueprint(routes.api)
+    socketio.init_app(app, async_mode=app.config['SOCKETIO_ASYNC_MODE'],
+                      cors_allowed_origins=app.config['SOCKETIO_CORS_ALLOWED_ORIGINS'],
+                      message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
+
+    for command in (init_db_command, analytics.rollup_funnel_command, scheduler.run_scheduler_command,
+                    user_import.import_users_command, notification_retention.compact_notifications_command,
+                    chat_archive.archive_chats_command, mentor_recommendations.recommend_mentors_command,
+                    db_routing.sync_replicas_command, outbox.dispatch_outbox_command):
+        app.cli.add_command(command)
+    return app
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables, the default super admin and missing unread counters."""
+    from models import create_default_admin
+    from notifications import backfill_counters
+    db.create_all()
+    create_default_admin()
+    backfill_counters()
+    click.echo('Database initialized')
+
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # Create default super admin if not exists
-        create_default_admin()
-    
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app = create_app()
+    if app.config['SCHEDULER_ENABLED']:
+        scheduler.start_background(app)
+    if app.config['OUTBOX_DISPATCHER_ENABLED']:
+        outbox.start_background(app)
+    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
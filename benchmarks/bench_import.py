@@ -0,0 +1,71 @@
+"""Compare registering users one by one against the bulk user import.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --users 2000 --rounds 12
+"""
+import argparse
+import os
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp(prefix='futuremesh-bench-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_db_dir, 'bench.db'))
+
+from app import create_app
+from extensions import db, bcrypt
+from models import User
+from user_import import import_users
+
+app = create_app()
+
+
+def rows(prefix, count):
+    for i in range(count):
+        yield i + 2, {
+            'email': '%s-%d@bench.local' % (prefix, i), 'first_name': 'Student', 'last_name': str(i),
+            'password': 'password-%d' % i, 'department': 'CSE', 'cgpa': '8.1', 'graduation_year': '2026'
+        }
+
+
+def register_each(prefix, count):
+    # What onboarding a cohort through /api/register costs per row
+    for _, row in rows(prefix, count):
+        if User.query.filter_by(email=row['email']).first():
+            continue
+        user = User(email=row['email'], first_name=row['first_name'], last_name=row['last_name'], role='student',
+                    department=row['department'], cgpa=float(row['cgpa']),
+                    graduation_year=int(row['graduation_year']))
+        user.set_password(row['password'])
+        db.session.add(user)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt log rounds')
+    parser.add_argument('--workers', type=int, help='hashing processes (default: CPU count)')
+    args = parser.parse_args()
+
+    app.config['BCRYPT_LOG_ROUNDS'] = bcrypt._log_rounds = args.rounds
+    with app.app_context():
+        db.create_all()
+
+        start = time.perf_counter()
+        register_each('single', args.users)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = import_users(rows('bulk', args.users), 'student', workers=args.workers)
+        bulk = time.perf_counter() - start
+        assert report['created'] == args.users, report['errors'][:5]
+
+    print('%-14s %10s %12s' % ('path', 'seconds', 'users/s'))
+    for name, seconds in (('register_each', single), ('import_users', bulk)):
+        print('%-14s %10.2f %12.0f' % (name, seconds, args.users / seconds))
+    print('speedup: %.1fx' % (single / bulk))
+
+
+if __name__ == '__main__':
+    main()
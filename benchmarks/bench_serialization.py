@@ -0,0 +1,130 @@
+"""Compare per-row ``to_dict`` + stdlib JSON against the row serializers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization --jobs 5000 --applications 50000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp(prefix='futuremesh-bench-')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_db_dir, 'bench.db'))
+
+from app import create_app
+from extensions import db
+from models import User, Job, JobApplication
+from principal import issue_token
+from serializers import job_serializer, application_serializer
+
+app = create_app()
+
+
+def seed(num_jobs, num_applications, seed_value=42):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    password_hash = 'x' * 60
+
+    users = [{
+        'id': 'admin', 'email': 'admin@bench.local', 'password_hash': password_hash,
+        'first_name': 'Bench', 'last_name': 'Admin', 'role': 'admin'
+    }, {
+        'id': 'hr', 'email': 'hr@bench.local', 'password_hash': password_hash,
+        'first_name': 'Bench', 'last_name': 'HR', 'role': 'hr'
+    }]
+    students = ['student-%d' % i for i in range(max(1, num_applications // 10))]
+    users.extend({
+        'id': student_id, 'email': '%s@bench.local' % student_id, 'password_hash': password_hash,
+        'first_name': 'Student', 'last_name': str(i), 'role': 'student', 'department': 'CSE'
+    } for i, student_id in enumerate(students))
+    db.session.execute(db.insert(User), users)
+
+    jobs = [{
+        'id': 'job-%d' % i, 'title': 'Engineer %d' % i, 'company': 'Company %d' % (i % 50),
+        'department': 'CSE', 'description': 'Description ' * 20, 'posted_by': 'hr',
+        'status': 'approved', 'skills_required': '["python", "sql"]', 'eligible_years': '[2025]',
+        'min_cgpa': 6.5, 'application_deadline': now + timedelta(days=30),
+        'created_at': now, 'updated_at': now
+    } for i in range(num_jobs)]
+    db.session.execute(db.insert(Job), jobs)
+
+    applications = [{
+        'id': 'app-%d' % i, 'job_id': 'job-%d' % rng.randrange(num_jobs),
+        'student_id': rng.choice(students), 'cover_letter': 'Cover letter ' * 10,
+        'status': 'applied', 'applied_at': now, 'updated_at': now
+    } for i in range(num_applications)]
+    db.session.execute(db.insert(JobApplication), applications)
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples) * 1000
+
+
+def legacy_jobs():
+    return json.dumps({'jobs': [job.to_dict() for job in Job.query.all()]})
+
+
+def legacy_applications():
+    return json.dumps({'applications': [application.to_dict() for application in JobApplication.query.all()]})
+
+
+def fast_jobs():
+    return app.json.dumps({'jobs': job_serializer.all(job_serializer.select())})
+
+
+def fast_applications():
+    return app.json.dumps({'applications': application_serializer.all(application_serializer.select())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--applications', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        seed(args.jobs, args.applications)
+        token = issue_token(db.session.get(User, 'admin'))
+
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+
+    def endpoint(path):
+        # Outside any app context, so each request gets a fresh session
+        def call():
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, response.status_code
+        return call
+
+    def in_context(fn):
+        def call():
+            with app.app_context():
+                fn()
+        return call
+
+    print('provider: %s' % type(app.json).__name__)
+    for name, before, after, route in (
+        ('get_jobs', legacy_jobs, fast_jobs, '/api/jobs'),
+        ('get_applications', legacy_applications, fast_applications, '/api/applications'),
+    ):
+        legacy_ms = timed(in_context(before), args.repeat)
+        fast_ms = timed(in_context(after), args.repeat)
+        route_ms = timed(endpoint(route), args.repeat)
+        print('%-18s to_dict+json %8.1f ms  rows+provider %8.1f ms  (%.1fx)  endpoint %8.1f ms' % (
+            name, legacy_ms, fast_ms, legacy_ms / fast_ms, route_ms
+        ))
+
+if __name__ == '__main__':
+    main()
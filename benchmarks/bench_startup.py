@@ -0,0 +1,105 @@
+"""Measure application cold start and the memory a forked worker adds.
+
+Each sample runs in a fresh interpreter: import ``app``, call
+``create_app()``, serve one request, then fork ``--workers`` children that
+each serve a request, the way ``gunicorn --preload`` forks workers from a
+built app. Private memory per child is what every extra worker costs.
+
+    python -m benchmarks.bench_startup --samples 5 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app()
+created = time.perf_counter()
+client = application.test_client()
+client.get('/metrics')
+served = time.perf_counter()
+
+
+def memory_kb(pid):
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            for line in rollup:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                    values[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return values
+
+
+children = []
+for _ in range(int(sys.argv[1])):
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        client.get('/metrics')
+        os.write(write_end, b'x')
+        time.sleep(30)
+        os._exit(0)
+    os.close(write_end)
+    os.read(read_end, 1)
+    children.append(pid)
+
+private = []
+for pid in children:
+    values = memory_kb(pid)
+    if values:
+        private.append(values['Private_Clean'] + values['Private_Dirty'])
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'worker_private_mb': sum(private) / len(private) / 1024 if private else None,
+    'modules': len(sys.modules),
+}))
+'''
+
+
+def sample(workers, env):
+    output = subprocess.check_output([sys.executable, '-W', 'ignore', '-c', CHILD, str(workers)],
+                                     cwd=REPO_ROOT, env=env, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--async-mode', help='SOCKETIO_ASYNC_MODE for the sampled processes')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='futuremesh-bench-'), 'bench.db'))
+    env['SCHEDULER_ENABLED'] = '0'
+    if args.async_mode:
+        env['SOCKETIO_ASYNC_MODE'] = args.async_mode
+
+    samples = [sample(args.workers, env) for _ in range(args.samples)]
+    for key in samples[0]:
+        values = [s[key] for s in samples if s[key] is not None]
+        if values:
+            print('%-18s median %10.1f  min %10.1f' % (key, statistics.median(values), min(values)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""Seeded synthetic data generator for benchmarks.
+
+Rows are bulk-inserted through Core ``INSERT`` statements in chunks, so
+millions of chat messages can be generated without building ORM objects.
+The same seed and scale always produce the same rows, with timestamps
+relative to the time of generation.
+"""
+import json
+import random
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+from extensions import bcrypt, db
+from analytics import roll_up
+from chat_archive import archive_chats
+from mentor_recommendations import recompute_all
+from models import User, Job, JobApplication, ApplicationEvent, ChatMessage, MentorshipRequest, Notification, \
+    NotificationCounter
+
+DEPARTMENTS = ['CSE', 'ECE', 'EEE', 'MECH', 'CIVIL', 'IT', 'CHEM', 'BIOTECH']
+SKILLS = ['python', 'java', 'sql', 'react', 'node', 'aws', 'docker', 'ml', 'c++', 'go',
+          'kotlin', 'figma', 'excel', 'matlab', 'autocad', 'embedded', 'vlsi', 'spark']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka',
+             'Cyberdyne', 'Soylent', 'Tyrell', 'Vandelay']
+APPLICATION_STATUSES = ['applied'] * 6 + ['shortlisted'] * 2 + ['interviewed', 'selected', 'rejected']
+# Statuses an application passes through to reach each status
+STATUS_PATHS = {
+    'applied': ('applied',),
+    'shortlisted': ('applied', 'shortlisted'),
+    'interviewed': ('applied', 'shortlisted', 'interviewed'),
+    'selected': ('applied', 'shortlisted', 'interviewed', 'selected'),
+    'rejected': ('applied', 'rejected'),
+}
+NOTIFICATION_TYPES = ['job_posted', 'job_approved', 'application_received', 'application_update',
+                      'mentorship_request', 'mentorship_response']
+
+# Every user row must carry the same keys for executemany
+USER_OPTIONAL_COLUMNS = ('company', 'designation', 'student_id', 'cgpa', 'graduation_year', 'skills',
+                         'experience_years', 'current_company', 'current_designation')
+
+PASSWORD = 'benchmark'
+CHUNK_SIZE = 10000
+
+
+@dataclass
+class Scale:
+    students: int = 2000
+    alumni: int = 400
+    hr: int = 40
+    jobs: int = 500
+    applications_per_student: int = 5
+    mentorship_requests: int = 2000
+    messages: int = 50000
+    notifications_per_user: int = 20
+
+    @classmethod
+    def preset(cls, name):
+        return PRESETS[name]()
+
+    def to_dict(self):
+        return asdict(self)
+
+
+PRESETS = {
+    'tiny': lambda: Scale(students=200, alumni=40, hr=5, jobs=50, mentorship_requests=200,
+                          messages=2000, notifications_per_user=5),
+    'small': Scale,
+    'medium': lambda: Scale(students=10000, alumni=2000, hr=100, jobs=1000,
+                            mentorship_requests=10000, messages=500000),
+    'large': lambda: Scale(students=50000, alumni=10000, hr=300, jobs=5000,
+                           mentorship_requests=50000, messages=5000000),
+}
+
+
+@dataclass
+class Dataset:
+    """Ids of the generated rows that benchmark cases pick from"""
+    users: dict
+    jobs: list
+    open_jobs: list  # approved and before their deadline
+    applications: list
+    mentorship_requests: list
+    pending_mentorship: list  # (request id, alumni id)
+    notifications: dict
+    conversations: list  # (student id, alumni id) pairs that exchanged messages
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(model, rows):
+    table = model.__table__
+    count = 0
+    for chunk in _chunks(rows):
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def generate(scale, seed=42, log=print):
+    """Populate the current app's database and return a :class:`Dataset`"""
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    password_hash = bcrypt.generate_password_hash(PASSWORD).decode('utf-8')
+
+    def stamp(max_days):
+        return now - timedelta(seconds=rng.randrange(max_days * 86400))
+
+    users = {'student': [], 'alumni': [], 'hr': [], 'hod': [], 'admin': [], 'super_admin': []}
+
+    def user_rows():
+        def make(role, index, department=None, **extra):
+            user_id = f'{role}-{index:07d}'
+            users[role].append(user_id)
+            row = dict.fromkeys(USER_OPTIONAL_COLUMNS)
+            row.update(extra)
+            row.update({
+                'id': user_id,
+                'email': f'{user_id}@bench.futuremesh.com',
+                'password_hash': password_hash,
+                'first_name': role.title(),
+                'last_name': str(index),
+                'role': role,
+                'department': department,
+                'is_active': True,
+                'is_verified': True,
+                'created_at': stamp(720),
+            })
+            return row
+
+        yield make('super_admin', 0)
+        yield make('admin', 0)
+        for i, department in enumerate(DEPARTMENTS):
+            yield make('hod', i, department)
+        for i in range(scale.hr):
+            company = COMPANIES[i % len(COMPANIES)]
+            yield make('hr', i, company=company, designation='Recruiter')
+        for i in range(scale.alumni):
+            yield make('alumni', i, rng.choice(DEPARTMENTS),
+                       current_company=rng.choice(COMPANIES),
+                       current_designation=rng.choice(['Engineer', 'Senior Engineer', 'Manager', 'Analyst']),
+                       experience_years=rng.randrange(1, 15),
+                       skills=json.dumps(rng.sample(SKILLS, 4)))
+        for i in range(scale.students):
+            yield make('student', i, rng.choice(DEPARTMENTS),
+                       student_id=f'S{i:07d}',
+                       cgpa=round(rng.uniform(5.0, 10.0), 2),
+                       graduation_year=rng.choice([2025, 2026, 2027, 2028]),
+                       skills=json.dumps(rng.sample(SKILLS, 3)))
+
+    log('users: %d' % _insert(User, user_rows()))
+
+    jobs = []
+    open_jobs = []
+    job_owners = {}  # job id -> (department, company)
+
+    def job_rows():
+        for i in range(scale.jobs):
+            job_id = f'job-{i:07d}'
+            jobs.append(job_id)
+            job_owners[job_id] = (rng.choice(DEPARTMENTS), rng.choice(COMPANIES))
+            created = stamp(365)
+            deadline = created + timedelta(days=rng.randrange(7, 90))
+            status = rng.choice(['approved'] * 4 + ['pending', 'rejected'])
+            if status == 'approved':
+                # As the expiry task leaves them
+                if deadline < now:
+                    status = 'expired'
+                else:
+                    open_jobs.append(job_id)
+            yield {
+                'id': job_id,
+                'title': f'Engineer {i}',
+                'company': job_owners[job_id][1],
+                'department': job_owners[job_id][0],
+                'description': 'Build and maintain services. ' * 8,
+                'requirements': 'Strong fundamentals.',
+                'location': rng.choice(['Bengaluru', 'Pune', 'Hyderabad', 'Remote']),
+                'job_type': rng.choice(['full-time', 'internship']),
+                'salary_min': 400000.0,
+                'salary_max': 1200000.0,
+                'experience_required': 0,
+                'skills_required': json.dumps(rng.sample(SKILLS, 3)),
+                'min_cgpa': rng.choice([6.0, 6.5, 7.0, 7.5]),
+                'eligible_years': json.dumps(rng.sample([2025, 2026, 2027, 2028], 2)),
+                'application_deadline': deadline,
+                'posted_by': rng.choice(users['hr']),
+                'status': status,
+                'created_at': created,
+                'updated_at': created,
+            }
+
+    log('jobs: %d' % _insert(Job, job_rows()))
+
+    applications = []
+    events = []
+
+    def application_rows():
+        for student_id in users['student']:
+            for job_id in rng.sample(jobs, min(scale.applications_per_student, len(jobs))):
+                application_id = f'app-{len(applications):08d}'
+                applications.append(application_id)
+                applied = stamp(180)
+                status = rng.choice(APPLICATION_STATUSES)
+                department, company = job_owners[job_id]
+                changed, previous = applied, None
+                for step in STATUS_PATHS[status]:
+                    if previous:
+                        changed += timedelta(seconds=rng.randrange(86400, 14 * 86400))
+                    events.append({
+                        'application_id': application_id, 'job_id': job_id, 'department': department,
+                        'company': company, 'from_status': previous, 'to_status': step, 'actor_id': None,
+                        'elapsed_seconds': (changed - applied).total_seconds(), 'created_at': changed,
+                    })
+                    previous = step
+                yield {
+                    'id': application_id,
+                    'job_id': job_id,
+                    'student_id': student_id,
+                    'cover_letter': 'I would like to apply for this role.',
+                    'status': status,
+                    'applied_at': applied,
+                    'updated_at': changed,
+                }
+
+    log('applications: %d' % _insert(JobApplication, application_rows()))
+    events.sort(key=lambda event: event['created_at'])
+    log('application events: %d' % _insert(ApplicationEvent, events))
+    log('funnel rollup: %d events' % roll_up(CHUNK_SIZE))
+
+    mentorship_requests = []
+    pending_mentorship = []
+
+    def mentorship_rows():
+        for i in range(scale.mentorship_requests):
+            request_id = f'mentor-{i:07d}'
+            mentorship_requests.append(request_id)
+            status = rng.choice(['pending', 'accepted', 'accepted', 'rejected'])
+            alumni_id = rng.choice(users['alumni'])
+            if status == 'pending':
+                pending_mentorship.append((request_id, alumni_id))
+            created = stamp(180)
+            yield {
+                'id': request_id,
+                'student_id': rng.choice(users['student']),
+                'alumni_id': alumni_id,
+                'message': 'Could you mentor me?',
+                'status': status,
+                'created_at': created,
+                'responded_at': None if status == 'pending' else created + timedelta(days=1),
+            }
+
+    log('mentorship requests: %d' % _insert(MentorshipRequest, mentorship_rows()))
+    started = time.perf_counter()
+    log('mentor recommendations: %d students in %.2fs' % (recompute_all(), time.perf_counter() - started))
+
+    conversations = [(rng.choice(users['student']), rng.choice(users['alumni']))
+                     for _ in range(max(1, scale.messages // 50))]
+
+    def message_rows():
+        for i in range(scale.messages):
+            student_id, alumni_id = rng.choice(conversations)
+            sender, receiver = (student_id, alumni_id) if rng.random() < 0.5 else (alumni_id, student_id)
+            yield {
+                'id': f'msg-{i:09d}',
+                'sender_id': sender,
+                'receiver_id': receiver,
+                'message': 'Hello, thanks for the help with the interview prep!',
+                'message_type': 'text',
+                'is_read': rng.random() < 0.9,
+                'created_at': stamp(365),
+            }
+
+    log('messages: %d' % _insert(ChatMessage, message_rows()))
+    log('messages archived: %d' % archive_chats())
+
+    notifications = {}
+    unread = {}
+
+    def notification_rows():
+        index = 0
+        for role in ('student', 'alumni', 'hod', 'hr', 'admin', 'super_admin'):
+            for user_id in users[role]:
+                for _ in range(scale.notifications_per_user):
+                    notification_id = f'notif-{index:09d}'
+                    notifications.setdefault(user_id, notification_id)
+                    index += 1
+                    is_read = rng.random() < 0.7
+                    unread[user_id] = unread.get(user_id, 0) + (not is_read)
+                    yield {
+                        'id': notification_id,
+                        'user_id': user_id,
+                        'title': 'Update',
+                        'message': 'Something happened on FutureMesh.',
+                        'type': rng.choice(NOTIFICATION_TYPES),
+                        'is_read': is_read,
+                        'created_at': stamp(365),
+                    }
+
+    log('notifications: %d' % _insert(Notification, notification_rows()))
+    _insert(NotificationCounter, ({'user_id': user_id, 'unread': count, 'updated_at': now}
+                                  for user_id, count in unread.items()))
+
+    return Dataset(users=users, jobs=jobs, open_jobs=open_jobs, applications=applications,
+                   mentorship_requests=mentorship_requests, pending_mentorship=pending_mentorship,
+                   notifications=notifications, conversations=conversations)
@@ -0,0 +1,330 @@
+"""Drive every ``/api/*`` route through the Flask test client and record
+per-role latency percentiles and query counts.
+
+Run from the repository root:
+
+    python -m benchmarks.run --scale small --output results.json
+    python -m benchmarks.run --scale large --students 50000 --messages 5000000
+    python -m benchmarks.run --compare before.json after.json
+
+Without ``--database`` a scratch SQLite file is generated; pass a database
+URL to benchmark Postgres instead.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Case = namedtuple('Case', 'method rule roles build')
+Sample = namedtuple('Sample', 'elapsed queries status')
+
+
+def _cycle(items, i):
+    return items[i % len(items)]
+
+
+def build_cases(data):
+    """One entry per API route; ``build(role, i)`` returns the request to send"""
+    users = data.users
+    everyone = ('student', 'alumni', 'hod', 'hr', 'admin', 'super_admin')
+
+    def as_role(path, body=None):
+        def build(role, i):
+            return {'user': _cycle(users[role][:50], i), 'path': path, 'json': body}
+        return build
+
+    def register(role, i):
+        return {'user': None, 'path': '/api/register', 'json': {
+            'email': f'bench-register-{time.time_ns()}@bench.futuremesh.com', 'password': 'benchmark',
+            'first_name': 'New', 'last_name': 'Student', 'role': 'student', 'department': 'CSE'
+        }}
+
+    def login(role, i):
+        return {'user': None, 'path': '/api/login', 'json': {
+            'email': f'{_cycle(users["student"], i)}@bench.futuremesh.com', 'password': 'benchmark'
+        }}
+
+    def create_job(role, i):
+        return {'user': _cycle(users['hr'], i), 'path': '/api/jobs', 'json': {
+            'title': f'Benchmark role {i}', 'company': 'Acme', 'department': 'CSE',
+            'description': 'Benchmark job', 'min_cgpa': 6.0, 'eligible_years': [2026],
+            'application_deadline': '2099-01-01'
+        }}
+
+    def approve_job(role, i):
+        return {'user': users[role][0], 'path': f'/api/jobs/{_cycle(data.jobs, i)}/approve'}
+
+    def apply_job(role, i):
+        # Walk students and jobs at different strides so pairs rarely repeat
+        student = _cycle(users['student'], i * 7 + 3)
+        return {'user': student, 'path': f'/api/jobs/{_cycle(data.open_jobs, i * 13 + 1)}/apply',
+                'json': {'cover_letter': 'Benchmark application'}}
+
+    def shortlist(role, i):
+        return {'user': _cycle(users['hod'], i), 'path': f'/api/applications/{_cycle(data.applications, i)}/shortlist'}
+
+    def request_mentorship(role, i):
+        return {'user': _cycle(users['student'], i * 3), 'path': '/api/mentorship-requests',
+                'json': {'alumni_id': _cycle(users['alumni'], i * 5 + 1), 'message': 'Benchmark request'}}
+
+    def respond_mentorship(role, i):
+        request_id, alumni_id = _cycle(data.pending_mentorship, i)
+        return {'user': alumni_id, 'path': f'/api/mentorship-requests/{request_id}/respond',
+                'json': {'status': 'accepted', 'response_message': 'Sure'}}
+
+    def read_notification(role, i):
+        user_id = _cycle(users[role][:50], i)
+        return {'user': user_id, 'path': f'/api/notifications/{data.notifications[user_id]}/read'}
+
+    def read_notifications(role, i):
+        user_id = _cycle(users[role][:50], i)
+        body = {'all': True} if i % 2 else {'ids': [data.notifications[user_id]]}
+        return {'user': user_id, 'path': '/api/notifications/read', 'json': body}
+
+    def chat_messages(role, i):
+        # Every other request asks for a page old enough to come from the archive
+        student_id, alumni_id = _cycle(data.conversations, i)
+        before = '' if i % 2 else '?before=' + quote(f'{datetime.utcnow() - timedelta(days=200):%Y-%m-%dT%H:%M:%S}|~')
+        return {'user': student_id, 'path': f'/api/chat/{alumni_id}/messages{before}'}
+
+    def upload(role, i):
+        return {'user': _cycle(users['student'], i), 'path': '/api/upload', 'data': {
+            'type': 'resume', 'file': (io.BytesIO(b'%PDF-1.4 benchmark'), f'resume-{i}.pdf')
+        }}
+
+    def import_users(role, i):
+        batch = time.time_ns()
+        lines = ['email,first_name,last_name,password,department,graduation_year']
+        lines += [f'bench-import-{batch}-{n}@bench.futuremesh.com,New,Student,benchmark,CSE,2026' for n in range(20)]
+        return {'user': users[role][0], 'path': '/api/admin/users/import', 'data': {
+            'role': 'student', 'file': (io.BytesIO('\n'.join(lines).encode()), f'cohort-{i}.csv')
+        }}
+
+    return [
+        Case('POST', '/api/register', (None,), register),
+        Case('POST', '/api/login', (None,), login),
+        Case('GET', '/api/profile', everyone, as_role('/api/profile')),
+        Case('PUT', '/api/profile', ('student', 'alumni'), as_role('/api/profile', {'bio': 'Benchmark bio'})),
+        Case('GET', '/api/jobs', everyone, as_role('/api/jobs')),
+        Case('POST', '/api/jobs', ('hr',), create_job),
+        Case('POST', '/api/jobs/<job_id>/approve', ('admin',), approve_job),
+        Case('POST', '/api/jobs/<job_id>/apply', ('student',), apply_job),
+        Case('GET', '/api/applications', everyone, as_role('/api/applications')),
+        Case('POST', '/api/applications/<app_id>/shortlist', ('hod',), shortlist),
+        Case('GET', '/api/hod/applications', ('hod',), as_role('/api/hod/applications')),
+        Case('GET', '/api/hod/applications?status=applied&min_cgpa=7.5&sort=-cgpa', ('hod',),
+             as_role('/api/hod/applications?status=applied&min_cgpa=7.5&sort=-cgpa')),
+        Case('GET', '/api/alumni', ('student',), as_role('/api/alumni')),
+        Case('GET', '/api/mentors/recommended', ('student',), as_role('/api/mentors/recommended')),
+        Case('POST', '/api/mentorship-requests', ('student',), request_mentorship),
+        Case('GET', '/api/mentorship-requests', everyone, as_role('/api/mentorship-requests')),
+        Case('POST', '/api/mentorship-requests/<req_id>/respond', ('alumni',), respond_mentorship),
+        Case('GET', '/api/notifications', everyone, as_role('/api/notifications')),
+        Case('POST', '/api/notifications/<notif_id>/read', ('student',), read_notification),
+        Case('POST', '/api/notifications/read', ('student', 'alumni'), read_notifications),
+        Case('GET', '/api/chat/<other_user_id>/messages', ('student',), chat_messages),
+        Case('GET', '/api/dashboard/stats', everyone, as_role('/api/dashboard/stats')),
+        Case('GET', '/api/dashboard/bootstrap', everyone, as_role('/api/dashboard/bootstrap')),
+        Case('GET', '/api/analytics/funnel', ('hod', 'hr', 'admin'), as_role('/api/analytics/funnel')),
+        Case('GET', '/api/analytics/funnel?group_by=company&interval=month', ('admin',),
+             as_role('/api/analytics/funnel?group_by=company&interval=month')),
+        Case('POST', '/api/admin/users/import', ('admin',), import_users),
+        Case('POST', '/api/upload', ('student',), upload),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(case, role, samples):
+    latencies = sorted(sample.elapsed * 1000 for sample in samples)
+    queries = [sample.queries for sample in samples]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+    return {
+        'method': case.method,
+        'route': case.rule,
+        'role': role or 'anonymous',
+        'requests': len(samples),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'statuses': statuses,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    # Imported here so DATABASE_URL is set before the app is created
+    from sqlalchemy import event
+    from app import create_app
+    from extensions import db
+    from models import User
+    from principal import issue_token
+    from benchmarks.datagen import Scale, generate
+
+    app = create_app()
+
+    scale = Scale.preset(args.scale)
+    for field in scale.to_dict():
+        override = getattr(args, field, None)
+        if override is not None:
+            setattr(scale, field, override)
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://', 1)[0],
+        'scale': scale.to_dict(),
+        'seed': args.seed,
+        'iterations': args.iterations,
+        'results': [],
+    }
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        data = generate(scale, seed=args.seed, log=lambda line: print('  generated ' + line, file=sys.stderr))
+        results['generate_seconds'] = round(time.perf_counter() - started, 2)
+
+        query_count = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*_):
+            query_count[0] += 1
+
+    tokens = {}
+
+    def headers_for(user_id):
+        if user_id is None:
+            return {}
+        if user_id not in tokens:
+            with app.app_context():
+                tokens[user_id] = 'Bearer ' + issue_token(db.session.get(User, user_id))
+        return {'Authorization': tokens[user_id]}
+
+    cases = build_cases(data)
+    covered = {(case.method, case.rule) for case in cases}
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith('/api/'):
+            for method in rule.methods - {'HEAD', 'OPTIONS'}:
+                if (method, rule.rule) not in covered:
+                    print(f'warning: no benchmark case for {method} {rule.rule}', file=sys.stderr)
+
+    # Requests must run outside any app context: an active one would be
+    # reused by every request, sharing g and the database session.
+    client = app.test_client()
+    for case in cases:
+        if args.route and not any(pattern in case.rule for pattern in args.route):
+            continue
+        for role in case.roles:
+            samples = []
+            for i in range(args.warmup + args.iterations):
+                spec = case.build(role, i)
+                headers = headers_for(spec['user'])
+                query_count[0] = 0
+                start = time.perf_counter()
+                response = client.open(spec['path'], method=case.method, headers=headers,
+                                       json=spec.get('json'), data=spec.get('data'))
+                elapsed = time.perf_counter() - start
+                response.close()
+                if i >= args.warmup:
+                    samples.append(Sample(elapsed, query_count[0], response.status_code))
+            summary = summarize(case, role, samples)
+            results['results'].append(summary)
+            print('{method:6} {route:45} {role:12} p50 {p50_ms:9.2f}  p95 {p95_ms:9.2f}  '
+                  'p99 {p99_ms:9.2f} ms  queries {mean_queries:7.1f}  {statuses}'.format(**summary))
+
+    return results
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def key(result):
+        return result['method'], result['route'], result['role']
+
+    baseline = {key(result): result for result in before['results']}
+    print(f"{before.get('revision')} -> {after.get('revision')}")
+    for result in after['results']:
+        old = baseline.get(key(result))
+        if old is None:
+            print('{method:6} {route:45} {role:12} (new)'.format(**result))
+            continue
+        deltas = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            change = (result[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            deltas.append(f'{metric[:3]} {old[metric]:8.2f} -> {result[metric]:8.2f} ({change:+6.1f}%)')
+        deltas.append(f"queries {old['mean_queries']:.1f} -> {result['mean_queries']:.1f}")
+        print('{method:6} {route:45} {role:12} '.format(**result) + '  '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FutureMesh API benchmark suite')
+    parser.add_argument('--scale', choices=['tiny', 'small', 'medium', 'large'], default='small')
+    for field in ('students', 'alumni', 'hr', 'jobs', 'applications_per_student',
+                  'mentorship_requests', 'messages', 'notifications_per_user'):
+        parser.add_argument('--' + field.replace('_', '-'), dest=field, type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--route', action='append', help='only run routes containing this text')
+    parser.add_argument('--database', help='database URL to benchmark against; it is dropped and '
+                                           'recreated (default: scratch SQLite file)')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    sys.path.insert(0, REPO_ROOT)
+
+    workdir = tempfile.mkdtemp(prefix='futuremesh-bench-')
+    os.environ['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    # Uploads are written relative to the working directory
+    os.chdir(workdir)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'results written to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
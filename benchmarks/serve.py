@@ -0,0 +1,25 @@
+"""Run the Socket.IO server without the debugger or reloader, for load tests.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.serve --port 5055
+"""
+import argparse
+
+from app import create_app
+from extensions import socketio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    print(f'serving on {args.host}:{args.port} ({socketio.async_mode})', flush=True)
+    socketio.run(app, host=args.host, port=args.port, debug=False, use_reloader=False,
+                 log_output=False, allow_unsafe_werkzeug=True)
+
+
+if __name__ == '__main__':
+    main()
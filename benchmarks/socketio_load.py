@@ -0,0 +1,274 @@
+"""Socket.IO concurrency benchmark for chat and presence.
+
+Seeds a scratch database, starts ``benchmarks.serve`` in a subprocess and
+connects ``--clients`` python-socketio clients, paired up as student/alumni
+conversations. Each pair joins its chat, then for ``--duration`` seconds the
+senders script ``typing`` -> ``send_message`` -> ``typing`` traffic while the
+receivers answer with ``mark_messages_read``. Reports delivery latency of
+``new_message``, events per second, payload bytes received per event and
+server RSS per connection. ``--format msgpack`` has the clients negotiate
+the compact msgpack encoding (see wire_format.py).
+
+Requires the asyncio client extras:
+
+    pip install "python-socketio[asyncio_client]"
+    python -m benchmarks.socketio_load --clients 2000 --duration 30 --output socket.json
+
+Use ``--url`` to target an already running server instead. ``DATABASE_URL``
+must then point at that server's database, which is dropped and reseeded;
+memory is only reported when ``--server-pid`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.run import REPO_ROOT, git_revision, percentile
+
+
+def rss_kb(pid):
+    """Resident set size of ``pid`` in KiB (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def prepare(args):
+    """Seed users for ``args.clients`` connections and return (user_id, token, partner_id) triples"""
+    from app import create_app
+    from extensions import db
+    from models import User
+    from principal import issue_token
+    from benchmarks.datagen import Scale, generate
+
+    app = create_app()
+    pairs = max(1, args.clients // 2)
+    scale = Scale(students=pairs, alumni=pairs, hr=1, jobs=1, applications_per_student=0,
+                  mentorship_requests=0, messages=args.history, notifications_per_user=0)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        data = generate(scale, seed=args.seed, log=lambda line: print('  generated ' + line, file=sys.stderr))
+        sessions = []
+        for student_id, alumni_id in zip(data.users['student'], data.users['alumni']):
+            sessions.append((student_id, issue_token(db.session.get(User, student_id)), alumni_id))
+            sessions.append((alumni_id, issue_token(db.session.get(User, alumni_id)), student_id))
+    return sessions
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.received = 0
+        self.received_bytes = 0
+        self.sent = 0
+        self.messages_sent = 0
+        self.errors = 0
+        self.connect_failures = 0
+
+
+async def run_clients(args, url, sessions, server_pid):
+    import socketio
+    if args.format == 'msgpack':
+        import msgpack
+
+    stats = Stats()
+    clients = []
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    rng = random.Random(args.seed)
+
+    async def connect(user_id, token, partner_id):
+        sio = socketio.AsyncClient(reconnection=False)
+        sio.user_id, sio.token, sio.partner_id = user_id, token, partner_id
+        sio.joined = asyncio.Event()
+
+        async def on_any(event, data=None):
+            stats.received += 1
+            if isinstance(data, (bytes, bytearray)):
+                stats.received_bytes += len(data)
+                data = msgpack.unpackb(data)
+            else:
+                stats.received_bytes += len(json.dumps(data, separators=(',', ':')))
+            if event == 'new_message':
+                message = data if args.format == 'msgpack' else data['message']
+                if message['receiver_id'] == user_id and message['message'].startswith('bench|'):
+                    stats.latencies.append(time.perf_counter() - float(message['message'].split('|')[1]))
+                    if rng.random() < args.read_ratio:
+                        stats.sent += 1
+                        await sio.emit('mark_messages_read', {'token': token, 'sender_id': partner_id})
+            elif event == 'chat_history':
+                sio.joined.set()
+            elif event == 'error':
+                stats.errors += 1
+
+        sio.on('*', on_any)
+        async with semaphore:
+            try:
+                await sio.connect(url, auth={'token': token, 'format': args.format}, transports=['websocket'],
+                                  wait_timeout=30)
+            except Exception:
+                stats.connect_failures += 1
+                return
+        clients.append(sio)
+
+    async def converse(sio, deadline):
+        interval = 1.0 / args.rate
+        await asyncio.sleep(rng.random() * interval)
+        while time.perf_counter() < deadline:
+            typing = {'token': sio.token, 'other_user_id': sio.partner_id}
+            await sio.emit('typing', dict(typing, is_typing=True))
+            await sio.sleep(min(0.2, interval / 2))
+            await sio.emit('send_message', {
+                'token': sio.token, 'receiver_id': sio.partner_id,
+                'message': f'bench|{time.perf_counter()!r}|{sio.user_id}'
+            })
+            await sio.emit('typing', dict(typing, is_typing=False))
+            stats.sent += 3
+            stats.messages_sent += 1
+            await asyncio.sleep(interval)
+
+    baseline_rss = rss_kb(server_pid) if server_pid else None
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connect(*session) for session in sessions))
+    connect_seconds = time.perf_counter() - started
+
+    for sio in clients:
+        await sio.emit('join_chat', {'token': sio.token, 'other_user_id': sio.partner_id})
+    stats.sent += len(clients)
+    await asyncio.wait([asyncio.create_task(sio.joined.wait()) for sio in clients], timeout=60)
+    connected_rss = rss_kb(server_pid) if server_pid else None
+
+    # Only students send; alumni answer with read receipts
+    senders = [sio for sio in clients if sio.user_id.startswith('student-')]
+    received_before = stats.received
+    received_bytes_before = stats.received_bytes
+    phase_started = time.perf_counter()
+    await asyncio.gather(*(converse(sio, phase_started + args.duration) for sio in senders))
+    await asyncio.sleep(args.drain)
+    phase_seconds = time.perf_counter() - phase_started
+    peak_rss = rss_kb(server_pid) if server_pid else None
+
+    await asyncio.gather(*(sio.disconnect() for sio in clients), return_exceptions=True)
+
+    latencies = sorted(latency * 1000 for latency in stats.latencies)
+    connected = len(clients)
+    result = {
+        'clients': len(sessions),
+        'connected': connected,
+        'connect_failures': stats.connect_failures,
+        'connect_seconds': round(connect_seconds, 2),
+        'duration_seconds': round(phase_seconds, 2),
+        'messages_sent': stats.messages_sent,
+        'messages_delivered': len(latencies),
+        'delivery_ratio': round(len(latencies) / stats.messages_sent, 4) if stats.messages_sent else None,
+        'latency_p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+        'latency_p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+        'latency_p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+        'events_sent_per_second': round(stats.sent / phase_seconds, 1),
+        'events_received_per_second': round((stats.received - received_before) / phase_seconds, 1),
+        'payload_bytes_per_event': (
+            round((stats.received_bytes - received_bytes_before) / (stats.received - received_before), 1)
+            if stats.received > received_before else None
+        ),
+        'errors': stats.errors,
+        'server_rss_baseline_kb': baseline_rss,
+        'server_rss_connected_kb': connected_rss,
+        'server_rss_peak_kb': peak_rss,
+        'server_kb_per_connection': (
+            round((connected_rss - baseline_rss) / connected, 2)
+            if baseline_rss and connected_rss and connected else None
+        ),
+    }
+    return result
+
+
+def wait_for_server(url, process, timeout=30):
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError('server exited with status %s' % process.returncode)
+        try:
+            urllib.request.urlopen(url + '/socket.io/?EIO=4&transport=polling', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start within %ss' % timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FutureMesh Socket.IO load test')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of scripted chat traffic')
+    parser.add_argument('--rate', type=float, default=0.5, help='messages per second per sending client')
+    parser.add_argument('--read-ratio', type=float, default=0.5,
+                        help='fraction of received messages answered with mark_messages_read')
+    parser.add_argument('--history', type=int, default=0, help='pre-existing chat messages to seed')
+    parser.add_argument('--drain', type=float, default=2, help='seconds to wait for in-flight deliveries')
+    parser.add_argument('--connect-concurrency', type=int, default=100)
+    parser.add_argument('--format', choices=['json', 'msgpack'], default='json',
+                        help='wire format the clients negotiate')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--url', help='benchmark an already running, already seeded server')
+    parser.add_argument('--server-pid', type=int, help='pid of the --url server, for memory figures')
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    if args.url:
+        if 'DATABASE_URL' not in os.environ:
+            parser.error('--url requires DATABASE_URL to point at the server database')
+    else:
+        workdir = tempfile.mkdtemp(prefix='futuremesh-socket-bench-')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    sessions = prepare(args)
+
+    process = None
+    url = args.url
+    server_pid = args.server_pid
+    if not url:
+        url = f'http://127.0.0.1:{args.port}'
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.serve', '--port', str(args.port)],
+            cwd=REPO_ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL
+        )
+        server_pid = process.pid
+    try:
+        wait_for_server(url, process)
+        result = asyncio.run(run_clients(args, url, sessions, server_pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    result.update({
+        'revision': git_revision(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'rate': args.rate,
+        'format': args.format,
+    })
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
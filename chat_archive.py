@@ -0,0 +1,218 @@
+"""Cold storage for old chat messages.
+
+Messages older than ``CHAT_ARCHIVE_DAYS`` move out of ``ChatMessage`` into
+``ChatArchiveSegment`` rows: per-conversation runs of up to
+``CHAT_ARCHIVE_SEGMENT_SIZE`` messages stored as compressed JSON, indexed by
+conversation and time. The hot table then only holds recent traffic.
+Messages are archived oldest first, so a conversation's archived messages
+are always older than its hot ones and :func:`history` can read the hot
+table first and continue into the segments when a page runs past it.
+Archived messages count as read: they are stored with ``is_read`` set, and
+the unread message counts of the dashboards, counted from the hot table,
+drop them when they move.
+
+    flask archive-chats --days 180
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from extensions import db, socketio
+from models import User, ChatMessage, ChatArchiveSegment
+from scheduler import scheduled
+
+FIELDS = ('id', 'sender_id', 'receiver_id', 'message', 'message_type', 'file_path', 'is_read', 'created_at')
+SEGMENT_PAGE = 4  # Segments read per query while paging through the archive
+
+
+def conversation_key(user_id, other_user_id):
+    return f'{min(user_id, other_user_id)}_{max(user_id, other_user_id)}'
+
+
+def encode_cursor(created_at, message_id):
+    return f'{created_at.isoformat()}|{message_id}'
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` of a ``next_cursor``; raises ValueError when malformed"""
+    created_at, _, message_id = cursor.partition('|')
+    if not message_id:
+        raise ValueError('Invalid cursor')
+    return datetime.fromisoformat(created_at), message_id
+
+
+def _pack(messages):
+    return zlib.compress(json.dumps(messages, separators=(',', ':')).encode())
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def _pause():
+    # Yields to other green threads when run inside the server process
+    socketio.sleep(current_app.config['CHAT_ARCHIVE_PAUSE'])
+
+
+def _store(conversation, messages, open_segment, segment_size):
+    """Append ``messages`` (oldest first) to a conversation's segments"""
+    if open_segment is not None:
+        stored = _unpack(open_segment.payload)
+        room = segment_size - len(stored)
+        stored.extend(messages[:room])
+        messages = messages[room:]
+        open_segment.payload = _pack(stored)
+        open_segment.message_count = len(stored)
+        open_segment.end_at = datetime.fromisoformat(stored[-1][FIELDS.index('created_at')])
+
+    for start in range(0, len(messages), segment_size):
+        chunk = messages[start:start + segment_size]
+        db.session.add(ChatArchiveSegment(
+            conversation=conversation,
+            start_at=datetime.fromisoformat(chunk[0][FIELDS.index('created_at')]),
+            end_at=datetime.fromisoformat(chunk[-1][FIELDS.index('created_at')]),
+            message_count=len(chunk),
+            payload=_pack(chunk)
+        ))
+
+
+def archive_messages(cutoff, batch_size, segment_size):
+    """Move messages created before ``cutoff`` into archive segments; return how many were moved"""
+    columns = [getattr(ChatMessage, field) for field in FIELDS]
+    archived = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*columns)
+            .where(ChatMessage.created_at < cutoff)
+            .order_by(ChatMessage.created_at, ChatMessage.id)
+            .limit(batch_size)
+            # Not skip_locked: passing over a locked row would archive newer ones before it
+            .with_for_update()
+        ).all()
+        if not rows:
+            return archived
+
+        conversations = {}
+        for row in rows:
+            message = list(row)
+            message[FIELDS.index('is_read')] = True
+            message[-1] = row.created_at.isoformat()
+            conversations.setdefault(conversation_key(row.sender_id, row.receiver_id), []).append(message)
+
+        # Top up each conversation's newest segment before starting new ones
+        open_segments = {}
+        for segment in ChatArchiveSegment.query.filter(
+            ChatArchiveSegment.conversation.in_(conversations),
+            ChatArchiveSegment.message_count < segment_size
+        ).order_by(ChatArchiveSegment.end_at):
+            open_segments[segment.conversation] = segment
+
+        for conversation, messages in conversations.items():
+            _store(conversation, messages, open_segments.get(conversation), segment_size)
+
+        db.session.execute(
+            db.delete(ChatMessage).where(ChatMessage.id.in_([row.id for row in rows])),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        archived += len(rows)
+        if len(rows) < batch_size:
+            return archived
+        _pause()
+
+
+def _archived(conversation, boundary, needed):
+    """Yield archived messages of ``conversation`` older than ``boundary``, newest first"""
+    query = ChatArchiveSegment.query.filter(ChatArchiveSegment.conversation == conversation)
+    if boundary is not None:
+        query = query.filter(ChatArchiveSegment.start_at <= boundary[0])
+    query = query.order_by(ChatArchiveSegment.end_at.desc(), ChatArchiveSegment.id.desc())
+
+    offset = 0
+    while needed > 0:
+        segments = query.offset(offset).limit(SEGMENT_PAGE).all()
+        for segment in segments:
+            for values in reversed(_unpack(segment.payload)):
+                message = dict(zip(FIELDS, values))
+                created_at = datetime.fromisoformat(message['created_at'])
+                if boundary is None or (created_at, message['id']) < boundary:
+                    yield message, created_at
+                    needed -= 1
+                    if not needed:
+                        return
+        if len(segments) < SEGMENT_PAGE:
+            return
+        offset += SEGMENT_PAGE
+
+
+def history(user_id, other_user_id, before=None, limit=50):
+    """Return up to ``limit`` messages between two users, oldest first, and the cursor of the page before.
+
+    ``before`` is a ``next_cursor`` from an earlier page; the newest messages
+    are returned without one. The cursor is None once the start is reached.
+    """
+    boundary = decode_cursor(before) if before else None
+    query = ChatMessage.query.options(joinedload(ChatMessage.sender)).filter(
+        ((ChatMessage.sender_id == user_id) & (ChatMessage.receiver_id == other_user_id)) |
+        ((ChatMessage.sender_id == other_user_id) & (ChatMessage.receiver_id == user_id))
+    )
+    if boundary is not None:
+        query = query.filter(or_(
+            ChatMessage.created_at < boundary[0],
+            and_(ChatMessage.created_at == boundary[0], ChatMessage.id < boundary[1])
+        ))
+    hot = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+
+    page = [(message.to_dict(), message.created_at) for message in hot]
+    if len(page) <= limit:
+        # Ran past the hot table: continue into the archive
+        if hot:
+            boundary = (hot[-1].created_at, hot[-1].id)
+        archived = list(_archived(conversation_key(user_id, other_user_id), boundary, limit + 1 - len(page)))
+        if archived:
+            names = {
+                user.id: user.first_name + ' ' + user.last_name
+                for user in db.session.execute(
+                    db.select(User.id, User.first_name, User.last_name)
+                    .where(User.id.in_([user_id, other_user_id]))
+                )
+            }
+            for message, _ in archived:
+                message['sender_name'] = names.get(message['sender_id'])
+            page.extend(archived)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        message, created_at = page[-1]
+        next_cursor = encode_cursor(created_at, message['id'])
+    return [message for message, _ in reversed(page)], next_cursor
+
+
+def archive_chats(days=None, batch_size=None, segment_size=None):
+    config = current_app.config
+    days = days if days is not None else config['CHAT_ARCHIVE_DAYS']
+    if not days:
+        return 0
+    return archive_messages(datetime.utcnow() - timedelta(days=days),
+                            batch_size or config['CHAT_ARCHIVE_BATCH'],
+                            segment_size or config['CHAT_ARCHIVE_SEGMENT_SIZE'])
+
+
+@scheduled('CHAT_ARCHIVE_INTERVAL')
+def archive_chats_task():
+    return f'{archive_chats()} chat messages archived'
+
+
+@click.command('archive-chats')
+@click.option('--days', type=int, help='Archive messages older than this (0 archives nothing).')
+@click.option('--batch-size', type=int, help='Messages per transaction.')
+@click.option('--segment-size', type=int, help='Messages per archive segment.')
+@with_appcontext
+def archive_chats_command(days, batch_size, segment_size):
+    """Move old chat messages into compressed archive segments."""
+    click.echo(f'Archived {archive_chats(days, batch_size, segment_size)} chat messages')
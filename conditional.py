@@ -0,0 +1,166 @@
+"""Conditional GETs answered from per-table write counters (``DataVersion``).
+
+Each table's counter is bumped by the transaction writing to it, so the
+new data and its new ETag commit together, or not at all. Writes only
+record which tables they touched; the counters are bumped in one upsert just
+before the commit, so concurrent writers hold a counter row's lock for the
+commit alone, not for their whole transaction.
+
+A model setting ``__versioned__ = False`` is left out: nothing answers
+conditional GETs from its table. Columns listed in ``__version_ignore__``
+change without bumping their table.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from hashlib import sha1
+from itertools import chain
+from flask import request, current_app
+from flask_jwt_extended import get_jwt, get_jwt_header
+from flask_jwt_extended.exceptions import RevokedTokenError
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models import DataVersion, User
+from principal import current_principal
+
+
+def bump_versions(connection, tables):
+    """Increment the write counter of each table on the given connection"""
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    upsert = _UPSERTS.get(connection.dialect.name)
+    if upsert is not None:
+        # One statement for all the tables, whether or not they have a counter yet
+        statement = upsert(table).values([
+            {'name': name, 'version': 1, 'updated_at': now} for name in sorted(tables)
+        ])
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={'version': table.c.version + 1, 'updated_at': statement.excluded.updated_at}
+        ))
+        return
+    for name in sorted(tables):
+        result = connection.execute(
+            table.update().where(table.c.name == name).values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1, updated_at=now))
+
+
+_UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+
+def _changed(obj):
+    ignored = getattr(obj, '__version_ignore__', ())
+    return any(
+        attr.history.has_changes() for attr in inspect(obj).attrs if attr.key not in ignored
+    )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flushed_tables(session, flush_context):
+    dirty = (obj for obj in session.dirty if _changed(obj))
+    tables = {
+        obj.__table__.name for obj in chain(session.new, session.deleted, dirty)
+        if getattr(obj, '__versioned__', True)
+    }
+    if tables:
+        session.info.setdefault('written_tables', set()).update(tables)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _record_bulk_tables(orm_execute_state):
+    # Query.update()/delete() and bulk inserts bypass the flush
+    state = orm_execute_state
+    if (state.is_update or state.is_delete or state.is_insert) and state.bind_mapper is not None \
+            and getattr(state.bind_mapper.class_, '__versioned__', True):
+        state.session.info.setdefault('written_tables', set()).add(state.bind_mapper.local_table.name)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _bump_written_tables(session):
+    session.flush()
+    tables = session.info.pop('written_tables', None)
+    if tables:
+        bump_versions(session.connection(), tables)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_tables(session, previous_transaction):
+    session.info.pop('written_tables', None)
+
+
+def _principal_fingerprint(principal):
+    profile = principal.profile
+    if profile is None:
+        return str(principal.id)
+    return f'{principal.id}:{principal.role}:{principal.department}:{profile["cgpa"]}:{profile["graduation_year"]}'
+
+
+def conditional(*models):
+    """Answer conditional GETs from the write counters of ``models``.
+
+    The ETag combines the counters with the requesting user, so a request
+    carrying a matching ``If-None-Match`` (or a fresh ``If-Modified-Since``)
+    gets a 304 without running the view. Must be applied below ``jwt_required``.
+    The user's cached profile is reloaded first if the ``user`` counter has
+    moved past it, and a user deactivated since is refused.
+    """
+    tables = tuple(model.__tablename__ for model in models)
+    read = tuple(set(tables) | {User.__tablename__})
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            versions = {
+                name: (version, updated_at) for name, version, updated_at in db.session.execute(
+                    db.select(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+                    .where(DataVersion.name.in_(read))
+                )
+            }
+            principal = current_principal(versions.get(User.__tablename__, (0, None))[0])
+            if not principal.is_active:
+                raise RevokedTokenError(get_jwt_header(), get_jwt())
+            key = '|'.join(
+                [request.full_path, _principal_fingerprint(principal)] +
+                [f'{name}:{versions.get(name, (0, None))[0]}' for name in tables]
+            )
+            etag = sha1(key.encode('utf-8')).hexdigest()
+
+            # HTTP dates have second precision: only advertise Last-Modified
+            # once the second of the latest write has passed, so a later write
+            # can never share the advertised timestamp.
+            last_modified = max(
+                (versions[name][1] for name in tables if name in versions and versions[name][1]), default=None
+            )
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc) + timedelta(seconds=1)
+                if last_modified > datetime.now(timezone.utc):
+                    last_modified = None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(
+                    last_modified and request.if_modified_since and request.if_modified_since >= last_modified
+                )
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
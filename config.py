@@ -0,0 +1,97 @@
+"""Application settings. ``create_app(config)`` overrides any of them."""
+import os
+from datetime import timedelta
+
+
+class Config:
+    SECRET_KEY = 'futuremesh_secret_key_2024'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///futuremesh.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas for GET requests (see db_routing.py): a list, or comma-separated URLs
+    SQLALCHEMY_REPLICA_URIS = os.environ.get('DATABASE_REPLICA_URLS', '')
+    READ_YOUR_WRITES_SECONDS = 5  # A client reads from the primary for this long after it writes
+    JWT_SECRET_KEY = 'futuremesh_jwt_secret_2024'
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    PRINCIPAL_CACHE_TTL = 60  # Seconds a cached user profile may serve requests
+    PRINCIPAL_CACHE_SIZE = 10000
+    UPLOAD_FOLDER = 'static/uploads'
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    COMPRESS_MIN_SIZE = 1024  # Don't compress responses smaller than 1KB
+    DASHBOARD_BOOTSTRAP_WORKERS = 4  # Sections built in parallel, except on SQLite (see dashboard.py)
+
+    # Socket.IO server: eventlet when installed, unless set (e.g. 'threading')
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+    SOCKETIO_CORS_ALLOWED_ORIGINS = '*'
+    # e.g. redis://localhost:6379/0; required with several processes, so emits from any reach every socket
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+
+    # Instrumentation
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token required by /metrics
+    METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC') == '1'  # Serve /metrics to anyone when no token is set
+    QUERY_BUDGET_MODE = os.environ.get(
+        'QUERY_BUDGET_MODE', 'warn' if os.environ.get('FLASK_ENV') == 'development' else 'off'
+    )  # off, warn or raise
+    QUERY_REPEAT_THRESHOLD = 5  # Same statement this often in one request looks like an N+1
+
+    # Analytics
+    ANALYTICS_GAP_SECONDS = 3600  # How long an event id skipped by the funnel rollup may still commit
+
+    # Scheduled maintenance (see scheduler.py), intervals in seconds
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '1') == '1'
+    JOB_EXPIRY_INTERVAL = 300
+    JOB_EXPIRY_BATCH = 500  # Jobs expired per transaction
+    FUNNEL_ROLLUP_INTERVAL = 60
+
+    # Notification retention (see notification_retention.py); 0 disables a step
+    NOTIFICATION_RETENTION_DAYS = 90  # Read notifications older than this are deleted
+    NOTIFICATION_COLLAPSE_DAYS = 30  # Unread ones older than this fold into one summary per user
+    NOTIFICATION_COMPACTION_INTERVAL = 3600
+    NOTIFICATION_COMPACTION_BATCH = 500  # Rows per transaction
+    NOTIFICATION_COMPACTION_PAUSE = 0.05  # Seconds between batches
+
+    # Mentor recommendations (see mentor_recommendations.py)
+    MENTOR_RECOMMENDATIONS_TOP_K = 10
+    MENTOR_LOAD_CAPACITY = 5  # Pending and accepted requests at which an alumnus counts as fully loaded
+    MENTOR_SCORE_BATCH = 500  # Students scored per transaction
+    MENTOR_REFRESH_INTERVAL = 60  # Rescoring of students and departments with changes
+    MENTOR_RECOMPUTE_INTERVAL = 86400  # Full recompute
+
+    # Offline delivery queue (see delivery.py)
+    PENDING_DELIVERY_BATCH = 200  # Queued events replayed per acknowledged batch
+    PENDING_DELIVERY_MAX_AGE_DAYS = 30  # Undelivered events older than this are dropped
+    PENDING_DELIVERY_PURGE_INTERVAL = 3600
+
+    # Transactional outbox of real-time events (see outbox.py)
+    OUTBOX_DISPATCHER_ENABLED = os.environ.get('OUTBOX_DISPATCHER_ENABLED', '1') == '1'  # inside `python app.py`
+    OUTBOX_DISPATCH_INTERVAL = 1  # Seconds between polls of an empty outbox
+    OUTBOX_BATCH = 500  # Events delivered per transaction
+    OUTBOX_MAX_ATTEMPTS = 8  # Failed emits before an event is left undelivered
+    OUTBOX_RETRY_BASE_SECONDS = 2  # Backoff before the first retry, doubling after each
+
+    # Chat archival (see chat_archive.py); 0 days disables it
+    CHAT_ARCHIVE_DAYS = 180  # Messages older than this move to compressed segments
+    CHAT_ARCHIVE_INTERVAL = 3600
+    CHAT_ARCHIVE_BATCH = 2000  # Messages per transaction
+    CHAT_ARCHIVE_SEGMENT_SIZE = 200  # Messages per segment
+    CHAT_ARCHIVE_PAUSE = 0.05  # Seconds between batches
+
+    # Bulk user import (see user_import.py)
+    IMPORT_CHUNK_SIZE = 1000  # Rows validated and inserted per transaction
+    IMPORT_HASH_WORKERS = int(os.environ.get('IMPORT_HASH_WORKERS', 0)) or None  # None: one per CPU
+    IMPORT_HTTP_MAX_ROWS = 50  # Larger uploads are refused; import them with `flask import-users`
+
+    # Socket.IO traffic shaping
+    SOCKET_RATE_LIMIT = 10  # Event tokens refilled per second, per connection
+    SOCKET_RATE_BURST = 20
+    TYPING_TIMEOUT_SECONDS = 5  # Typing without a new report for this long ends
+    TYPING_COALESCE_SECONDS = 0.5  # Minimum gap between typing broadcasts per user and room
+    TYPING_SWEEP_INTERVAL = 0.5
+    SOCKET_WIRE_FORMATS = ('json', 'msgpack')  # Formats clients may ask for (see wire_format.py)
+
+    # Email configuration
+    MAIL_SERVER = 'smtp.gmail.com'
+    MAIL_PORT = 587
+    MAIL_USE_TLS = True
+    MAIL_USERNAME = 'futuremesh@example.com'
+    MAIL_PASSWORD = 'your_app_password'
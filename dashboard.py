@@ -0,0 +1,217 @@
+"""Dashboard sections, shared by their own endpoints and ``/api/dashboard/bootstrap``.
+
+Each section is a function of the request's :class:`~principal.Principal`.
+:func:`bootstrap` assembles every section a role's dashboard shows in one
+response. With ``DASHBOARD_BOOTSTRAP_WORKERS`` above one and a database
+that serves concurrent connections (anything but SQLite), sections run in
+parallel, each in its own application context and session; the statements
+they run still count toward the request's SQL metrics and ``@query_budget``.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from extensions import db
+from models import User, Job, JobApplication, ChatMessage, MentorshipRequest, Notification
+from serializers import job_serializer, application_serializer, notification_serializer
+from mentor_recommendations import recommended
+from metrics import start_query_tracking
+from notifications import unread_count
+
+
+def _count(model, *criteria):
+    return db.select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+
+def _department_applications(department, *criteria):
+    return db.select(func.count()).select_from(JobApplication) \
+        .join(Job, Job.id == JobApplication.job_id) \
+        .where(Job.department == department, *criteria).scalar_subquery()
+
+
+def stats(user):
+    """The role's dashboard counters, read with a single SELECT"""
+    user_id = user.id
+    if user.role == 'super_admin':
+        counts = {
+            'total_users': _count(User),
+            'total_students': _count(User, User.role == 'student'),
+            'total_alumni': _count(User, User.role == 'alumni'),
+            'total_jobs': _count(Job),
+            'pending_jobs': _count(Job, Job.status == 'pending'),
+            'total_applications': _count(JobApplication),
+            'active_chats': _count(ChatMessage, ChatMessage.is_read == False)
+        }
+    elif user.role == 'admin':
+        counts = {
+            'pending_approvals': _count(Job, Job.status == 'pending'),
+            'total_jobs': _count(Job),
+            'total_applications': _count(JobApplication),
+            'active_students': _count(User, User.role == 'student', User.is_active == True)
+        }
+    elif user.role == 'hod':
+        counts = {
+            'department_jobs': _count(Job, Job.department == user.department),
+            'department_applications': _department_applications(user.department),
+            'department_students': _count(User, User.role == 'student', User.department == user.department),
+            'pending_shortlists': _department_applications(user.department, JobApplication.status == 'applied')
+        }
+    elif user.role == 'student':
+        counts = {
+            'applications_count': _count(JobApplication, JobApplication.student_id == user_id),
+            'shortlisted_count': _count(JobApplication, JobApplication.student_id == user_id,
+                                        JobApplication.status == 'shortlisted'),
+            'available_jobs': _count(Job, Job.department == user.department, Job.status == 'approved'),
+            'unread_messages': _count(ChatMessage, ChatMessage.receiver_id == user_id, ChatMessage.is_read == False)
+        }
+    elif user.role == 'alumni':
+        accepted = _count(MentorshipRequest, MentorshipRequest.alumni_id == user_id,
+                          MentorshipRequest.status == 'accepted')
+        counts = {
+            'mentorship_requests': _count(MentorshipRequest, MentorshipRequest.alumni_id == user_id,
+                                          MentorshipRequest.status == 'pending'),
+            'active_connections': accepted,
+            'unread_messages': _count(ChatMessage, ChatMessage.receiver_id == user_id, ChatMessage.is_read == False),
+            'total_students_helped': accepted
+        }
+    elif user.role == 'hr':
+        counts = {
+            'posted_jobs': _count(Job, Job.posted_by == user_id),
+            'approved_jobs': _count(Job, Job.posted_by == user_id, Job.status == 'approved'),
+            'total_applications': db.select(func.count()).select_from(JobApplication)
+                .join(Job, Job.id == JobApplication.job_id).where(Job.posted_by == user_id).scalar_subquery(),
+            'pending_jobs': _count(Job, Job.posted_by == user_id, Job.status == 'pending')
+        }
+    else:
+        return {}
+
+    row = db.session.execute(db.select(*[count.label(name) for name, count in counts.items()])).one()
+    return row._asdict()
+
+
+def jobs(user):
+    """Jobs the user may see: eligible ones for students"""
+    if user.role == 'student':
+        # Filter jobs based on student eligibility
+        profile = user.profile
+        rows = db.session.execute(job_serializer.select().filter_by(
+            status='approved', department=user.department
+        ))
+        eligible_jobs = []
+
+        for row in rows:
+            if row.min_cgpa and profile['cgpa'] and profile['cgpa'] >= row.min_cgpa:
+                if row.eligible_years:
+                    eligible_years = json.loads(row.eligible_years)
+                    if profile['graduation_year'] in eligible_years:
+                        eligible_jobs.append(job_serializer.dump(row))
+                else:
+                    eligible_jobs.append(job_serializer.dump(row))
+        return eligible_jobs
+    elif user.role in ['admin', 'super_admin']:
+        return job_serializer.all(job_serializer.select())
+    elif user.role == 'hod':
+        return job_serializer.all(job_serializer.select().filter_by(department=user.department, status='approved'))
+    elif user.role == 'hr':
+        return job_serializer.all(job_serializer.select().filter_by(posted_by=user.id))
+    return []
+
+
+def applications(user):
+    query = application_serializer.select()
+    if user.role == 'student':
+        query = query.filter_by(student_id=user.id)
+    elif user.role == 'hod':
+        # Applications for jobs in the HOD's department
+        query = query.join(Job, Job.id == JobApplication.job_id).filter(Job.department == user.department)
+    return application_serializer.all(query)
+
+
+def mentorship_requests(user):
+    query = MentorshipRequest.query.options(
+        joinedload(MentorshipRequest.student), joinedload(MentorshipRequest.alumni)
+    )
+    if user.role == 'student':
+        requests = query.filter_by(student_id=user.id).all()
+    elif user.role == 'alumni':
+        requests = query.filter_by(alumni_id=user.id).all()
+    else:
+        requests = query.all()
+    return [req.to_dict() for req in requests]
+
+
+def notifications(user):
+    """The latest 20 notifications and the unread count"""
+    return {
+        'notifications': notification_serializer.all(
+            notification_serializer.select().filter_by(user_id=user.id).order_by(
+                Notification.created_at.desc()
+            ).limit(20)
+        ),
+        'unread_count': unread_count(user.id)
+    }
+
+
+def mentors(user):
+    return recommended(user.id)['mentors']
+
+
+# What each role's dashboard shows besides the profile, stats and notifications
+BOOTSTRAP_SECTIONS = {
+    'student': {'jobs': jobs, 'applications': applications, 'mentorship_requests': mentorship_requests,
+                'recommended_mentors': mentors},
+    'alumni': {'mentorship_requests': mentorship_requests},
+    'hod': {'jobs': jobs, 'applications': applications},
+    'hr': {'jobs': jobs},
+    'admin': {},
+    'super_admin': {},
+}
+
+
+def _run_in_context(app, read_replica, tracked, section, user):
+    """Run ``section`` in its own application context; return its result and the SQL it ran"""
+    with app.app_context():
+        g.read_replica = read_replica
+        if tracked:
+            start_query_tracking()
+        result = section(user)
+        if not tracked:
+            return result, None
+        return result, (g.query_count, g.query_time, g.query_shapes)
+
+
+def _merge_query_tracking(count, elapsed, shapes):
+    g.query_count += count
+    g.query_time += elapsed
+    if shapes is not None and g.query_shapes is not None:
+        g.query_shapes.update(shapes)
+
+
+def bootstrap(user):
+    """Everything the dashboard of ``user``'s role needs, keyed by section"""
+    profile = user.profile
+    sections = {'stats': stats, 'notifications': notifications, **BOOTSTRAP_SECTIONS.get(user.role, {})}
+
+    workers = current_app.config['DASHBOARD_BOOTSTRAP_WORKERS']
+    if workers > 1 and db.engine.dialect.name != 'sqlite':
+        # Each section gets its own session, hence its own connection
+        app = current_app._get_current_object()
+        read_replica = g.get('read_replica', False)
+        tracked = 'query_count' in g
+        with ThreadPoolExecutor(max_workers=min(workers, len(sections))) as pool:
+            futures = {name: pool.submit(_run_in_context, app, read_replica, tracked, section, user)
+                       for name, section in sections.items()}
+            results = {}
+            for name, future in futures.items():
+                results[name], queries = future.result()
+                if queries is not None:
+                    # Count the sections' statements toward the request's metrics and query budget
+                    _merge_query_tracking(*queries)
+    else:
+        results = {name: section(user) for name, section in sections.items()}
+
+    response = {'user': profile}
+    response.update(results.pop('notifications'))
+    response.update(results)
+    return response
@@ -0,0 +1,149 @@
+"""Read-replica routing for ``db.session``.
+
+With ``SQLALCHEMY_REPLICA_URIS`` set, each replica becomes a bind named
+``replica_<n>`` and plain SELECTs issued while serving a GET or HEAD request,
+or a Socket.IO handler marked with :func:`replica_reads`, go to one of them.
+Everything else goes to the primary: writes, flushes, ``SELECT ... FOR
+UPDATE``, and any read after the request or event has written.
+
+Read-your-writes: a request that writes sets a short-lived cookie
+(``READ_YOUR_WRITES_SECONDS``) and a socket that writes is remembered for as
+long, so the client's next reads come from the primary until replicas have
+caught up. API clients that drop cookies get no such guarantee.
+
+Replication itself is the database's job. For local testing with SQLite,
+``flask sync-replicas`` copies the primary file over each replica.
+"""
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+import click
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask.cli import with_appcontext
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, Select
+from sqlalchemy.engine import make_url
+
+REPLICA_PREFIX = 'replica_'
+STICKY_COOKIE = 'fm_read_primary'
+
+_lock = threading.Lock()
+_sticky_sids = {}  # socket sid -> monotonic time its reads may use replicas again
+
+
+def configure(app):
+    """Add a bind per configured replica; call before ``db.init_app``"""
+    uris = app.config['SQLALCHEMY_REPLICA_URIS']
+    if isinstance(uris, str):
+        uris = [uri.strip() for uri in uris.split(',') if uri.strip()]
+    if uris:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.update({f'{REPLICA_PREFIX}{n}': uri for n, uri in enumerate(uris)})
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.before_request(_route_request)
+        app.after_request(_set_sticky_cookie)
+    return uris
+
+
+def _route_request():
+    g.read_replica = request.method in ('GET', 'HEAD') and STICKY_COOKIE not in request.cookies
+
+
+def _set_sticky_cookie(response):
+    if g.get('db_wrote'):
+        response.set_cookie(STICKY_COOKIE, '1', max_age=current_app.config['READ_YOUR_WRITES_SECONDS'],
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def replica_reads(handler):
+    """Let a Socket.IO handler read from replicas, unless its socket wrote recently"""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            until = _sticky_sids.get(request.sid)
+            if until is not None and until <= time.monotonic():
+                del _sticky_sids[request.sid]
+                until = None
+        g.read_replica = until is None
+        return handler(*args, **kwargs)
+    return wrapper
+
+
+def forget(sid):
+    with _lock:
+        _sticky_sids.pop(sid, None)
+
+
+class RoutingSession(Session):
+    """``db.session`` class sending plain reads to a replica when the request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if (bind is None and not self._flushing and isinstance(clause, Select)
+                and clause._for_update_arg is None and has_app_context()
+                and g.get('read_replica') and not g.get('db_wrote')):
+            engines = self._db.engines
+            if engine is engines.get(None):
+                replicas = [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+                if replicas:
+                    return engines[random.choice(replicas)]
+        return engine
+
+
+def _wrote():
+    if has_app_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    _wrote()
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _wrote()
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _committed(session):
+    # Sockets have no cookie to carry stickiness: remember the sid instead
+    if has_request_context() and g.get('db_wrote'):
+        sid = getattr(request, 'sid', None)
+        if sid is not None:
+            with _lock:
+                _sticky_sids[sid] = time.monotonic() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+@click.command('sync-replicas')
+@with_appcontext
+def sync_replicas_command():
+    """Copy the SQLite primary over each SQLite replica (local testing only)."""
+    from extensions import db
+    primary = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    replicas = [key for key in db.engines if key and key.startswith(REPLICA_PREFIX)]
+    if not replicas:
+        raise click.ClickException('No replicas configured (SQLALCHEMY_REPLICA_URIS)')
+    if primary.get_backend_name() != 'sqlite':
+        raise click.ClickException('Only SQLite replicas can be synced; use the database\'s own replication')
+
+    source = sqlite3.connect(db.engine.url.database)
+    try:
+        for key in replicas:
+            engine = db.engines[key]
+            if engine.url.get_backend_name() != 'sqlite':
+                raise click.ClickException(f'{key} is not a SQLite database')
+            # Close pooled connections so they see the new file contents
+            engine.dispose()
+            target = sqlite3.connect(engine.url.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            click.echo(f'Synced {key} from {db.engine.url.database}')
+    finally:
+        source.close()
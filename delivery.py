@@ -0,0 +1,83 @@
+"""Socket events for users who are offline.
+
+An event for a user with no live socket is stored in ``PendingDelivery``
+instead, in the transaction that produced it. When the user connects, the
+queue is replayed to the new socket as one ``pending_deliveries`` event per
+``PENDING_DELIVERY_BATCH`` items, read through the (user_id, id) index. The
+client acknowledges each batch; only then are its items deleted and the next
+batch sent, so a socket that drops mid-replay gets them again next time.
+
+Presence is per process (see presence.py): with several workers a user
+online elsewhere may also get an event queued here, so clients should
+ignore items they have already seen (messages carry their id).
+"""
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from models import PendingDelivery
+from scheduler import scheduled
+import presence
+import wire_format
+
+
+def queue(user_id, event, data):
+    """Hold ``event`` for ``user_id``'s next connection; stored when the session commits"""
+    db.session.add(PendingDelivery(user_id=user_id, event=event, payload=json.dumps(wire_format.plain(data))))
+
+
+def push(user_id, event, data):
+    """Emit ``event`` to ``user_id``'s sockets, or queue it if they have none"""
+    if presence.is_online(user_id):
+        wire_format.send(event, data, to=user_id)
+    else:
+        queue(user_id, event, data)
+
+
+def replay(user_id, sid):
+    """Send the next batch of ``user_id``'s queued events to socket ``sid``"""
+    batch_size = current_app.config['PENDING_DELIVERY_BATCH']
+    rows = db.session.execute(
+        db.select(PendingDelivery.id, PendingDelivery.event, PendingDelivery.payload, PendingDelivery.created_at)
+        .where(PendingDelivery.user_id == user_id)
+        .order_by(PendingDelivery.id)
+        .limit(batch_size + 1)
+    ).all()
+    if not rows:
+        return
+
+    batch = rows[:batch_size]
+    last_id = batch[-1].id
+
+    def acknowledged(*args):
+        db.session.execute(
+            db.delete(PendingDelivery).where(PendingDelivery.user_id == user_id, PendingDelivery.id <= last_id)
+        )
+        db.session.commit()
+        if len(rows) > batch_size:
+            replay(user_id, sid)
+
+    wire_format.send('pending_deliveries', {
+        'items': [{
+            'id': row.id,
+            'event': row.event,
+            'data': json.loads(row.payload),
+            'created_at': row.created_at.isoformat() if row.created_at else None
+        } for row in batch],
+        'more': len(rows) > batch_size
+    }, to=sid, callback=acknowledged)
+
+
+def purge_expired(max_age_days):
+    """Drop queued events older than ``max_age_days``; return how many were dropped"""
+    result = db.session.execute(
+        db.delete(PendingDelivery)
+        .where(PendingDelivery.created_at < datetime.utcnow() - timedelta(days=max_age_days))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@scheduled('PENDING_DELIVERY_PURGE_INTERVAL')
+def purge_pending_deliveries_task():
+    return f"{purge_expired(current_app.config['PENDING_DELIVERY_MAX_AGE_DAYS'])} undelivered events dropped"
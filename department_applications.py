@@ -0,0 +1,149 @@
+"""Server-side filtered, sorted and paginated listing of a department's applications.
+
+Backs ``GET /api/hod/applications``. The department is matched with a
+correlated subquery on ``Job.department``, never with a list of the
+department's job ids. The statement therefore has a fixed number of
+parameters however many jobs the department has.
+
+Pages are keyset-paginated: the ``next_cursor`` of a page holds the sort
+value and id of its last row, and the next page starts strictly after it.
+Deep pages cost the same as the first.
+
+A page is read in two queries. The first picks only the page's ids and
+sort values. The second loads those rows with their job and student.
+
+Sorting by application time walks ``ix_job_application_applied`` and stops
+once the page is full. The department and student filters are correlated
+subqueries checked per row, which keeps the planner from driving the query
+from ``user`` or ``job``. A job filter reads ``ix_job_application_job_status``.
+
+Sorting by a student's CGPA or graduation year has to order all of the
+department's matching applications. Those are read job by job through
+``ix_job_application_job_status``.
+"""
+from datetime import datetime
+from sqlalchemy import and_, func, or_
+from extensions import db
+from models import User, Job, JobApplication
+from analytics import FUNNEL_STATUSES
+from serializers import RowSerializer
+
+MAX_LIMIT = 200
+
+# Sort name -> (expression, cursor value parser, whether it is the student's); NULLs sort lowest
+SORTS = {
+    'applied_at': (JobApplication.applied_at, datetime.fromisoformat, False),
+    'cgpa': (func.coalesce(User.cgpa, -1.0), float, True),
+    'graduation_year': (func.coalesce(User.graduation_year, 0), int, True),
+}
+
+department_application_serializer = RowSerializer(
+    JobApplication.id, JobApplication.job_id, JobApplication.student_id, JobApplication.status,
+    JobApplication.applied_at, JobApplication.updated_at, JobApplication.interview_date,
+    Job.title.label('job_title'), Job.company,
+    (User.first_name + ' ' + User.last_name).label('student_name'), User.email.label('student_email'),
+    User.cgpa, User.graduation_year
+)
+
+
+def parse_query(args):
+    """Filters, sort and page of a request's query string; raises ValueError with a message for the client"""
+    sort = args.get('sort', '-applied_at')
+    if sort.lstrip('-') not in SORTS:
+        raise ValueError(f'sort must be one of {", ".join(SORTS)}, optionally prefixed with -')
+
+    statuses = [status for status in args.get('status', '').split(',') if status]
+    unknown = set(statuses) - set(FUNNEL_STATUSES)
+    if unknown:
+        raise ValueError(f'status must be among {", ".join(FUNNEL_STATUSES)}')
+
+    try:
+        query = {
+            'job_id': args.get('job_id') or None,
+            'statuses': statuses or None,
+            'min_cgpa': float(args['min_cgpa']) if args.get('min_cgpa') else None,
+            'max_cgpa': float(args['max_cgpa']) if args.get('max_cgpa') else None,
+            'graduation_years': [int(year) for year in args['graduation_year'].split(',') if year]
+                                if args.get('graduation_year') else None,
+            'sort': sort,
+            'limit': min(max(int(args.get('limit', 50)), 1), MAX_LIMIT),
+            'after': args.get('after') or None,
+        }
+    except ValueError:
+        raise ValueError('min_cgpa and max_cgpa must be numbers, graduation_year and limit integers')
+    return query
+
+
+def _decode_cursor(cursor, parse):
+    value, _, application_id = cursor.rpartition('|')
+    if not application_id or not value:
+        raise ValueError('Invalid cursor')
+    return parse(value), application_id
+
+
+def _encode_cursor(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def search(department, job_id=None, statuses=None, min_cgpa=None, max_cgpa=None, graduation_years=None,
+           sort='-applied_at', limit=50, after=None):
+    """One page of ``department``'s applications and the cursor of the next (None on the last page)"""
+    descending = sort.startswith('-')
+    key, parse, by_student = SORTS[sort.lstrip('-')]
+
+    student_criteria = []
+    if min_cgpa is not None:
+        student_criteria.append(User.cgpa >= min_cgpa)
+    if max_cgpa is not None:
+        student_criteria.append(User.cgpa <= max_cgpa)
+    if graduation_years:
+        student_criteria.append(User.graduation_year.in_(graduation_years))
+
+    query = db.select(JobApplication.id, key.label('sort_key'))
+    if by_student:
+        # Every matching application is sorted: read just the department's, job by job
+        query = query.join(User, User.id == JobApplication.student_id).where(
+            JobApplication.job_id.in_(db.select(Job.id).where(Job.department == department)), *student_criteria
+        )
+    else:
+        # Walk applications in sort order, checking department and student per row, until the page is full
+        query = query.where(
+            db.select(Job.id).where(Job.id == JobApplication.job_id, Job.department == department).exists()
+        )
+        if student_criteria:
+            query = query.where(
+                db.select(User.id).where(User.id == JobApplication.student_id, *student_criteria).exists()
+            )
+    if job_id:
+        query = query.where(JobApplication.job_id == job_id)
+    if statuses:
+        query = query.where(JobApplication.status.in_(statuses))
+
+    if after:
+        value, application_id = _decode_cursor(after, parse)
+        if descending:
+            query = query.where(or_(key < value, and_(key == value, JobApplication.id < application_id)))
+        else:
+            query = query.where(or_(key > value, and_(key == value, JobApplication.id > application_id)))
+    if descending:
+        query = query.order_by(key.desc(), JobApplication.id.desc())
+    else:
+        query = query.order_by(key, JobApplication.id)
+
+    page = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = f'{_encode_cursor(page[-1].sort_key)}|{page[-1].id}'
+    if not page:
+        return [], None
+
+    rows = {
+        row.id: row for row in db.session.execute(
+            department_application_serializer.select()
+            .join(Job, Job.id == JobApplication.job_id)
+            .join(User, User.id == JobApplication.student_id)
+            .where(JobApplication.id.in_([row.id for row in page]))
+        )
+    }
+    return department_application_serializer.dump_rows(rows[row.id] for row in page), next_cursor
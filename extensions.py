@@ -0,0 +1,19 @@
+"""Flask extensions, created unbound and initialized per app by ``create_app``.
+
+Modules import them from here rather than from ``app``, so importing a
+model or a route module never builds or configures an application.
+"""
+from flask_sqlalchemy import SQLAlchemy
+from flask_bcrypt import Bcrypt
+from flask_jwt_extended import JWTManager
+from flask_socketio import SocketIO
+from flask_mail import Mail
+from flask_cors import CORS
+from db_routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+bcrypt = Bcrypt()
+jwt = JWTManager()
+socketio = SocketIO()
+mail = Mail()
+cors = CORS()
@@ -0,0 +1,58 @@
+"""Close jobs whose application deadline has passed."""
+from datetime import datetime
+from flask import current_app
+from extensions import db
+from models import Job
+from notifications import notify_many
+from scheduler import scheduled
+
+OPEN_STATUSES = ('pending', 'approved')
+
+
+def is_open(job, now=None):
+    """Whether ``job`` accepts applications, even if the expiry task has not run yet"""
+    if job.status != 'approved':
+        return False
+    return job.application_deadline is None or job.application_deadline >= (now or datetime.utcnow())
+
+
+def expire_jobs(batch_size=500, now=None):
+    """Mark open jobs past their deadline as expired and notify their posters; return how many expired.
+
+    Each batch is read through the (status, application_deadline) index and
+    committed on its own, so a large backlog never holds a long transaction.
+    """
+    now = now or datetime.utcnow()
+    expired = 0
+    while True:
+        jobs = db.session.execute(
+            db.select(Job.id, Job.title, Job.posted_by)
+            .where(Job.status.in_(OPEN_STATUSES), Job.application_deadline < now)
+            .order_by(Job.application_deadline)
+            .limit(batch_size)
+        ).all()
+        if not jobs:
+            return expired
+
+        result = db.session.execute(
+            db.update(Job)
+            .where(Job.id.in_([job.id for job in jobs]), Job.status.in_(OPEN_STATUSES))
+            .values(status='expired', updated_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        notify_many([{
+            'user_id': job.posted_by,
+            'title': 'Job Expired',
+            'message': f'"{job.title}" passed its application deadline and no longer accepts applications',
+            'type': 'job_expired',
+            'action_url': f'/jobs/{job.id}',
+            'created_at': now,
+        } for job in jobs])
+        expired += result.rowcount
+        if len(jobs) < batch_size:
+            return expired
+
+
+@scheduled('JOB_EXPIRY_INTERVAL')
+def expire_jobs_task():
+    return f"{expire_jobs(current_app.config['JOB_EXPIRY_BATCH'])} jobs expired"
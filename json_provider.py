@@ -0,0 +1,57 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(obj):
+    """Serialize dates as ISO 8601, matching what the models' ``to_dict`` emit"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Stdlib ``json`` provider that encodes datetimes as ISO 8601 strings.
+
+    Flask's default provider renders datetimes as RFC 822 HTTP dates, which the
+    frontend does not parse the same way as the ``isoformat()`` strings our
+    APIs have always returned.
+    """
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+    sort_keys = False
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """JSON provider backed by orjson.
+
+    orjson serializes ``datetime`` natively in ISO 8601, so rows can be handed
+    over without calling ``isoformat()`` per column.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+
+JSONProvider = OrjsonProvider if orjson else StdlibJSONProvider
@@ -0,0 +1,280 @@
+"""Precomputed mentor recommendations for students.
+
+Every student is scored against the alumni of their department on shared
+skills, whether the alumnus works at a company the student applied to or in
+a role like the jobs applied for, the alumnus' acceptance rate and their
+current load of pending and accepted requests. The best
+``MENTOR_RECOMMENDATIONS_TOP_K`` are stored in ``MentorRecommendation``, so
+``/api/mentors/recommended`` is one indexed read.
+
+Scoring runs a department at a time: skills are interned to one bit each,
+so the overlap of a pair is an AND and a popcount of two integers, and the
+alumni side is prepared once for all students of the department.
+
+Profile edits, new (or imported) students and mentorship requests and responses add a
+``MentorRefresh`` row in the transaction making the change; the refresh
+task rescores just those students and departments, each once however many
+changes they had. A mentorship request or response rescores its student
+and the students currently recommended that alumnus, whose score moved
+with the alumnus' load and acceptance rate. Students that alumnus could now
+newly rank for pick the change up at the full recompute, which runs less
+often.
+
+    flask recommend-mentors [--department CSE]
+"""
+import heapq
+import json
+import re
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, func
+from extensions import db
+from models import User, Job, JobApplication, MentorshipRequest, MentorRecommendation, MentorRefresh
+from scheduler import scheduled
+
+WEIGHTS = {'skills': 0.5, 'company': 0.2, 'designation': 0.1, 'acceptance': 0.2, 'load': 0.2}
+ACTIVE_STATUSES = ('pending', 'accepted')
+# User fields the scores depend on
+MATCH_FIELDS = ('department', 'skills', 'company', 'designation', 'current_company', 'current_designation')
+
+
+def request_refresh(scope, target):
+    """Mark a student or alumnus (by id) or a department as needing rescoring when the session commits"""
+    if target:
+        db.session.add(MentorRefresh(scope=scope, target=target))
+
+
+def request_refreshes(connection, scope, targets):
+    """Mark many students or alumni as needing rescoring, with one INSERT on ``connection``"""
+    if targets:
+        now = datetime.utcnow()
+        connection.execute(MentorRefresh.__table__.insert(),
+                           [{'scope': scope, 'target': target, 'requested_at': now} for target in targets])
+
+
+def recommended(student_id):
+    """The stored recommendations of ``student_id``, best first, with when they were computed"""
+    rows = db.session.execute(
+        db.select(MentorRecommendation.score, MentorRecommendation.shared_skills,
+                  MentorRecommendation.computed_at, User.id, User.first_name, User.last_name,
+                  User.company, User.designation, User.current_company, User.current_designation,
+                  User.experience_years, User.profile_image)
+        .join(User, User.id == MentorRecommendation.alumni_id)
+        .where(MentorRecommendation.student_id == student_id)
+        .order_by(MentorRecommendation.rank)
+    ).all()
+    return {
+        'mentors': [{
+            'id': row.id,
+            'name': f'{row.first_name} {row.last_name}',
+            'company': row.current_company or row.company,
+            'designation': row.current_designation or row.designation,
+            'experience_years': row.experience_years,
+            'profile_image': row.profile_image,
+            'score': row.score,
+            'shared_skills': row.shared_skills
+        } for row in rows],
+        'computed_at': rows[0].computed_at.isoformat() if rows else None
+    }
+
+
+def _skills(text):
+    if not text:
+        return ()
+    try:
+        skills = json.loads(text)
+    except ValueError:
+        skills = text.split(',')
+    if isinstance(skills, str):
+        skills = skills.split(',')
+    return {str(skill).strip().lower() for skill in skills if str(skill).strip()}
+
+
+def _words(text):
+    return {word for word in re.findall(r'[a-z]+', (text or '').lower()) if len(word) > 2}
+
+
+def _bits(mask):
+    return bin(mask).count('1')
+
+
+class _Vocabulary(dict):
+    """Skill name -> bit, assigned on first sight"""
+
+    def mask(self, skills):
+        mask = 0
+        for skill in skills:
+            mask |= 1 << self.setdefault(skill, len(self))
+        return mask
+
+
+def _candidates(department, vocabulary):
+    """The department's active alumni as ``(id, skill mask, company, role words, base score)``"""
+    alumni = db.session.execute(
+        db.select(User.id, User.skills, User.company, User.current_company,
+                  User.designation, User.current_designation)
+        .where(User.role == 'alumni', User.department == department, User.is_active == True)
+    ).all()
+    if not alumni:
+        return []
+
+    stats = {
+        row.alumni_id: row for row in db.session.execute(
+            db.select(
+                MentorshipRequest.alumni_id,
+                func.sum(case((MentorshipRequest.status == 'accepted', 1), else_=0)).label('accepted'),
+                func.sum(case((MentorshipRequest.status == 'rejected', 1), else_=0)).label('rejected'),
+                func.sum(case((MentorshipRequest.status.in_(ACTIVE_STATUSES), 1), else_=0)).label('load'),
+            )
+            .join(User, User.id == MentorshipRequest.alumni_id)
+            .where(User.role == 'alumni', User.department == department)
+            .group_by(MentorshipRequest.alumni_id)
+        )
+    }
+
+    capacity = current_app.config['MENTOR_LOAD_CAPACITY']
+    candidates = []
+    for alum in alumni:
+        row = stats.get(alum.id)
+        accepted, rejected, load = (row.accepted, row.rejected, row.load) if row else (0, 0, 0)
+        # Smoothed, so an alumnus without history starts at one half
+        acceptance = (accepted + 1) / (accepted + rejected + 2)
+        base = WEIGHTS['acceptance'] * acceptance - WEIGHTS['load'] * min(load / capacity, 1)
+        company = (alum.current_company or alum.company or '').strip().lower()
+        role_words = _words(alum.current_designation or alum.designation)
+        candidates.append((alum.id, vocabulary.mask(_skills(alum.skills)), company, role_words, base))
+    return candidates
+
+
+def _score_batch(students, candidates, vocabulary, top_k, now):
+    """Replace the recommendations of ``students`` (rows of id and skills); return the new rows"""
+    ids = [student.id for student in students]
+    applied = {}
+    for row in db.session.execute(
+        db.select(JobApplication.student_id, Job.company, Job.title)
+        .join(Job, Job.id == JobApplication.job_id)
+        .where(JobApplication.student_id.in_(ids))
+    ):
+        companies, words = applied.setdefault(row.student_id, (set(), set()))
+        companies.add(row.company.strip().lower())
+        words.update(_words(row.title))
+    requested = {
+        (row.student_id, row.alumni_id) for row in db.session.execute(
+            db.select(MentorshipRequest.student_id, MentorshipRequest.alumni_id)
+            .where(MentorshipRequest.student_id.in_(ids), MentorshipRequest.status.in_(ACTIVE_STATUSES))
+        )
+    }
+
+    rows = []
+    no_applications = (frozenset(), frozenset())
+    for student in students:
+        skills = vocabulary.mask(_skills(student.skills))
+        skill_count = _bits(skills) or 1
+        companies, words = applied.get(student.id, no_applications)
+
+        scored = []
+        for alumni_id, alumni_skills, company, role_words, base in candidates:
+            if (student.id, alumni_id) in requested:
+                continue
+            shared = _bits(skills & alumni_skills)
+            score = base + WEIGHTS['skills'] * shared / skill_count
+            if company and company in companies:
+                score += WEIGHTS['company']
+            if role_words and not role_words.isdisjoint(words):
+                score += WEIGHTS['designation']
+            scored.append((score, shared, alumni_id))
+
+        for rank, (score, shared, alumni_id) in enumerate(heapq.nlargest(top_k, scored), 1):
+            rows.append({'student_id': student.id, 'rank': rank, 'alumni_id': alumni_id,
+                         'score': round(score, 4), 'shared_skills': shared, 'computed_at': now})
+
+    db.session.execute(db.delete(MentorRecommendation).where(MentorRecommendation.student_id.in_(ids)))
+    if rows:
+        db.session.execute(db.insert(MentorRecommendation), rows)
+    return rows
+
+
+def score_department(department, student_ids=None):
+    """Rescore the students of ``department`` (only ``student_ids`` if given); return how many"""
+    config = current_app.config
+    batch_size = config['MENTOR_SCORE_BATCH']
+    vocabulary = _Vocabulary()
+    candidates = _candidates(department, vocabulary)
+
+    query = db.select(User.id, User.skills) \
+        .where(User.role == 'student', User.department == department, User.is_active == True) \
+        .order_by(User.id)
+    if student_ids is not None:
+        query = query.where(User.id.in_(student_ids))
+
+    scored = 0
+    after = None
+    while True:
+        page = query.where(User.id > after) if after is not None else query
+        students = db.session.execute(page.limit(batch_size)).all()
+        if not students:
+            return scored
+        _score_batch(students, candidates, vocabulary, config['MENTOR_RECOMMENDATIONS_TOP_K'], datetime.utcnow())
+        db.session.commit()
+        scored += len(students)
+        after = students[-1].id
+
+
+def refresh_pending():
+    """Rescore the students and departments queued by :func:`request_refresh`; return students rescored"""
+    last_id = db.session.execute(db.select(func.max(MentorRefresh.id))).scalar()
+    if last_id is None:
+        return 0
+    requests = db.session.execute(
+        db.select(MentorRefresh.scope, MentorRefresh.target).where(MentorRefresh.id <= last_id).distinct()
+    ).all()
+    departments = {target for scope, target in requests if scope == 'department'}
+    students = {}
+    student_ids = [target for scope, target in requests if scope == 'student']
+    alumni_ids = [target for scope, target in requests if scope == 'alumni']
+    if alumni_ids:
+        student_ids.extend(db.session.execute(
+            db.select(MentorRecommendation.student_id).where(MentorRecommendation.alumni_id.in_(alumni_ids))
+            .distinct()
+        ).scalars())
+    if student_ids:
+        for row in db.session.execute(
+            db.select(User.id, User.department).where(User.id.in_(student_ids), User.role == 'student')
+        ):
+            if row.department not in departments:
+                students.setdefault(row.department, []).append(row.id)
+
+    scored = sum(score_department(department) for department in departments)
+    scored += sum(score_department(department, ids) for department, ids in students.items())
+    db.session.execute(db.delete(MentorRefresh).where(MentorRefresh.id <= last_id))
+    db.session.commit()
+    return scored
+
+
+def recompute_all():
+    """Rescore every student; return how many"""
+    departments = db.session.execute(
+        db.select(User.department).where(User.role == 'student', User.department.isnot(None)).distinct()
+    ).scalars().all()
+    return sum(score_department(department) for department in departments)
+
+
+@scheduled('MENTOR_REFRESH_INTERVAL')
+def refresh_mentor_recommendations_task():
+    return f'{refresh_pending()} students rescored'
+
+
+@scheduled('MENTOR_RECOMPUTE_INTERVAL')
+def recompute_mentor_recommendations_task():
+    return f'{recompute_all()} students scored'
+
+
+@click.command('recommend-mentors')
+@click.option('--department', help='Only rescore this department.')
+@with_appcontext
+def recommend_mentors_command(department):
+    """Recompute the mentor recommendations of every student."""
+    scored = score_department(department) if department else recompute_all()
+    click.echo(f'Scored {scored} students')
@@ -0,0 +1,216 @@
+"""Request, query and Socket.IO event metrics exposed in Prometheus format.
+
+Metrics are kept in process memory, so every worker exposes its own series
+on ``/metrics``; scrape each worker (or aggregate in Prometheus) when running
+several.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as StatementCounter
+from functools import wraps
+from flask import request, g, current_app, has_app_context
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from query_budget import check_query_budget
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = _labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}'
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {count}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            snapshot = sorted(self._series.items())
+        for labels, value in snapshot:
+            yield f'{self.name}{{{_labels(self.labelnames, labels)}}} {value}'
+
+
+def _labels(names, values):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+
+
+REQUEST_LATENCY = Histogram(
+    'futuremesh_http_request_duration_seconds', 'HTTP request latency',
+    ('endpoint', 'method', 'role', 'status'), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'futuremesh_http_request_queries', 'SQL statements executed per HTTP request',
+    ('endpoint', 'method', 'role'), QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_TIME = Histogram(
+    'futuremesh_http_request_query_duration_seconds', 'Time spent in SQL per HTTP request',
+    ('endpoint', 'method', 'role'), LATENCY_BUCKETS
+)
+SOCKET_EVENT_LATENCY = Histogram(
+    'futuremesh_socketio_event_duration_seconds', 'Socket.IO event handler latency',
+    ('event',), LATENCY_BUCKETS
+)
+SOCKET_EVENT_QUERIES = Histogram(
+    'futuremesh_socketio_event_queries', 'SQL statements executed per Socket.IO event',
+    ('event',), QUERY_COUNT_BUCKETS
+)
+SLOW_QUERIES = Counter(
+    'futuremesh_db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS',
+    ('endpoint',)
+)
+
+REGISTRY = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_QUERY_TIME,
+            SOCKET_EVENT_LATENCY, SOCKET_EVENT_QUERIES, SLOW_QUERIES)
+
+
+def start_query_tracking():
+    g.query_count = 0
+    g.query_time = 0.0
+    g.query_shapes = StatementCounter() if current_app.config['QUERY_BUDGET_MODE'] != 'off' else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if not has_app_context():
+        return
+    if 'query_count' in g:
+        g.query_count += 1
+        g.query_time += elapsed
+        if g.query_shapes is not None:
+            g.query_shapes[statement] += 1
+    if elapsed * 1000 >= current_app.config['SLOW_QUERY_THRESHOLD_MS']:
+        endpoint = _current_endpoint()
+        SLOW_QUERIES.inc(endpoint)
+        current_app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint, statement)
+
+
+def _current_endpoint():
+    if g.get('socketio_event'):
+        return 'socketio:' + g.socketio_event
+    try:
+        return request.endpoint or 'unmatched'
+    except RuntimeError:
+        return 'background'
+
+
+def _request_role():
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        return 'anonymous'
+    if not claims:
+        return 'anonymous'
+    principal = g.get('principal')
+    return (principal.role if principal else claims.get('role')) or 'unknown'
+
+
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    start_query_tracking()
+
+
+def _record_request_metrics(response):
+    if 'request_start' not in g or request.endpoint == 'metrics':
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    role = _request_role()
+    REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint, request.method, role, response.status_code)
+    REQUEST_QUERIES.observe(g.query_count, endpoint, request.method, role)
+    REQUEST_QUERY_TIME.observe(g.query_time, endpoint, request.method, role)
+    view = current_app.view_functions.get(request.endpoint)
+    check_query_budget(endpoint, getattr(view, 'query_budget', None))
+    return response
+
+
+def timed_event(handler):
+    """Record latency and query count of a Socket.IO event handler"""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        name = getattr(request, 'event', {}).get('message', handler.__name__)
+        g.socketio_event = name
+        start_query_tracking()
+        start = time.perf_counter()
+        try:
+            result = handler(*args, **kwargs)
+        finally:
+            SOCKET_EVENT_LATENCY.observe(time.perf_counter() - start, name)
+            SOCKET_EVENT_QUERIES.observe(g.query_count, name)
+        check_query_budget('socketio:' + name, getattr(handler, 'query_budget', None))
+        return result
+    return wrapper
+
+
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return 'Unauthorized\n', 401
+    elif not current_app.config['METRICS_PUBLIC']:
+        # Neither a token nor an explicit opt-in: not served at all
+        return 'Not Found\n', 404
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def init_app(app):
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request_metrics)
+    app.add_url_rule('/metrics', 'metrics', metrics)
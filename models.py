@@ -1,4 +1,4 @@
-from app import db, bcrypt
+from extensions import db, bcrypt
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 import uuid
@@ -35,6 +35,14 @@ class User(db.Model):
     current_designation = db.Column(db.String(100))
     bio = db.Column(db.Text)
     
+    # Columns whose changes do not alter any API response (see conditional.py)
+    __version_ignore__ = ('last_login',)
+    
+    # Case-insensitive email lookups of the bulk import (see user_import.py)
+    __table_args__ = (
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+    
     # Relationships
     sent_applications = db.relationship('JobApplication', foreign_keys='JobApplication.student_id', backref='student')
     posted_jobs = db.relationship('Job', foreign_keys='Job.posted_by', backref='poster')
@@ -100,6 +108,12 @@ class Job(db.Model):
     # Relationships
     applications = db.relationship('JobApplication', backref='job', cascade='all, delete-orphan')
     
+    # Serves the expiry task (see job_expiry.py), status-filtered listings and department lookups
+    __table_args__ = (
+        db.Index('ix_job_status_deadline', 'status', 'application_deadline'),
+        db.Index('ix_job_department_status', 'department', 'status'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -136,6 +150,13 @@ class JobApplication(db.Model):
     interview_date = db.Column(db.DateTime)
     interview_notes = db.Column(db.Text)
     feedback = db.Column(db.Text)
+
+    # Per-student lookups, and the department listing (see department_applications.py)
+    __table_args__ = (
+        db.Index('ix_job_application_student', 'student_id'),
+        db.Index('ix_job_application_job_status', 'job_id', 'status'),
+        db.Index('ix_job_application_applied', 'applied_at', 'id'),
+    )
     
     def to_dict(self):
         return {
@@ -152,6 +173,52 @@ class JobApplication(db.Model):
             'feedback': self.feedback
         }
 
+class ApplicationEvent(db.Model):
+    """Append-only log of application status changes (see analytics.transition_application)"""
+    id = db.Column(db.Integer, primary_key=True)  # increasing: the funnel rollup watermark
+    application_id = db.Column(db.String(36), db.ForeignKey('job_application.id'), nullable=False, index=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('job.id'), nullable=False)
+    department = db.Column(db.String(100))  # of the job, as of the event
+    company = db.Column(db.String(100))
+    from_status = db.Column(db.String(20))  # None for the submission
+    to_status = db.Column(db.String(20), nullable=False)
+    actor_id = db.Column(db.String(36), db.ForeignKey('user.id'))
+    elapsed_seconds = db.Column(db.Float, nullable=False, default=0)  # since the application was submitted
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __versioned__ = False
+    
+    application = db.relationship('JobApplication', backref=db.backref('events', lazy='dynamic'))
+
+class FunnelRollup(db.Model):
+    """Application events per day, job and status reached, maintained by analytics.roll_up"""
+    day = db.Column(db.Date, primary_key=True)
+    job_id = db.Column(db.String(36), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    department = db.Column(db.String(100))
+    company = db.Column(db.String(100))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    elapsed_seconds = db.Column(db.Float, nullable=False, default=0)  # summed over the events
+    
+    __table_args__ = (
+        db.Index('ix_funnel_rollup_department_day', 'department', 'day'),
+        db.Index('ix_funnel_rollup_company_day', 'company', 'day'),
+    )
+
+class RollupState(db.Model):
+    """Last event folded into a rollup"""
+    name = db.Column(db.String(50), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class RollupGap(db.Model):
+    """An event id a rollup's watermark passed before its event had committed"""
+    name = db.Column(db.String(50), primary_key=True)
+    event_id = db.Column(db.Integer, primary_key=True)
+    found_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __versioned__ = False
+
 class ChatMessage(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     sender_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
@@ -161,6 +228,11 @@ class ChatMessage(db.Model):
     file_path = db.Column(db.String(200))
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_message_pair_created', 'sender_id', 'receiver_id', 'created_at'),
+        db.Index('ix_chat_message_created', 'created_at'),
+    )
     
     def to_dict(self):
         return {
@@ -175,6 +247,19 @@ class ChatMessage(db.Model):
             'sender_name': self.sender.first_name + ' ' + self.sender.last_name if self.sender else None
         }
 
+class ChatArchiveSegment(db.Model):
+    """A compressed run of archived messages of one conversation (see chat_archive.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    conversation = db.Column(db.String(73), nullable=False)  # the two user ids, lower first
+    start_at = db.Column(db.DateTime, nullable=False)  # oldest message in the segment
+    end_at = db.Column(db.DateTime, nullable=False)  # newest message in the segment
+    message_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON list, oldest first
+
+    __table_args__ = (
+        db.Index('ix_chat_archive_conversation_end', 'conversation', 'end_at'),
+    )
+
 class MentorshipRequest(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
@@ -187,6 +272,11 @@ class MentorshipRequest(db.Model):
     
     student = db.relationship('User', foreign_keys=[student_id], backref='sent_mentorship_requests')
     alumni = db.relationship('User', foreign_keys=[alumni_id], backref='received_mentorship_requests')
+
+    __table_args__ = (
+        db.Index('ix_mentorship_request_student_status', 'student_id', 'status'),
+        db.Index('ix_mentorship_request_alumni_status', 'alumni_id', 'status'),
+    )
     
     def to_dict(self):
         return {
@@ -202,18 +292,47 @@ class MentorshipRequest(db.Model):
             'alumni_name': self.alumni.first_name + ' ' + self.alumni.last_name if self.alumni else None
         }
 
+class MentorRecommendation(db.Model):
+    """A student's precomputed mentor match, best first (see mentor_recommendations.py)"""
+    student_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    alumni_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    shared_skills = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Students recommended an alumnus whose load or acceptance rate changed
+        db.Index('ix_mentor_recommendation_alumni', 'alumni_id'),
+    )
+
+class MentorRefresh(db.Model):
+    """A student, alumnus or department whose recommendations are out of date"""
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # student, alumni, department
+    target = db.Column(db.String(100), nullable=False)  # user id or department name
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __versioned__ = False
+
 class Notification(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     message = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(50), nullable=False)  # job_posted, application_update, mentorship_request, etc.
-    is_read = db.Column(db.Boolean, default=False)
+    # Old value loaded on change, for the unread counter (see notifications.py)
+    is_read = db.column_property(db.Column(db.Boolean, default=False), active_history=True)
     action_url = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='notifications')
     
+    __table_args__ = (
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_read_created', 'is_read', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -226,6 +345,48 @@ class Notification(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class NotificationCounter(db.Model):
+    """Unread notifications per user, maintained by the notifications module"""
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class NotificationDigest(db.Model):
+    """The summary notification standing in for a user's collapsed old unread notifications"""
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), primary_key=True)
+    notification_id = db.Column(db.String(36), nullable=False)
+    collapsed = db.Column(db.Integer, nullable=False, default=0)  # notifications it stands for
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PendingDelivery(db.Model):
+    """A socket event held for a user who was offline when it was sent (see delivery.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_pending_delivery_user_id', 'user_id', 'id'),
+    )
+
+class OutboxEvent(db.Model):
+    """A socket event committed with the change it reports, awaiting dispatch (see outbox.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    event = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)  # None once it has given up
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __versioned__ = False
+
+    __table_args__ = (
+        db.Index('ix_outbox_event_due', 'next_attempt_at', 'id'),
+    )
+
 class Project(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
@@ -252,6 +413,12 @@ class Project(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class DataVersion(db.Model):
+    """Per-table write counter, bumped after each committed write (see conditional.py)"""
+    name = db.Column(db.String(50), primary_key=True)  # table name
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 def create_default_admin():
     """Create default super admin if not exists"""
     admin = User.query.filter_by(email='admin@futuremesh.com', role='super_admin').first()
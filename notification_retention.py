@@ -0,0 +1,160 @@
+"""Retention and compaction of the notification table.
+
+Read notifications older than ``NOTIFICATION_RETENTION_DAYS`` are deleted.
+Unread ones older than ``NOTIFICATION_COLLAPSE_DAYS`` are folded into one
+summary notification per user, recorded in ``NotificationDigest`` so later
+runs add to it while it stays unread. Both work in batches of
+``NOTIFICATION_COMPACTION_BATCH`` rows, each its own short transaction,
+pausing between batches so request traffic is not starved of locks.
+
+    flask compact-notifications --retention-days 90 --collapse-days 30
+"""
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db, socketio
+from models import Notification, NotificationDigest
+from notifications import resync_unread
+from scheduler import scheduled
+
+DIGEST_TYPE = 'digest'
+
+
+def _pause():
+    # Yields to other green threads when run inside the server process
+    socketio.sleep(current_app.config['NOTIFICATION_COMPACTION_PAUSE'])
+
+
+def purge_read(cutoff, batch_size):
+    """Delete read notifications created before ``cutoff``; return how many were deleted"""
+    purged = 0
+    while True:
+        ids = db.session.execute(
+            db.select(Notification.id)
+            .where(Notification.is_read == True, Notification.created_at < cutoff)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return purged
+        result = db.session.execute(
+            db.delete(Notification).where(Notification.id.in_(ids), Notification.is_read == True),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        purged += result.rowcount
+        if len(ids) < batch_size:
+            return purged
+        _pause()
+
+
+def _digest_message(collapsed):
+    return f'{collapsed} older unread notifications were collapsed into this summary'
+
+
+def _fold_into_digests(collapsed, now):
+    """Add ``{user_id: count}`` collapsed notifications to each user's unread digest"""
+    digests = NotificationDigest.__table__
+    live = {
+        row.user_id: row for row in db.session.execute(
+            db.select(digests.c.user_id, digests.c.notification_id, digests.c.collapsed)
+            .join(Notification, Notification.id == digests.c.notification_id)
+            .where(digests.c.user_id.in_(collapsed), Notification.is_read == False)
+        )
+    }
+
+    for user_id, row in live.items():
+        total = row.collapsed + collapsed[user_id]
+        db.session.execute(
+            db.update(Notification).where(Notification.id == row.notification_id)
+            .values(message=_digest_message(total)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            digests.update().where(digests.c.user_id == user_id).values(collapsed=total, updated_at=now)
+        )
+
+    # A digest that was read (or purged) is replaced by a new one
+    fresh = [user_id for user_id in collapsed if user_id not in live]
+    if fresh:
+        rows = [{
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'title': 'Older notifications',
+            'message': _digest_message(collapsed[user_id]),
+            'type': DIGEST_TYPE,
+            'action_url': '/notifications',
+            'created_at': now,
+        } for user_id in fresh]
+        db.session.execute(db.insert(Notification), rows)
+        db.session.execute(digests.delete().where(digests.c.user_id.in_(fresh)))
+        db.session.execute(digests.insert(), [{
+            'user_id': row['user_id'], 'notification_id': row['id'],
+            'collapsed': collapsed[row['user_id']], 'updated_at': now
+        } for row in rows])
+
+
+def collapse_unread(cutoff, batch_size):
+    """Fold unread notifications created before ``cutoff`` into per-user digests; return how many were folded"""
+    folded = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Notification.id, Notification.user_id)
+            .where(Notification.is_read == False, Notification.created_at < cutoff,
+                   Notification.type != DIGEST_TYPE)
+            .order_by(Notification.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return folded
+
+        result = db.session.execute(
+            db.delete(Notification).where(Notification.id.in_([row.id for row in rows]),
+                                          Notification.is_read == False),
+            execution_options={'synchronize_session': False}
+        )
+        collapsed = Counter(row.user_id for row in rows)
+        _fold_into_digests(collapsed, datetime.utcnow())
+        # Recount rather than subtract: a row read concurrently was not deleted
+        resync_unread(db.session, list(collapsed))
+        db.session.commit()
+        folded += result.rowcount
+        if len(rows) < batch_size:
+            return folded
+        _pause()
+
+
+def compact_notifications(retention_days=None, collapse_days=None, batch_size=None):
+    """Run both retention steps; return ``{'purged', 'collapsed'}`` row counts"""
+    config = current_app.config
+    retention_days = retention_days if retention_days is not None else config['NOTIFICATION_RETENTION_DAYS']
+    collapse_days = collapse_days if collapse_days is not None else config['NOTIFICATION_COLLAPSE_DAYS']
+    batch_size = batch_size or config['NOTIFICATION_COMPACTION_BATCH']
+    now = datetime.utcnow()
+
+    report = {'purged': 0, 'collapsed': 0}
+    if retention_days:
+        report['purged'] = purge_read(now - timedelta(days=retention_days), batch_size)
+    if collapse_days:
+        report['collapsed'] = collapse_unread(now - timedelta(days=collapse_days), batch_size)
+    return report
+
+
+@scheduled('NOTIFICATION_COMPACTION_INTERVAL')
+def compact_notifications_task():
+    report = compact_notifications()
+    return f"{report['purged']} read notifications purged, {report['collapsed']} unread collapsed"
+
+
+@click.command('compact-notifications')
+@click.option('--retention-days', type=int, help='Delete read notifications older than this (0 keeps them).')
+@click.option('--collapse-days', type=int, help='Collapse unread notifications older than this (0 keeps them).')
+@click.option('--batch-size', type=int, help='Rows per transaction.')
+@with_appcontext
+def compact_notifications_command(retention_days, collapse_days, batch_size):
+    """Purge old read notifications and collapse old unread ones."""
+    report = compact_notifications(retention_days, collapse_days, batch_size)
+    click.echo(f"Purged {report['purged']} read notifications, collapsed {report['collapsed']} unread")
@@ -0,0 +1,186 @@
+"""Notifications and the per-user unread counter.
+
+``NotificationCounter`` holds each user's unread count, so badges never
+count notification rows. Every user gets a counter in the transaction that
+creates them (``flask init-db`` adds the missing ones of existing users).
+Notifications added, read or deleted through the session update it on
+flush; :func:`notify_many` and :func:`mark_read` keep it in step with their
+set-based statements. After the transaction commits, the new count is
+pushed to the user's socket room as ``unread_count``. Like presence, pushes
+reach sockets connected to this process only.
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event, func, inspect
+from extensions import db
+from models import User, Notification, NotificationCounter
+import presence
+import wire_format
+
+
+def send_notification(user_id, title, message, notification_type, action_url=None, commit=True):
+    notification = Notification(
+        user_id=user_id,
+        title=title,
+        message=message,
+        type=notification_type,
+        action_url=action_url
+    )
+    db.session.add(notification)
+    if commit:
+        db.session.commit()
+
+
+def notify_many(rows, commit=True):
+    """Insert notification ``rows`` (dicts of ``Notification`` columns) with one statement"""
+    if not rows:
+        return
+    db.session.execute(db.insert(Notification), rows)
+    adjust_unread(db.session, Counter(row['user_id'] for row in rows if not row.get('is_read')))
+    if commit:
+        db.session.commit()
+
+
+def mark_read(user_id, ids=None):
+    """Mark notifications ``ids`` of ``user_id`` (all when None) read with one UPDATE; return how many changed"""
+    query = db.update(Notification).where(Notification.user_id == user_id, Notification.is_read == False)
+    if ids is not None:
+        query = query.where(Notification.id.in_(ids))
+    result = db.session.execute(query.values(is_read=True), execution_options={'synchronize_session': False})
+    if result.rowcount:
+        adjust_unread(db.session, {user_id: -result.rowcount})
+    return result.rowcount
+
+
+def unread_count(user_id):
+    # Already read in this transaction if the count changed for an online user
+    count = db.session.info.get('unread_counts', {}).get(user_id)
+    if count is not None:
+        return count
+    count = db.session.execute(
+        db.select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)
+    ).scalar()
+    if count is None:
+        # A user from before counters, on a database not yet through init-db
+        count = db.session.execute(_count_unread(user_id)).scalar()
+    return count
+
+
+def start_counters(connection, user_ids):
+    """Add zeroed counters for newly created ``user_ids``"""
+    if user_ids:
+        now = datetime.utcnow()
+        connection.execute(NotificationCounter.__table__.insert(),
+                           [{'user_id': user_id, 'unread': 0, 'updated_at': now} for user_id in user_ids])
+
+
+def backfill_counters():
+    """Add the counters of users created before them, counted from their notifications; return how many"""
+    counters = NotificationCounter.__table__
+    result = db.session.execute(counters.insert().from_select(
+        ['user_id', 'unread', 'updated_at'],
+        db.select(
+            User.id,
+            db.select(func.count()).select_from(Notification)
+            .where(Notification.user_id == User.id, Notification.is_read == False).scalar_subquery(),
+            db.literal(datetime.utcnow())
+        ).where(~db.select(counters.c.user_id).where(counters.c.user_id == User.id).exists())
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def _count_unread(user_id):
+    return db.select(func.count()).select_from(Notification) \
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+
+
+def adjust_unread(session, deltas):
+    """Apply ``{user_id: change}`` to the unread counters in the session's transaction.
+
+    Users with the same change share one UPDATE, so notifying every admin
+    costs one statement rather than one per admin.
+    """
+    counters = NotificationCounter.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    groups = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            groups.setdefault(delta, []).append(user_id)
+
+    for delta, user_ids in groups.items():
+        result = connection.execute(
+            counters.update().where(counters.c.user_id.in_(user_ids))
+            .values(unread=counters.c.unread + delta, updated_at=now)
+        )
+        if result.rowcount < len(user_ids):
+            # First change for these users: start from their rows, which include this change
+            existing = set(connection.execute(
+                db.select(counters.c.user_id).where(counters.c.user_id.in_(user_ids))
+            ).scalars())
+            for user_id in user_ids:
+                if user_id not in existing:
+                    connection.execute(counters.insert().values(
+                        user_id=user_id, unread=_count_unread(user_id).scalar_subquery(), updated_at=now
+                    ))
+
+    _stash_counts(session, [user_id for user_ids in groups.values() for user_id in user_ids])
+
+
+def resync_unread(session, user_ids):
+    """Recount the unread counters of ``user_ids`` from their notification rows"""
+    counters = NotificationCounter.__table__
+    connection = session.connection()
+    recount = db.select(func.count()).select_from(Notification) \
+        .where(Notification.user_id == counters.c.user_id, Notification.is_read == False).scalar_subquery()
+    connection.execute(
+        counters.update().where(counters.c.user_id.in_(user_ids))
+        .values(unread=recount, updated_at=datetime.utcnow())
+    )
+    _stash_counts(session, user_ids)
+
+
+def _stash_counts(session, user_ids):
+    # Read the new counts of online users now: after_commit cannot query
+    online = [user_id for user_id in user_ids if presence.is_online(user_id)]
+    if online:
+        counters = NotificationCounter.__table__
+        session.info.setdefault('unread_counts', {}).update(session.connection().execute(
+            db.select(counters.c.user_id, counters.c.unread).where(counters.c.user_id.in_(online))
+        ).all())
+
+
+def _unread(notification):
+    return not notification.is_read
+
+
+@event.listens_for(db.session, 'after_flush')
+def _count_flushed(session, flush_context):
+    start_counters(session.connection(), [user.id for user in session.new if isinstance(user, User)])
+    deltas = Counter()
+    for notification in session.new:
+        if isinstance(notification, Notification) and _unread(notification):
+            deltas[notification.user_id] += 1
+    for notification in session.deleted:
+        if isinstance(notification, Notification) and _unread(notification):
+            deltas[notification.user_id] -= 1
+    for notification in session.dirty:
+        if isinstance(notification, Notification):
+            history = inspect(notification).attrs.is_read.history
+            if history.has_changes():
+                was_unread = not (history.deleted and history.deleted[0])
+                deltas[notification.user_id] += _unread(notification) - was_unread
+    if deltas:
+        adjust_unread(session, deltas)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _push_counts(session):
+    for user_id, count in session.info.pop('unread_counts', {}).items():
+        wire_format.send('unread_count', {'unread_count': count}, to=user_id)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('unread_counts', None)
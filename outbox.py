@@ -0,0 +1,162 @@
+"""Real-time events committed together with the change they report.
+
+A route records its events with :func:`publish` (or :func:`notify`, which
+also stores the ``Notification``) before it commits, so an event exists if
+and only if its change does. The request returns without emitting anything.
+
+The dispatcher drains ``OutboxEvent`` in the order events became due (id
+order, until an event is retried), ``OUTBOX_BATCH`` rows per transaction,
+and deletes each row in the transaction that delivered it. It runs in a
+loop of its own, not among the scheduled tasks, so a long maintenance task
+never holds events back:
+
+    python app.py                  # runs it in the server process, unless OUTBOX_DISPATCHER_ENABLED=0
+    flask dispatch-outbox          # a dedicated process, next to gunicorn; needs SOCKETIO_MESSAGE_QUEUE
+
+With ``SOCKETIO_MESSAGE_QUEUE`` set, each event is emitted to the user's
+room through the queue and reaches their sockets in any process. Offline
+users find notifications in their list, because :func:`notify` stores
+them. Without a queue, emits only reach this process's sockets. Events for
+users with no socket here go to their pending deliveries instead, so the
+dispatcher must run inside the single server process, and
+``flask dispatch-outbox`` refuses to start.
+
+An event whose emit fails is retried with exponential backoff, up to
+``OUTBOX_MAX_ATTEMPTS`` times, and so reaches its user after newer events. After that it stays in the table, with its
+last error, for inspection.
+
+Delivery is at least once: a dispatcher stopped between an emit and its
+commit sends the batch again on restart. Events carry their notification's
+id so clients can drop repeats.
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db, socketio
+from models import Notification, OutboxEvent
+from serializers import notification_serializer
+import delivery
+import wire_format
+
+
+def publish(user_id, event, data):
+    """Send ``event`` to ``user_id`` once the session commits; dropped if it rolls back"""
+    db.session.add(OutboxEvent(user_id=user_id, event=event, payload=json.dumps(data, default=_isoformat)))
+
+
+def notify(user_id, title, message, notification_type, action_url=None):
+    """Store a notification and publish it as a ``notification`` event, in the caller's transaction"""
+    # Fields set here rather than by column defaults, so the event needs no flush
+    notification = Notification(
+        id=str(uuid.uuid4()), user_id=user_id, title=title, message=message, type=notification_type,
+        is_read=False, action_url=action_url, created_at=datetime.utcnow()
+    )
+    db.session.add(notification)
+    publish(user_id, 'notification', {
+        field: getattr(notification, field) for field in notification_serializer.fields
+    })
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dispatch_pending(batch_size, max_attempts, retry_base):
+    """Deliver due outbox events, a batch per transaction; return ``(delivered, failed)``"""
+    delivered = failed = 0
+    while True:
+        now = datetime.utcnow()
+        rows = db.session.execute(
+            db.select(OutboxEvent.id, OutboxEvent.user_id, OutboxEvent.event, OutboxEvent.payload,
+                      OutboxEvent.attempts)
+            .where(OutboxEvent.next_attempt_at <= now)
+            .order_by(OutboxEvent.next_attempt_at, OutboxEvent.id)
+            .limit(batch_size)
+            # A second dispatcher waits for this batch rather than sending it too
+            .with_for_update()
+        ).all()
+        if not rows:
+            return delivered, failed
+
+        done = []
+        for row in rows:
+            try:
+                _deliver(row.user_id, row.event, json.loads(row.payload))
+            except Exception as e:
+                attempts = row.attempts + 1
+                retry_at = now + timedelta(seconds=retry_base * 2 ** row.attempts) if attempts < max_attempts else None
+                db.session.execute(
+                    db.update(OutboxEvent).where(OutboxEvent.id == row.id)
+                    .values(attempts=attempts, next_attempt_at=retry_at, last_error=str(e))
+                )
+                failed += 1
+            else:
+                done.append(row.id)
+        if done:
+            db.session.execute(db.delete(OutboxEvent).where(OutboxEvent.id.in_(done)))
+        db.session.commit()
+        delivered += len(done)
+        if len(rows) < batch_size:
+            return delivered, failed
+
+
+def _deliver(user_id, event, data):
+    if current_app.config['SOCKETIO_MESSAGE_QUEUE']:
+        # Rooms span processes: presence here says nothing about the user's other sockets
+        wire_format.send(event, data, to=user_id)
+    else:
+        delivery.push(user_id, event, data)
+
+
+def dispatch(app):
+    """Drain the outbox once; return ``(delivered, failed)``"""
+    config = app.config
+    with app.app_context():
+        try:
+            return dispatch_pending(
+                config['OUTBOX_BATCH'], config['OUTBOX_MAX_ATTEMPTS'], config['OUTBOX_RETRY_BASE_SECONDS']
+            )
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('Outbox dispatch failed')
+            return 0, 0
+
+
+def run_forever(app, sleep=time.sleep):
+    while True:
+        start = time.perf_counter()
+        delivered, failed = dispatch(app)
+        if delivered or failed:
+            app.logger.info('Outbox: %d events dispatched, %d failed (%.0f ms)',
+                            delivered, failed, (time.perf_counter() - start) * 1000)
+        sleep(app.config['OUTBOX_DISPATCH_INTERVAL'])
+
+
+def start_background(app):
+    """Run the dispatcher as a Socket.IO background task of this process"""
+    socketio.start_background_task(run_forever, app, socketio.sleep)
+
+
+@click.command('dispatch-outbox')
+@click.option('--once', is_flag=True, help='Drain the outbox once and exit.')
+@with_appcontext
+def dispatch_outbox_command(once):
+    """Deliver the real-time events of the outbox."""
+    app = current_app._get_current_object()
+    if not app.config['SOCKETIO_MESSAGE_QUEUE']:
+        # Nobody is online in this process: every event would wait in pending deliveries
+        raise click.ClickException(
+            'Set SOCKETIO_MESSAGE_QUEUE to dispatch from a separate process; '
+            'without a message queue, the dispatcher runs inside `python app.py`'
+        )
+    if once:
+        delivered, failed = dispatch(app)
+        click.echo(f'{delivered} events dispatched, {failed} failed')
+    else:
+        run_forever(app)
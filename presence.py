@@ -0,0 +1,106 @@
+"""Who is connected, and which sockets care.
+
+A user may hold several sockets (tabs); they come online with the first and
+go offline with the last. Presence changes are only interesting to the
+counterpart role of the same department (students see alumni and vice
+versa, as in the mentorship sidebar), so every socket joins the watch room
+of the users it wants to hear about and changes are emitted to the room of
+the user's own (department, role) only.
+
+The online users of each (department, role) are indexed, together with the
+sidebar entry (name, picture) of each, so listing who is online costs in
+proportion to the number online and loads only entries not cached yet.
+"""
+import threading
+
+# role -> role whose presence it follows
+WATCHES = {'student': 'alumni', 'alumni': 'student'}
+
+_lock = threading.Lock()
+_sids = {}  # user id -> set of sids
+_connections = {}  # sid -> (user id, department, role)
+_online = {}  # (department, role) -> set of online user ids
+_entries = {}  # user id -> sidebar entry, for online users
+_generation = 0
+
+
+def room(department, role):
+    """Room of the sockets watching users of ``role`` in ``department``"""
+    return f'presence:{department}:{role}'
+
+
+def watch_room(department, role):
+    """Room a ``role`` user of ``department`` joins, or None if it follows nobody"""
+    watched = WATCHES.get(role)
+    return room(department, watched) if watched else None
+
+
+def add(user_id, sid, department, role):
+    """Register a connection; True if it brings the user online"""
+    with _lock:
+        _connections[sid] = (user_id, department, role)
+        sids = _sids.setdefault(user_id, set())
+        sids.add(sid)
+        if len(sids) > 1:
+            return False
+        _online.setdefault((department, role), set()).add(user_id)
+        return True
+
+
+def remove(sid):
+    """Forget a connection; return (user id, department, role, went offline) or None"""
+    with _lock:
+        connection = _connections.pop(sid, None)
+        if connection is None:
+            return None
+        user_id, department, role = connection
+        sids = _sids.get(user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if sids:
+                return connection + (False,)
+            del _sids[user_id]
+        online = _online.get((department, role))
+        if online is not None:
+            online.discard(user_id)
+            if not online:
+                del _online[(department, role)]
+        _entries.pop(user_id, None)
+        return connection + (True,)
+
+
+def is_online(user_id):
+    return user_id in _sids
+
+
+
+def online_entries(department, role, load):
+    """Sidebar entries of the online ``role`` users of ``department``.
+
+    ``load(user_ids)`` returns a dict of entries for the ids not cached yet.
+    """
+    with _lock:
+        user_ids = list(_online.get((department, role), ()))
+        entries = {user_id: _entries[user_id] for user_id in user_ids if user_id in _entries}
+        generation = _generation
+    missing = [user_id for user_id in user_ids if user_id not in entries]
+    if missing:
+        loaded = load(missing)
+        with _lock:
+            # Skip the store if the users changed while we were loading
+            if generation == _generation:
+                _entries.update((user_id, entry) for user_id, entry in loaded.items() if user_id in _sids)
+        entries.update(loaded)
+    return sorted(entries.values(), key=lambda entry: entry['name'])
+
+
+def forget_entries(user_ids):
+    """Drop cached entries of changed users (all of them when ``user_ids`` is None)"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if user_ids is None:
+            _entries.clear()
+        else:
+            for user_id in user_ids:
+                _entries.pop(user_id, None)
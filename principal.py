@@ -0,0 +1,183 @@
+"""The authenticated principal of a request.
+
+The principal's role, department and activity come from the user's
+``User.to_dict()`` snapshot, kept per process in a TTL cache, so most
+requests need no database access for authorization. Handlers read the rest
+of the snapshot as ``principal.profile``, or ``principal.load_user()`` for a
+row they will modify. Access tokens still carry ``role``, ``department`` and
+``is_active`` claims for clients, but the server never trusts them: a token
+outlives a deactivation or a role change.
+
+A committed change to a user drops its snapshot in the process that made
+it, so the change applies there at once. The cache is not shared: other
+workers apply it when their snapshot expires, within
+``PRINCIPAL_CACHE_TTL`` seconds. Each snapshot keeps the ``user`` write
+counter read in the same statement as its row, and a conditional GET, which
+reads that counter anyway, reloads an older snapshot before answering; its
+ETag and its authorization therefore never rest on a stale profile.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g
+from flask_jwt_extended import create_access_token, get_jwt
+from sqlalchemy import event, inspect
+from extensions import db, jwt
+from models import DataVersion, User
+
+CLAIM_COLUMNS = ('role', 'department', 'is_active')
+
+_lock = threading.Lock()
+_profiles = OrderedDict()  # user id -> (expires at, user table version, to_dict snapshot)
+_generation = 0
+_listeners = []
+
+
+def on_invalidate(listener):
+    """Call ``listener(user_ids)`` after users change; ``user_ids`` is None for bulk updates"""
+    _listeners.append(listener)
+    return listener
+
+
+def token_claims(user):
+    return {column: getattr(user, column) for column in CLAIM_COLUMNS}
+
+
+def issue_token(user):
+    """Create an access token for ``user`` carrying its principal claims"""
+    return create_access_token(identity=user.id, additional_claims=token_claims(user))
+
+
+def load_profile(user_id):
+    """Return the ``User.to_dict()`` snapshot of ``user_id``, or None if there is no such user"""
+    return _snapshot(user_id)[1]
+
+
+def _snapshot(user_id, min_version=None):
+    # (user table version the snapshot was read at, snapshot); the version is
+    # None when unknown, and a snapshot older than min_version is reloaded
+    now = time.monotonic()
+    with _lock:
+        cached = _profiles.get(user_id)
+        if cached is not None and cached[0] > now and (
+                min_version is None or (cached[1] is not None and cached[1] >= min_version)):
+            _profiles.move_to_end(user_id)
+            return cached[1:]
+        generation = _generation
+
+    row = db.session.execute(
+        db.select(User, DataVersion.version)
+        .outerjoin(DataVersion, DataVersion.name == User.__tablename__)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None, None
+    user, version = row.User, row.version or 0
+    profile = user.to_dict()
+    if user in db.session.dirty:
+        return None, profile
+
+    with _lock:
+        # Skip the store if a commit invalidated users while we were loading
+        if generation == _generation:
+            _profiles[user_id] = (now + current_app.config['PRINCIPAL_CACHE_TTL'], version, profile)
+            _profiles.move_to_end(user_id)
+            while len(_profiles) > current_app.config['PRINCIPAL_CACHE_SIZE']:
+                _profiles.popitem(last=False)
+    return version, profile
+
+
+class Principal:
+    __slots__ = ('id', 'role', 'department', 'is_active', 'version', '_profile')
+
+    def __init__(self, user_id, role, department, is_active, profile=None, version=None):
+        self.id = user_id
+        self.role = role
+        self.department = department
+        self.is_active = is_active is not False
+        self.version = version
+        self._profile = profile
+
+    @classmethod
+    def from_claims(cls, claims, min_version=None):
+        user_id = claims['sub']
+        version, profile = _snapshot(user_id, min_version)
+        if profile is None:
+            return cls(user_id, None, None, False)
+        return cls(user_id, profile['role'], profile['department'], profile['is_active'], profile, version)
+
+    @property
+    def profile(self):
+        if self._profile is None:
+            self._profile = load_profile(self.id)
+        return self._profile
+
+    def load_user(self):
+        """The full ``User`` row, for handlers that modify it"""
+        return db.session.get(User, self.id)
+
+
+def current_principal(min_version=None):
+    """The request's principal; reloaded if its snapshot predates ``min_version`` of the user table"""
+    principal = g.get('principal')
+    stale = min_version is not None and (principal is None or principal.version is None
+                                         or principal.version < min_version)
+    if principal is None or stale:
+        principal = g.principal = Principal.from_claims(get_jwt(), min_version)
+    return principal
+
+
+@jwt.token_in_blocklist_loader
+def _deactivated(jwt_header, jwt_payload):
+    if jwt_payload.get('type') != 'access':
+        return False
+    principal = g.principal = Principal.from_claims(jwt_payload)
+    return not principal.is_active
+
+
+def _changed_columns(user):
+    ignored = User.__version_ignore__
+    return {attr.key for attr in inspect(user).attrs if attr.key not in ignored and attr.history.has_changes()}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_user_changes(session, flush_context):
+    changes = session.info.setdefault('principal_changes', set())
+    for user in session.dirty:
+        if isinstance(user, User) and _changed_columns(user):
+            changes.add(user.id)
+    for user in session.deleted:
+        if isinstance(user, User):
+            changes.add(user.id)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_user_changes(orm_execute_state):
+    state = orm_execute_state
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None and state.bind_mapper.class_ is User:
+        state.session.info['principal_changes_all'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate(session):
+    global _generation
+    changes = session.info.pop('principal_changes', None)
+    bulk = session.info.pop('principal_changes_all', False)
+    if not changes and not bulk:
+        return
+
+    with _lock:
+        _generation += 1
+        if bulk:
+            _profiles.clear()
+        for user_id in changes or ():
+            _profiles.pop(user_id, None)
+
+    for listener in _listeners:
+        listener(None if bulk else list(changes))
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard(session, previous_transaction):
+    session.info.pop('principal_changes', None)
+    session.info.pop('principal_changes_all', None)
@@ -0,0 +1,87 @@
+"""Per-endpoint query budgets and repeated-statement (N+1) detection.
+
+``QUERY_BUDGET_MODE`` controls enforcement: ``off`` (default in production),
+``warn`` (log) or ``raise`` (fail the request, for tests). Statements are
+counted by the hooks in :mod:`metrics`; this module only holds the policy.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view or socket handler may run"""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def statement_shape(statement):
+    """Collapse expanded ``IN (?, ?, ...)`` lists so they compare as one shape"""
+    return _PLACEHOLDER_LIST.sub('(?)', statement)
+
+
+def check_query_budget(label, budget):
+    """Check the statements recorded for the current request or event"""
+    mode = current_app.config['QUERY_BUDGET_MODE']
+    shapes = g.get('query_shapes')
+    if mode == 'off' or shapes is None:
+        return
+
+    problems = []
+    if budget is not None and g.query_count > budget:
+        problems.append(f'{g.query_count} queries (budget {budget})')
+
+    threshold = current_app.config['QUERY_REPEAT_THRESHOLD']
+    repeated = Counter()
+    for statement, count in shapes.items():
+        repeated[statement_shape(statement)] += count
+    for shape, count in repeated.most_common():
+        if count < threshold:
+            break
+        problems.append(f'possible N+1, {count}x: {" ".join(shape.split())[:300]}')
+
+    if problems:
+        message = f'{label}: ' + '; '.join(problems)
+        if mode == 'raise':
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning('Query budget: %s', message)
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'after_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'after_cursor_execute', record)
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """Test helper: fail if the block executes more than ``max_queries`` statements
+
+        with assert_max_queries(4):
+            client.get('/api/jobs', headers=headers)
+    """
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > max_queries:
+        listing = '\n'.join(f'  {i + 1}. {" ".join(s.split())}' for i, s in enumerate(statements))
+        raise AssertionError(f'{len(statements)} queries executed, expected at most {max_queries}:\n{listing}')
@@ -0,0 +1,55 @@
+"""Per-connection token-bucket limiting of Socket.IO events.
+
+Each socket gets a bucket of ``SOCKET_RATE_BURST`` tokens refilled at
+``SOCKET_RATE_LIMIT`` tokens per second. Handlers declare what an event
+costs with ``@rate_limited(cost)``; events arriving with too few tokens are
+dropped, and the client is told once per exhausted bucket.
+"""
+import threading
+import time
+from functools import wraps
+from flask import current_app, request
+from wire_format import reply
+
+_lock = threading.Lock()
+_buckets = {}  # sid -> [tokens, last refill, client notified]
+
+
+def take(sid, cost):
+    """Spend ``cost`` tokens from the bucket of ``sid``; return (allowed, first refusal)"""
+    rate = current_app.config['SOCKET_RATE_LIMIT']
+    burst = current_app.config['SOCKET_RATE_BURST']
+    now = time.monotonic()
+    with _lock:
+        bucket = _buckets.get(sid)
+        if bucket is None:
+            bucket = _buckets[sid] = [burst, now, False]
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            bucket[2] = False
+            return True, False
+        first_refusal = not bucket[2]
+        bucket[2] = True
+        return False, first_refusal
+
+
+def forget(sid):
+    with _lock:
+        _buckets.pop(sid, None)
+
+
+def rate_limited(cost=1):
+    """Drop the event when the sending socket has run out of tokens"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            allowed, first_refusal = take(request.sid, cost)
+            if not allowed:
+                if first_refusal:
+                    reply('error', {'message': 'Rate limit exceeded, slow down'})
+                return None
+            return handler(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,51 +1,58 @@
-from flask import request, jsonify, render_template, redirect, url_for, session, send_from_directory
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, current_app, request, jsonify, render_template, redirect, url_for, session, send_from_directory
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
-from app import app, db, mail
-from models import User, Job, JobApplication, ChatMessage, MentorshipRequest, Notification, Project
+from extensions import db, mail
+from models import User, Job, JobApplication, ChatMessage, MentorshipRequest, MentorRecommendation, Notification, Project
+from conditional import conditional
+from principal import current_principal, issue_token, token_claims
+from analytics import transition_application, funnel, rolled_up_at, GROUPS, INTERVALS
+from job_expiry import is_open
+from user_import import read_rows, import_users, IMPORT_ROLES
+from chat_archive import history as chat_history
+from mentor_recommendations import request_refresh, recommended, MATCH_FIELDS as MENTOR_MATCH_FIELDS
+from notifications import send_notification, mark_read, unread_count
+from query_budget import query_budget
+from department_applications import parse_query as parse_department_query, search as search_department_applications
+from dashboard import (bootstrap as dashboard_bootstrap, stats as dashboard_stats, jobs as visible_jobs,
+                       applications as visible_applications, mentorship_requests as visible_mentorship_requests,
+                       notifications as latest_notifications)
 from datetime import datetime, timedelta
+from itertools import islice
 import json
 import os
 from flask_mail import Message
+import outbox
 
-# Utility functions
-def send_notification(user_id, title, message, notification_type, action_url=None):
-    notification = Notification(
-        user_id=user_id,
-        title=title,
-        message=message,
-        type=notification_type,
-        action_url=action_url
-    )
-    db.session.add(notification)
-    db.session.commit()
+pages = Blueprint('pages', __name__)
+api = Blueprint('api', __name__)
 
+# Utility functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'pdf', 'doc', 'docx', 'png', 'jpg', 'jpeg'}
 
 # Frontend Routes
-@app.route('/')
+@pages.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/login')
+@pages.route('/login')
 def login_page():
     return render_template('login.html')
 
-@app.route('/register')
+@pages.route('/register')
 def register_page():
     return render_template('register.html')
 
-@app.route('/dashboard')
+@pages.route('/dashboard')
 def dashboard():
     return render_template('dashboard.html')
 
-@app.route('/uploads/<path:filename>')
+@pages.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
 
 # Authentication API Routes
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     try:
         data = request.get_json()
@@ -74,10 +81,14 @@ def register():
         user.set_password(data['password'])
         
         db.session.add(user)
+        if user.role == 'student':
+            # Flushed first: the id is only assigned on insert
+            db.session.flush()
+            request_refresh('student', user.id)
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = issue_token(user)
         
         return jsonify({
             'message': 'User registered successfully',
@@ -88,7 +99,7 @@ def register():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -98,7 +109,7 @@ def login():
             user.last_login = datetime.utcnow()
             db.session.commit()
             
-            access_token = create_access_token(identity=user.id)
+            access_token = issue_token(user)
             
             return jsonify({
                 'message': 'Login successful',
@@ -111,32 +122,34 @@ def login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/profile', methods=['GET'])
+@api.route('/api/profile', methods=['GET'])
+@query_budget(2)
 @jwt_required()
+@conditional(User)
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        profile = current_principal().profile
         
-        if not user:
+        if not profile:
             return jsonify({'error': 'User not found'}), 404
             
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': profile}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/profile', methods=['PUT'])
+@api.route('/api/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal().load_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         data = request.get_json()
+        claims = token_claims(user)
+        department = user.department
         
         # Update user fields
         for field in ['first_name', 'last_name', 'department', 'company', 'designation', 
@@ -145,65 +158,49 @@ def update_profile():
             if field in data:
                 setattr(user, field, data[field])
         
+        # Rescore mentor recommendations that depend on the changed fields
+        if any(field in data for field in MENTOR_MATCH_FIELDS):
+            if user.role == 'student':
+                request_refresh('student', user.id)
+            elif user.role == 'alumni':
+                request_refresh('department', department)
+                if user.department != department:
+                    request_refresh('department', user.department)
+        
         db.session.commit()
         
-        return jsonify({
+        response = {
             'message': 'Profile updated successfully',
             'user': user.to_dict()
-        }), 200
+        }
+        # The old token's claims are stale: hand out one matching the profile
+        if token_claims(user) != claims:
+            response['access_token'] = issue_token(user)
+        
+        return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Job Management API Routes
-@app.route('/api/jobs', methods=['GET'])
+@api.route('/api/jobs', methods=['GET'])
+@query_budget(3)
 @jwt_required()
+@conditional(Job)
 def get_jobs():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if user.role == 'student':
-            # Filter jobs based on student eligibility
-            jobs = Job.query.filter_by(status='approved').all()
-            eligible_jobs = []
-            
-            for job in jobs:
-                if job.department == user.department:
-                    if job.min_cgpa and user.cgpa and user.cgpa >= job.min_cgpa:
-                        if job.eligible_years:
-                            eligible_years = json.loads(job.eligible_years)
-                            if user.graduation_year in eligible_years:
-                                eligible_jobs.append(job.to_dict())
-                        else:
-                            eligible_jobs.append(job.to_dict())
-            
-            return jsonify({'jobs': eligible_jobs}), 200
-            
-        elif user.role in ['admin', 'super_admin']:
-            jobs = Job.query.all()
-            return jsonify({'jobs': [job.to_dict() for job in jobs]}), 200
-            
-        elif user.role == 'hod':
-            jobs = Job.query.filter_by(department=user.department, status='approved').all()
-            return jsonify({'jobs': [job.to_dict() for job in jobs]}), 200
-            
-        elif user.role == 'hr':
-            jobs = Job.query.filter_by(posted_by=user_id).all()
-            return jsonify({'jobs': [job.to_dict() for job in jobs]}), 200
-            
-        else:
-            return jsonify({'jobs': []}), 200
+        return jsonify({'jobs': visible_jobs(current_principal())}), 200
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/jobs', methods=['POST'])
+@api.route('/api/jobs', methods=['POST'])
+@query_budget(8)
 @jwt_required()
 def create_job():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         if user.role != 'hr':
             return jsonify({'error': 'Only HR can post jobs'}), 403
@@ -229,33 +226,40 @@ def create_job():
         )
         
         db.session.add(job)
-        db.session.commit()
+        db.session.flush()
         
-        # Notify admins
-        admins = User.query.filter(User.role.in_(['admin', 'super_admin'])).all()
-        for admin in admins:
+        # Notify admins, in the same transaction as the job
+        admin_ids = db.session.execute(
+            db.select(User.id).where(User.role.in_(['admin', 'super_admin']))
+        ).scalars()
+        for admin_id in admin_ids:
             send_notification(
-                admin.id,
+                admin_id,
                 'New Job Posted',
                 f'New job "{job.title}" at {job.company} requires approval',
                 'job_posted',
-                f'/jobs/{job.id}'
+                f'/jobs/{job.id}',
+                commit=False
             )
         
+        job_data = job.to_dict()
+        db.session.commit()
+        
         return jsonify({
             'message': 'Job posted successfully',
-            'job': job.to_dict()
+            'job': job_data
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/jobs/<job_id>/approve', methods=['POST'])
+@api.route('/api/jobs/<job_id>/approve', methods=['POST'])
+@query_budget(9)
 @jwt_required()
 def approve_job(job_id):
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         if user.role not in ['admin', 'super_admin']:
             return jsonify({'error': 'Only admins can approve jobs'}), 403
@@ -266,30 +270,31 @@ def approve_job(job_id):
         
         job.status = 'approved'
         job.approved_by_admin = user_id
-        db.session.commit()
         
-        # Notify HOD
+        # Notify HOD, in the approval's transaction
         hod = User.query.filter_by(role='hod', department=job.department).first()
         if hod:
-            send_notification(
+            outbox.notify(
                 hod.id,
                 'New Job Approved',
                 f'Job "{job.title}" has been approved and forwarded to your department',
                 'job_approved',
                 f'/jobs/{job.id}'
             )
+        db.session.commit()
         
         return jsonify({'message': 'Job approved successfully'}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/jobs/<job_id>/apply', methods=['POST'])
+@api.route('/api/jobs/<job_id>/apply', methods=['POST'])
+@query_budget(10)
 @jwt_required()
 def apply_job(job_id):
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         if user.role != 'student':
             return jsonify({'error': 'Only students can apply for jobs'}), 403
@@ -302,6 +307,12 @@ def apply_job(job_id):
         if existing_application:
             return jsonify({'error': 'Already applied for this job'}), 400
         
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if not is_open(job):
+            return jsonify({'error': 'This job is no longer accepting applications'}), 400
+        
         data = request.get_json()
         
         application = JobApplication(
@@ -311,59 +322,77 @@ def apply_job(job_id):
         )
         
         db.session.add(application)
-        db.session.commit()
-        
-        # Notify HOD
-        job = Job.query.get(job_id)
-        hod = User.query.filter_by(role='hod', department=job.department).first()
-        if hod:
+        transition_application(application, 'applied', actor_id=user_id, job=job)
+        db.session.flush()
+        
+        # Notify HOD, in the same transaction as the application
+        hod_id = db.session.execute(
+            db.select(User.id).filter_by(role='hod', department=job.department).limit(1)
+        ).scalar()
+        if hod_id:
             send_notification(
-                hod.id,
+                hod_id,
                 'New Job Application',
-                f'{user.first_name} {user.last_name} applied for {job.title}',
+                f'{user.profile["first_name"]} {user.profile["last_name"]} applied for {job.title}',
                 'application_received',
-                f'/applications/{application.id}'
+                f'/applications/{application.id}',
+                commit=False
             )
         
+        application_data = application.to_dict()
+        db.session.commit()
+        
         return jsonify({
             'message': 'Application submitted successfully',
-            'application': application.to_dict()
+            'application': application_data
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Application Management
-@app.route('/api/applications', methods=['GET'])
+@api.route('/api/applications', methods=['GET'])
+@query_budget(4)
 @jwt_required()
+@conditional(JobApplication, Job)
 def get_applications():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if user.role == 'student':
-            applications = JobApplication.query.filter_by(student_id=user_id).all()
-        elif user.role == 'hod':
-            # Get applications for jobs in HOD's department
-            dept_jobs = Job.query.filter_by(department=user.department).all()
-            job_ids = [job.id for job in dept_jobs]
-            applications = JobApplication.query.filter(JobApplication.job_id.in_(job_ids)).all()
-        else:
-            applications = JobApplication.query.all()
-        
         return jsonify({
-            'applications': [app.to_dict() for app in applications]
+            'applications': visible_applications(current_principal())
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/applications/<app_id>/shortlist', methods=['POST'])
+@api.route('/api/hod/applications', methods=['GET'])
+@query_budget(3)
+@jwt_required()
+@conditional(JobApplication, Job, User)
+def get_department_applications():
+    try:
+        user = current_principal()
+        if user.role != 'hod':
+            return jsonify({'error': 'Only HODs can list department applications'}), 403
+        
+        # Filters, sort and keyset page run in one indexed join (see department_applications.py)
+        try:
+            query = parse_department_query(request.args)
+            applications, next_cursor = search_department_applications(user.department, **query)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'applications': applications, 'next_cursor': next_cursor}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/applications/<app_id>/shortlist', methods=['POST'])
+@query_budget(10)
 @jwt_required()
 def shortlist_application(app_id):
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         if user.role != 'hod':
             return jsonify({'error': 'Only HODs can shortlist applications'}), 403
@@ -372,18 +401,18 @@ def shortlist_application(app_id):
         if not application:
             return jsonify({'error': 'Application not found'}), 404
         
-        application.status = 'shortlisted'
+        transition_application(application, 'shortlisted', actor_id=user_id)
         application.shortlisted_by = user_id
-        db.session.commit()
         
-        # Notify student
-        send_notification(
+        # Notify student, in the shortlisting's transaction
+        outbox.notify(
             application.student_id,
             'Application Shortlisted',
             f'Your application for {application.job.title} has been shortlisted',
             'application_update',
             f'/applications/{application.id}'
         )
+        db.session.commit()
         
         return jsonify({'message': 'Application shortlisted successfully'}), 200
         
@@ -391,12 +420,12 @@ def shortlist_application(app_id):
         return jsonify({'error': str(e)}), 500
 
 # Chat and Mentorship
-@app.route('/api/alumni', methods=['GET'])
+@api.route('/api/alumni', methods=['GET'])
 @jwt_required()
 def get_alumni():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         alumni = User.query.filter_by(role='alumni', department=user.department).all()
         
@@ -407,12 +436,28 @@ def get_alumni():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/mentorship-requests', methods=['POST'])
+@api.route('/api/mentors/recommended', methods=['GET'])
+@query_budget(2)
+@jwt_required()
+def get_recommended_mentors():
+    try:
+        user = current_principal()
+        
+        if user.role != 'student':
+            return jsonify({'error': 'Only students get mentor recommendations'}), 403
+        
+        return jsonify(recommended(user.id)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/mentorship-requests', methods=['POST'])
+@query_budget(12)
 @jwt_required()
 def create_mentorship_request():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = current_principal()
+        user_id = user.id
         
         if user.role != 'student':
             return jsonify({'error': 'Only students can request mentorship'}), 403
@@ -436,16 +481,22 @@ def create_mentorship_request():
         )
         
         db.session.add(request_obj)
-        db.session.commit()
+        # The student no longer gets this alumnus; the alumnus' load changed
+        request_refresh('student', user_id)
+        request_refresh('alumni', data['alumni_id'])
+        # Flushed first: the id is only assigned on insert
+        db.session.flush()
         
-        # Notify alumni
+        # Notify alumni, in the request's transaction
         send_notification(
             data['alumni_id'],
             'New Mentorship Request',
-            f'{user.first_name} {user.last_name} wants to connect with you',
+            f'{user.profile["first_name"]} {user.profile["last_name"]} wants to connect with you',
             'mentorship_request',
-            f'/mentorship/{request_obj.id}'
+            f'/mentorship/{request_obj.id}',
+            commit=False
         )
+        db.session.commit()
         
         return jsonify({
             'message': 'Mentorship request sent successfully',
@@ -455,28 +506,20 @@ def create_mentorship_request():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/mentorship-requests', methods=['GET'])
+@api.route('/api/mentorship-requests', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_mentorship_requests():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if user.role == 'student':
-            requests = MentorshipRequest.query.filter_by(student_id=user_id).all()
-        elif user.role == 'alumni':
-            requests = MentorshipRequest.query.filter_by(alumni_id=user_id).all()
-        else:
-            requests = MentorshipRequest.query.all()
-        
         return jsonify({
-            'requests': [req.to_dict() for req in requests]
+            'requests': visible_mentorship_requests(current_principal())
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/mentorship-requests/<req_id>/respond', methods=['POST'])
+@api.route('/api/mentorship-requests/<req_id>/respond', methods=['POST'])
+@query_budget(10)
 @jwt_required()
 def respond_mentorship_request(req_id):
     try:
@@ -493,18 +536,20 @@ def respond_mentorship_request(req_id):
         mentorship_request.status = data['status']  # accepted or rejected
         mentorship_request.response_message = data.get('response_message')
         mentorship_request.responded_at = datetime.utcnow()
+        # The alumnus' acceptance rate and load changed, and a declined student may get them again
+        request_refresh('student', mentorship_request.student_id)
+        request_refresh('alumni', user_id)
         
-        db.session.commit()
-        
-        # Notify student
+        # Notify student, in the response's transaction
         status_text = 'accepted' if data['status'] == 'accepted' else 'declined'
-        send_notification(
+        outbox.notify(
             mentorship_request.student_id,
             f'Mentorship Request {status_text.title()}',
             f'Your mentorship request has been {status_text}',
             'mentorship_response',
             f'/mentorship/{mentorship_request.id}'
         )
+        db.session.commit()
         
         return jsonify({'message': f'Request {status_text} successfully'}), 200
         
@@ -512,108 +557,195 @@ def respond_mentorship_request(req_id):
         return jsonify({'error': str(e)}), 500
 
 # Notifications
-@app.route('/api/notifications', methods=['GET'])
+@api.route('/api/notifications', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_notifications():
+    try:
+        return jsonify(latest_notifications(current_principal())), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/notifications/read', methods=['POST'])
+@query_budget(5)
+@jwt_required()
+def mark_notifications_read():
     try:
         user_id = get_jwt_identity()
-        notifications = Notification.query.filter_by(user_id=user_id).order_by(
-            Notification.created_at.desc()
-        ).limit(20).all()
+        data = request.get_json() or {}
+        
+        # One UPDATE for the whole selection: {"all": true} or {"ids": [...]}
+        if data.get('all'):
+            ids = None
+        else:
+            ids = data.get('ids')
+            if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+                return jsonify({'error': 'Provide "all": true or a list of notification "ids"'}), 400
+            if len(ids) > 1000:
+                return jsonify({'error': 'At most 1000 ids per request'}), 400
+        
+        updated = mark_read(user_id, ids)
+        count = unread_count(user_id)
+        db.session.commit()
         
         return jsonify({
-            'notifications': [notif.to_dict() for notif in notifications]
+            'message': f'{updated} notifications marked as read',
+            'updated': updated,
+            'unread_count': count
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/notifications/<notif_id>/read', methods=['POST'])
+@api.route('/api/notifications/<notif_id>/read', methods=['POST'])
+@query_budget(5)
 @jwt_required()
 def mark_notification_read(notif_id):
     try:
         user_id = get_jwt_identity()
-        notification = Notification.query.filter_by(id=notif_id, user_id=user_id).first()
-        
-        if not notification:
+        if not mark_read(user_id, [notif_id]) and not db.session.execute(
+            db.select(Notification.id).filter_by(id=notif_id, user_id=user_id)
+        ).first():
             return jsonify({'error': 'Notification not found'}), 404
         
-        notification.is_read = True
+        count = unread_count(user_id)
         db.session.commit()
         
-        return jsonify({'message': 'Notification marked as read'}), 200
+        return jsonify({'message': 'Notification marked as read', 'unread_count': count}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Chat history
+@api.route('/api/chat/<other_user_id>/messages', methods=['GET'])
+@query_budget(4)
+@jwt_required()
+def get_chat_messages(other_user_id):
+    try:
+        user_id = get_jwt_identity()
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+        
+        # Pages older than the hot table are read from the archive segments
+        try:
+            messages, next_cursor = chat_history(user_id, other_user_id, request.args.get('before'), limit)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        return jsonify({'messages': messages, 'next_cursor': next_cursor}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Analytics and Dashboard Data
-@app.route('/api/dashboard/stats', methods=['GET'])
+@api.route('/api/dashboard/stats', methods=['GET'])
+@query_budget(4)
 @jwt_required()
+@conditional(User, Job, JobApplication, ChatMessage, MentorshipRequest)
 def get_dashboard_stats():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        stats = {}
-        
-        if user.role == 'super_admin':
-            stats = {
-                'total_users': User.query.count(),
-                'total_students': User.query.filter_by(role='student').count(),
-                'total_alumni': User.query.filter_by(role='alumni').count(),
-                'total_jobs': Job.query.count(),
-                'pending_jobs': Job.query.filter_by(status='pending').count(),
-                'total_applications': JobApplication.query.count(),
-                'active_chats': ChatMessage.query.filter_by(is_read=False).count()
-            }
-        elif user.role == 'admin':
-            stats = {
-                'pending_approvals': Job.query.filter_by(status='pending').count(),
-                'total_jobs': Job.query.count(),
-                'total_applications': JobApplication.query.count(),
-                'active_students': User.query.filter_by(role='student', is_active=True).count()
-            }
-        elif user.role == 'hod':
-            dept_jobs = Job.query.filter_by(department=user.department).all()
-            job_ids = [job.id for job in dept_jobs]
-            stats = {
-                'department_jobs': len(dept_jobs),
-                'department_applications': JobApplication.query.filter(JobApplication.job_id.in_(job_ids)).count(),
-                'department_students': User.query.filter_by(role='student', department=user.department).count(),
-                'pending_shortlists': JobApplication.query.filter(
-                    JobApplication.job_id.in_(job_ids),
-                    JobApplication.status == 'applied'
-                ).count()
-            }
-        elif user.role == 'student':
-            stats = {
-                'applications_count': JobApplication.query.filter_by(student_id=user_id).count(),
-                'shortlisted_count': JobApplication.query.filter_by(student_id=user_id, status='shortlisted').count(),
-                'available_jobs': Job.query.filter_by(department=user.department, status='approved').count(),
-                'unread_messages': ChatMessage.query.filter_by(receiver_id=user_id, is_read=False).count()
-            }
-        elif user.role == 'alumni':
-            stats = {
-                'mentorship_requests': MentorshipRequest.query.filter_by(alumni_id=user_id, status='pending').count(),
-                'active_connections': MentorshipRequest.query.filter_by(alumni_id=user_id, status='accepted').count(),
-                'unread_messages': ChatMessage.query.filter_by(receiver_id=user_id, is_read=False).count(),
-                'total_students_helped': MentorshipRequest.query.filter_by(alumni_id=user_id, status='accepted').count()
-            }
+        return jsonify({'stats': dashboard_stats(current_principal())}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/dashboard/bootstrap', methods=['GET'])
+@query_budget(10)
+@jwt_required()
+@conditional(User, Job, JobApplication, ChatMessage, MentorshipRequest, Notification, MentorRecommendation)
+def get_dashboard_bootstrap():
+    try:
+        user = current_principal()
+        if not user.profile:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Profile, stats, notifications and the role's lists in one response
+        return jsonify(dashboard_bootstrap(user)), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/analytics/funnel', methods=['GET'])
+@query_budget(3)
+@jwt_required()
+def get_funnel_analytics():
+    try:
+        user = current_principal()
+        
+        # Funnel figures come from the rollup (see analytics.roll_up), never from live counts
+        filters = {}
+        if user.role == 'hod':
+            filters['department'] = user.department
         elif user.role == 'hr':
-            stats = {
-                'posted_jobs': Job.query.filter_by(posted_by=user_id).count(),
-                'approved_jobs': Job.query.filter_by(posted_by=user_id, status='approved').count(),
-                'total_applications': JobApplication.query.join(Job).filter(Job.posted_by == user_id).count(),
-                'pending_jobs': Job.query.filter_by(posted_by=user_id, status='pending').count()
-            }
+            filters['company'] = user.profile['company']
+        elif user.role not in ['admin', 'super_admin']:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        group_by = request.args.get('group_by', 'department')
+        interval = request.args.get('interval')
+        if group_by not in GROUPS:
+            return jsonify({'error': f'group_by must be one of {", ".join(GROUPS)}'}), 400
+        if interval and interval not in INTERVALS:
+            return jsonify({'error': f'interval must be one of {", ".join(INTERVALS)}'}), 400
+        for name in ('department', 'company', 'job_id'):
+            if request.args.get(name) and name not in filters:
+                filters[name] = request.args[name]
+        
+        try:
+            start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else None
+            end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else None
+        except ValueError:
+            return jsonify({'error': 'from and to must be YYYY-MM-DD dates'}), 400
+        
+        as_of = rolled_up_at()
+        return jsonify({
+            'funnel': funnel(group_by, interval, start, end, **filters),
+            'as_of': as_of.isoformat() if as_of else None
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/users/import', methods=['POST'])
+@jwt_required()
+def import_users_file():
+    try:
+        user = current_principal()
+        if user.role not in ['admin', 'super_admin']:
+            return jsonify({'error': 'Only admins can import users'}), 403
+        
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({'error': 'No file provided'}), 400
+        role = request.form.get('role')
+        if role and role not in IMPORT_ROLES:
+            return jsonify({'error': f'role must be one of {", ".join(IMPORT_ROLES)}'}), 400
+        
+        # Small files only: hashing runs in this request, not on a forked pool
+        limit = current_app.config['IMPORT_HTTP_MAX_ROWS']
+        reader = read_rows(file.stream, file.filename)
+        try:
+            rows = list(islice(reader, limit + 1))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        finally:
+            reader.close()
+        if len(rows) > limit:
+            return jsonify({
+                'error': f'Upload at most {limit} rows; import larger files with `flask import-users`'
+            }), 413
+        report = import_users(rows, role, workers=1)
         
-        return jsonify({'stats': stats}), 200
+        return jsonify({
+            'message': f"{report['created']} of {report['rows']} users imported",
+            **report
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # File Upload
-@app.route('/api/upload', methods=['POST'])
+@api.route('/api/upload', methods=['POST'])
 @jwt_required()
 def upload_file():
     try:
@@ -632,7 +764,9 @@ def upload_file():
             filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
             
             subfolder = 'resumes' if file_type == 'resume' else 'projects'
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], subfolder, filename)
+            folder = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
+            os.makedirs(folder, exist_ok=True)
+            file_path = os.path.join(folder, filename)
             
             file.save(file_path)
             
@@ -0,0 +1,70 @@
+"""Periodic maintenance tasks.
+
+Modules register tasks with ``@scheduled('<INTERVAL CONFIG KEY>')``. With
+several web workers run them in one dedicated process:
+
+    flask run-scheduler          # loop forever
+    flask run-scheduler --once   # run every task once, e.g. from cron
+
+``python app.py`` also runs them inside the server process unless
+``SCHEDULER_ENABLED=0``.
+"""
+import time
+from collections import namedtuple
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from extensions import db, socketio
+
+Task = namedtuple('Task', 'name interval_key function')
+
+_tasks = []
+
+
+def scheduled(interval_key):
+    """Run the decorated function every ``app.config[interval_key]`` seconds"""
+    def decorator(function):
+        _tasks.append(Task(function.__name__, interval_key, function))
+        return function
+    return decorator
+
+
+def run_task(app, task):
+    with app.app_context():
+        start = time.perf_counter()
+        try:
+            result = task.function()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('Scheduled task %s failed', task.name)
+            return
+        app.logger.info('Scheduled task %s: %s (%.0f ms)', task.name, result, (time.perf_counter() - start) * 1000)
+
+
+def run_forever(app, sleep=time.sleep):
+    next_run = {task.name: 0.0 for task in _tasks}
+    while True:
+        for task in _tasks:
+            if time.monotonic() >= next_run[task.name]:
+                run_task(app, task)
+                next_run[task.name] = time.monotonic() + app.config[task.interval_key]
+        sleep(max(0.5, min(next_run.values(), default=60) - time.monotonic()))
+
+
+def start_background(app):
+    """Run the scheduler as a Socket.IO background task of this process"""
+    socketio.start_background_task(run_forever, app, socketio.sleep)
+
+
+@click.command('run-scheduler')
+@click.option('--once', is_flag=True, help='Run every task once and exit.')
+@with_appcontext
+def run_scheduler_command(once):
+    """Run the periodic maintenance tasks."""
+    app = current_app._get_current_object()
+    click.echo('Tasks: ' + ', '.join(task.name for task in _tasks))
+    if once:
+        for task in _tasks:
+            run_task(app, task)
+    else:
+        run_forever(app)
@@ -0,0 +1,49 @@
+from extensions import db
+from models import Job, JobApplication, Notification
+
+
+class RowSerializer:
+    """Serialize query rows straight into dicts for a fixed set of columns.
+
+    List endpoints select only these columns and zip each row tuple with the
+    field names, skipping ORM object construction and the per-row ``to_dict``
+    / ``isoformat`` calls. Datetimes are left as-is for the JSON provider to
+    encode. Field names match the corresponding model ``to_dict`` output.
+    """
+
+    def __init__(self, *columns):
+        self.columns = columns
+        self.fields = tuple(column.key for column in columns)
+
+    def select(self):
+        return db.select(*self.columns)
+
+    def dump(self, row):
+        return dict(zip(self.fields, row))
+
+    def dump_rows(self, rows):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def all(self, statement):
+        return self.dump_rows(db.session.execute(statement))
+
+
+job_serializer = RowSerializer(
+    Job.id, Job.title, Job.company, Job.department, Job.description, Job.requirements,
+    Job.location, Job.job_type, Job.salary_min, Job.salary_max, Job.experience_required,
+    Job.skills_required, Job.min_cgpa, Job.eligible_years, Job.application_deadline,
+    Job.posted_by, Job.status, Job.created_at, Job.updated_at
+)
+
+application_serializer = RowSerializer(
+    JobApplication.id, JobApplication.job_id, JobApplication.student_id,
+    JobApplication.cover_letter, JobApplication.resume_path, JobApplication.status,
+    JobApplication.applied_at, JobApplication.updated_at, JobApplication.interview_date,
+    JobApplication.interview_notes, JobApplication.feedback
+)
+
+notification_serializer = RowSerializer(
+    Notification.id, Notification.user_id, Notification.title, Notification.message,
+    Notification.type, Notification.is_read, Notification.action_url, Notification.created_at
+)
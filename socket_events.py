@@ -1,68 +1,97 @@
-from flask_socketio import emit, join_room, leave_room
 from flask_jwt_extended import decode_token
 from flask import request
-from app import socketio, db
+from extensions import socketio, db
+from metrics import timed_event
+from query_budget import query_budget
 from models import User, ChatMessage
+from principal import Principal, on_invalidate
+from rate_limit import rate_limited, forget as forget_rate_limit
+from chat_archive import history as chat_history
+from db_routing import replica_reads, forget as forget_replica_stickiness
+import typing_state
+import wire_format
+from wire_format import join_room, leave_room, reply
+import delivery
+import outbox
+import presence
 from datetime import datetime
 import json
 
-# Store active users
-active_users = {}
-
 @socketio.on('connect')
+@timed_event
 def handle_connect(auth):
     try:
+        negotiated_format = wire_format.negotiate(request.sid, auth)
+        
         # Verify JWT token
         if auth and 'token' in auth:
             token = auth['token']
             decoded_token = decode_token(token)
             user_id = decoded_token['sub']
             
-            # Store user in active users
-            active_users[user_id] = request.sid
+            principal = Principal.from_claims(decoded_token)
+            if not principal.is_active:
+                reply('error', {'message': 'Account is deactivated'})
+                return
             
-            # Join user to their personal room
+            # Join user to their personal room, and to the presence room of
+            # the users they can see online
             join_room(user_id)
+            watch_room = presence.watch_room(principal.department, principal.role)
+            if watch_room:
+                join_room(watch_room)
+            came_online = presence.add(user_id, request.sid, principal.department, principal.role)
+            
+            reply('connected', {'message': 'Connected successfully', 'format': negotiated_format})
             
-            emit('connected', {'message': 'Connected successfully'})
+            # Events sent while the user was offline
+            delivery.replay(user_id, request.sid)
             
-            # Notify other users that this user is online
-            emit('user_online', {'user_id': user_id}, broadcast=True)
+            # Notify the users watching this user's department and role
+            if came_online:
+                wire_format.send('user_online', {'user_id': user_id},
+                                 to=presence.room(principal.department, principal.role))
             
         else:
-            emit('error', {'message': 'Authentication required'})
+            reply('error', {'message': 'Authentication required'})
             
     except Exception as e:
-        emit('error', {'message': 'Connection failed'})
+        reply('error', {'message': 'Connection failed'})
 
 @socketio.on('disconnect')
+@timed_event
 def handle_disconnect():
     try:
-        # Find and remove user from active users
-        user_id = None
-        for uid, sid in active_users.items():
-            if sid == request.sid:
-                user_id = uid
-                break
-        
-        if user_id:
-            del active_users[user_id]
+        typing_state.clear_sid(request.sid)
+        forget_rate_limit(request.sid)
+        forget_replica_stickiness(request.sid)
+        
+        connection = presence.remove(request.sid)
+        if connection:
+            user_id, department, role, went_offline = connection
             leave_room(user_id)
             
-            # Notify other users that this user is offline
-            emit('user_offline', {'user_id': user_id}, broadcast=True)
+            # Notify the users watching, once the user's last socket is gone
+            if went_offline:
+                wire_format.send('user_offline', {'user_id': user_id}, to=presence.room(department, role))
             
     except Exception as e:
         pass
+    finally:
+        wire_format.forget(request.sid)
 
 @socketio.on('join_chat')
+@timed_event
+@rate_limited(2)
+@query_budget(6)
+@replica_reads
 def handle_join_chat(data):
     try:
         token = data.get('token')
         other_user_id = data.get('other_user_id')
         
         if not token or not other_user_id:
-            emit('error', {'message': 'Token and other_user_id required'})
+            reply('error', {'message': 'Token and other_user_id required'})
             return
         
         decoded_token = decode_token(token)
@@ -73,11 +102,8 @@ def handle_join_chat(data):
         
         join_room(room_name)
         
-        # Get chat history
-        messages = ChatMessage.query.filter(
-            ((ChatMessage.sender_id == user_id) & (ChatMessage.receiver_id == other_user_id)) |
-            ((ChatMessage.sender_id == other_user_id) & (ChatMessage.receiver_id == user_id))
-        ).order_by(ChatMessage.created_at.asc()).limit(50).all()
+        # Latest page of chat history; older pages come from /api/chat/<id>/messages
+        messages, next_cursor = chat_history(user_id, other_user_id)
         
         # Mark messages as read
         ChatMessage.query.filter_by(
@@ -87,15 +113,19 @@ def handle_join_chat(data):
         ).update({'is_read': True})
         db.session.commit()
         
-        emit('chat_history', {
-            'messages': [msg.to_dict() for msg in messages],
-            'room': room_name
+        reply('chat_history', {
+            'messages': messages,
+            'room': room_name,
+            'next_cursor': next_cursor
         })
         
     except Exception as e:
-        emit('error', {'message': 'Failed to join chat'})
+        reply('error', {'message': 'Failed to join chat'})
 
 @socketio.on('send_message')
+@timed_event
+@rate_limited(2)
+@query_budget(7)
 def handle_send_message(data):
     try:
         token = data.get('token')
@@ -104,7 +134,7 @@ def handle_send_message(data):
         message_type = data.get('message_type', 'text')
         
         if not all([token, receiver_id, message_text]):
-            emit('error', {'message': 'Token, receiver_id, and message required'})
+            reply('error', {'message': 'Token, receiver_id, and message required'})
             return
         
         decoded_token = decode_token(token)
@@ -119,29 +149,41 @@ def handle_send_message(data):
         )
         
         db.session.add(message)
+        db.session.flush()
+        message_data = message.to_dict()
+        packed_message = wire_format.Packed(message_data, 'message')
+        notification = {
+            'type': 'new_message',
+            'title': 'New Message',
+            'message': f'You have a new message from {message.sender.first_name}',
+            'data': message_data
+        }
+        
+        # An offline receiver gets it when they next connect
+        receiver_online = presence.is_online(receiver_id)
+        if not receiver_online:
+            delivery.queue(receiver_id, 'notification', notification)
         db.session.commit()
         
         # Create chat room name
         room_name = f"chat_{min(sender_id, receiver_id)}_{max(sender_id, receiver_id)}"
         
-        # Send message to chat room
-        emit('new_message', {
-            'message': message.to_dict()
-        }, room=room_name)
+        # Send message to chat room; msgpack clients get it encoded once for both events
+        wire_format.send('new_message', {
+            'message': packed_message
+        }, to=room_name)
+        typing_state.clear(room_name, sender_id)
         
         # Send push notification to receiver if they're online
-        if receiver_id in active_users:
-            emit('notification', {
-                'type': 'new_message',
-                'title': 'New Message',
-                'message': f'You have a new message from {message.sender.first_name}',
-                'data': message.to_dict()
-            }, room=receiver_id)
+        if receiver_online:
+            wire_format.send('notification', dict(notification, data=packed_message), to=receiver_id)
         
     except Exception as e:
-        emit('error', {'message': 'Failed to send message'})
+        reply('error', {'message': 'Failed to send message'})
 
 @socketio.on('typing')
+@timed_event
+@rate_limited(0.5)
 def handle_typing(data):
     try:
         token = data.get('token')
@@ -157,64 +199,61 @@ def handle_typing(data):
         # Create chat room name
         room_name = f"chat_{min(user_id, other_user_id)}_{max(user_id, other_user_id)}"
         
-        # Send typing indicator to the other user
-        emit('typing_indicator', {
-            'user_id': user_id,
-            'is_typing': is_typing
-        }, room=room_name, include_self=False)
+        # Only state changes reach the other user (see typing_state)
+        typing_state.update(room_name, user_id, request.sid, bool(is_typing))
         
     except Exception as e:
         pass
 
+def load_presence_entries(user_ids):
+    rows = db.session.execute(
+        db.select(User.id, User.first_name, User.last_name, User.role, User.department, User.profile_image)
+        .where(User.id.in_(user_ids), User.is_active == True)
+    )
+    return {
+        row.id: {
+            'id': row.id,
+            'name': f"{row.first_name} {row.last_name}",
+            'role': row.role,
+            'department': row.department,
+            'profile_image': row.profile_image
+        } for row in rows
+    }
+
+# Names and pictures shown in the sidebar follow profile changes
+on_invalidate(presence.forget_entries)
+
 @socketio.on('get_online_users')
+@timed_event
+@rate_limited(2)
+@query_budget(2)
 def handle_get_online_users(data):
     try:
         token = data.get('token')
         
         if not token:
-            emit('error', {'message': 'Token required'})
+            reply('error', {'message': 'Token required'})
             return
         
         decoded_token = decode_token(token)
-        user_id = decoded_token['sub']
-        user = User.query.get(user_id)
-        
-        # Get users from same department
-        if user.role == 'student':
-            # Get alumni from same department
-            relevant_users = User.query.filter_by(
-                role='alumni',
-                department=user.department,
-                is_active=True
-            ).all()
-        elif user.role == 'alumni':
-            # Get students from same department
-            relevant_users = User.query.filter_by(
-                role='student',
-                department=user.department,
-                is_active=True
-            ).all()
+        user = Principal.from_claims(decoded_token)
+        
+        # Students see online alumni of their department, alumni see students
+        watched_role = presence.WATCHES.get(user.role)
+        if watched_role:
+            online_users = presence.online_entries(user.department, watched_role, load_presence_entries)
         else:
-            relevant_users = []
-        
-        # Check which users are online
-        online_users = []
-        for relevant_user in relevant_users:
-            if relevant_user.id in active_users:
-                online_users.append({
-                    'id': relevant_user.id,
-                    'name': f"{relevant_user.first_name} {relevant_user.last_name}",
-                    'role': relevant_user.role,
-                    'department': relevant_user.department,
-                    'profile_image': relevant_user.profile_image
-                })
-        
-        emit('online_users', {'users': online_users})
+            online_users = []
+        
+        reply('online_users', {'users': online_users})
         
     except Exception as e:
-        emit('error', {'message': 'Failed to get online users'})
+        reply('error', {'message': 'Failed to get online users'})
 
 @socketio.on('mark_messages_read')
+@timed_event
+@rate_limited(1)
+@query_budget(3)
 def handle_mark_messages_read(data):
     try:
         token = data.get('token')
@@ -235,16 +274,18 @@ def handle_mark_messages_read(data):
         db.session.commit()
         
         # Notify sender that messages were read
-        if sender_id in active_users:
-            emit('messages_read', {
+        if presence.is_online(sender_id):
+            wire_format.send('messages_read', {
                 'reader_id': receiver_id
-            }, room=sender_id)
+            }, to=sender_id)
         
     except Exception as e:
         pass
 
 # Job notification events
 @socketio.on('subscribe_to_job_notifications')
+@timed_event
+@rate_limited(1)
 def handle_subscribe_job_notifications(data):
     try:
         token = data.get('token')
@@ -264,7 +305,7 @@ def handle_subscribe_job_notifications(data):
 # Global notification function (can be called from routes)
 def send_real_time_notification(user_id, notification_data):
     try:
-        if user_id in active_users:
-            socketio.emit('notification', notification_data, room=user_id)
+        # Sent by the outbox dispatcher once the caller's transaction commits
+        outbox.publish(user_id, 'notification', notification_data)
     except Exception as e:
         pass
\ No newline at end of file
@@ -14,10 +14,12 @@ class FutureMeshAuth {
             CONFIG.APP_STATE.isAuthenticated = true;
             CONFIG.APP_STATE.currentUser = userData;
             
-            // Verify token is still valid
-            this.verifyToken().catch(() => {
-                this.logout();
-            });
+            // Verify token is still valid; the dashboard's bootstrap request does it there
+            if (!window.DASHBOARD_BOOTSTRAP) {
+                this.verifyToken().catch(() => {
+                    this.logout();
+                });
+            }
         } else {
             this.logout();
         }
@@ -271,6 +273,11 @@ class FutureMeshAuth {
             
             const data = await response.json();
             
+            // Department changes come with a token carrying the new claims
+            if (data.access_token) {
+                this.setAuthToken(data.access_token);
+            }
+            
             // Update stored user data
             this.setUserData(data.user);
             CONFIG.APP_STATE.currentUser = data.user;
@@ -27,9 +27,11 @@ const CONFIG = {
         // Notifications
         NOTIFICATIONS: '/api/notifications',
         MARK_NOTIFICATION_READ: '/api/notifications/{id}/read',
+        MARK_NOTIFICATIONS_READ: '/api/notifications/read',
         
         // Dashboard
         DASHBOARD_STATS: '/api/dashboard/stats',
+        DASHBOARD_BOOTSTRAP: '/api/dashboard/bootstrap',
         
         // File Upload
         UPLOAD: '/api/upload'
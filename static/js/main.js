@@ -149,8 +149,36 @@ class FutureMeshApp {
     }
     
     static initializeNotifications() {
-        this.loadNotifications();
+        // The dashboard gets its first page of notifications from its bootstrap request
+        if (!window.DASHBOARD_BOOTSTRAP) {
+            this.loadNotifications();
+        }
         this.setupNotificationPolling();
+        
+        // The server pushes the unread count whenever it changes
+        const socket = CONFIG.APP_STATE.socket;
+        if (socket) {
+            socket.on('unread_count', data => this.updateUnreadBadge(data.unread_count));
+
+            // Delivery is at least once: an event may arrive twice, with the same id.
+            // Chat notifications carry the id of their message instead.
+            const seen = new Set();
+            const dispatch = (event, data) => {
+                const id = data && (data.type === 'new_message' && data.data ? data.data.id : data.id);
+                if (id) {
+                    if (seen.has(id)) return;
+                    seen.add(id);
+                }
+                document.dispatchEvent(new CustomEvent(`futuremesh:${event}`, { detail: data }));
+            };
+            socket.on('notification', data => dispatch('notification', data));
+
+            // Events missed while offline arrive in acknowledged batches on connect
+            socket.on('pending_deliveries', (batch, ack) => {
+                batch.items.forEach(item => dispatch(item.event, item.data));
+                if (ack) ack();
+            });
+        }
     }
     
     static async loadNotifications() {
@@ -163,23 +191,28 @@ class FutureMeshApp {
             
             if (response.ok) {
                 const data = await response.json();
-                this.updateNotificationUI(data.notifications);
+                this.updateNotificationUI(data.notifications, data.unread_count);
             }
         } catch (error) {
             console.error('Failed to load notifications:', error);
         }
     }
     
-    static updateNotificationUI(notifications) {
+    static updateUnreadBadge(unreadCount) {
         const badge = document.getElementById('notificationBadge');
+        if (!badge) return;
+        
+        badge.textContent = unreadCount;
+        badge.style.display = unreadCount > 0 ? 'block' : 'none';
+    }
+    
+    static updateNotificationUI(notifications, unreadCount) {
         const list = document.getElementById('notificationList');
         
-        if (!badge || !list) return;
+        if (!list) return;
         
         // Update badge count
-        const unreadCount = notifications.filter(n => !n.is_read).length;
-        badge.textContent = unreadCount;
-        badge.style.display = unreadCount > 0 ? 'block' : 'none';
+        this.updateUnreadBadge(unreadCount ?? notifications.filter(n => !n.is_read).length);
         
         // Update notification list
         if (notifications.length === 0) {
@@ -482,20 +515,16 @@ window.handleNotificationClick = async (notificationId, actionUrl) => {
 
 window.markAllNotificationsRead = async () => {
     try {
-        const notifications = document.querySelectorAll('.notification-item.unread');
-        
-        for (const notification of notifications) {
-            const notificationId = notification.dataset.notificationId;
-            if (notificationId) {
-                await FutureMeshAuth.authenticatedFetch(
-                    CONFIG.getEndpoint('MARK_NOTIFICATION_READ', { id: notificationId }),
-                    { method: 'POST' }
-                );
-            }
-        }
+        const response = await FutureMeshAuth.authenticatedFetch(
+            CONFIG.getEndpoint('MARK_NOTIFICATIONS_READ'),
+            { method: 'POST', body: JSON.stringify({ all: true }) }
+        );
+        if (!response.ok) throw new Error('Mark all read failed');
         
-        // Reload notifications
-        FutureMeshApp.loadNotifications();
+        const data = await response.json();
+        FutureMeshApp.updateUnreadBadge(data.unread_count);
+        document.querySelectorAll('.notification-item.unread')
+            .forEach(notification => notification.classList.remove('unread'));
         showToast('All notifications marked as read', 'success');
         
     } catch (error) {
@@ -0,0 +1,55 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from extensions import db, socketio  # noqa: E402
+from models import User  # noqa: E402
+from principal import issue_token  # noqa: E402
+
+ROLES = ('student', 'alumni', 'hod', 'hr', 'admin')
+
+
+@pytest.fixture(scope='module')
+def app():
+    """An application on a fresh in-memory database, failing any request over its query budget"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'QUERY_BUDGET_MODE': 'raise', 'TESTING': True,
+        'SOCKETIO_ASYNC_MODE': 'threading', 'PRINCIPAL_CACHE_TTL': 0
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='module')
+def users(app):
+    """One user id per role, all in the CSE department"""
+    with app.app_context():
+        created = {role: User(email=f'{role}@test.futuremesh.com', password_hash='-', first_name=role.title(),
+                              last_name='Test', role=role, department='CSE', cgpa=8.0, graduation_year=2026)
+                   for role in ROLES}
+        db.session.add_all(created.values())
+        db.session.commit()
+        return {role: user.id for role, user in created.items()}
+
+
+@pytest.fixture(scope='module')
+def tokens(app, users):
+    with app.app_context():
+        return {role: issue_token(db.session.get(User, user_id)) for role, user_id in users.items()}
+
+
+@pytest.fixture(scope='module')
+def sockets(app, tokens):
+    """A connected Socket.IO client per role, so every user is online"""
+    clients = {role: socketio.test_client(app, auth={'token': token}) for role, token in tokens.items()}
+    yield clients
+    for client in clients.values():
+        if client.is_connected():
+            client.disconnect()
@@ -0,0 +1,67 @@
+"""The funnel rollup counts events whose transactions commit after it has passed their ids."""
+from datetime import datetime, timedelta
+import pytest
+from analytics import roll_up
+from extensions import db
+from models import ApplicationEvent, FunnelRollup, Job, JobApplication, RollupGap
+
+
+@pytest.fixture
+def application(app, users):
+    with app.app_context():
+        job = Job(title='Engineer', company='Acme', department='CSE', description='Build things',
+                  posted_by=users['hr'], status='approved')
+        db.session.add(job)
+        db.session.flush()
+        application = JobApplication(job_id=job.id, student_id=users['student'])
+        db.session.add(application)
+        db.session.commit()
+        return application.id, job.id
+
+
+def record(application, event_id=None):
+    application_id, job_id = application
+    db.session.add(ApplicationEvent(id=event_id, application_id=application_id, job_id=job_id,
+                                    department='CSE', company='Acme', to_status='applied'))
+    db.session.commit()
+
+
+def applied(application):
+    return db.session.execute(
+        db.select(FunnelRollup.count).filter_by(job_id=application[1], status='applied')
+    ).scalar_one_or_none()
+
+
+def skip_id(application):
+    """Record three events, then roll back the middle one as if its transaction were still open"""
+    for _ in range(3):
+        record(application)
+    ids = db.session.execute(db.select(ApplicationEvent.id).order_by(ApplicationEvent.id.desc()).limit(2)).scalars()
+    _, late = ids.all()
+    db.session.execute(db.delete(ApplicationEvent).where(ApplicationEvent.id == late))
+    db.session.commit()
+    return late
+
+
+def test_late_commit_is_folded(app, application):
+    with app.app_context():
+        roll_up()
+        late = skip_id(application)
+        roll_up()
+        assert applied(application) == 2
+        record(application, late)
+        assert roll_up() == 1
+        assert applied(application) == 3
+        assert db.session.get(RollupGap, ('funnel', late)) is None
+
+
+def test_expired_gap_is_forgotten(app, application):
+    with app.app_context():
+        roll_up()
+        late = skip_id(application)
+        roll_up()
+        gap = db.session.get(RollupGap, ('funnel', late))
+        gap.found_at = datetime.utcnow() - timedelta(seconds=app.config['ANALYTICS_GAP_SECONDS'] + 1)
+        db.session.commit()
+        roll_up()
+        assert db.session.get(RollupGap, ('funnel', late)) is None
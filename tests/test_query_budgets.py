@@ -0,0 +1,126 @@
+"""Hot routes and socket handlers stay within their declared ``@query_budget``.
+
+The app runs with ``QUERY_BUDGET_MODE=raise`` on a fresh database, so the
+first write to each table is covered, and every user is connected over
+Socket.IO, so notifications take the costlier path of pushing unread counts.
+"""
+from datetime import datetime, timedelta
+import pytest
+from extensions import db
+from models import ChatMessage, Job, JobApplication, MentorshipRequest, Notification
+from query_budget import assert_max_queries
+import socket_events
+
+covered = set()
+
+
+def call(app, method, path, token, json=None):
+    endpoint, _ = app.url_map.bind('localhost').match(path.split('?')[0], method=method)
+    budget = app.view_functions[endpoint].query_budget
+    covered.add(endpoint)
+    with assert_max_queries(budget):
+        response = app.test_client().open(path, method=method, json=json,
+                                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code in (200, 201), response.get_json()
+    return response
+
+
+def emit(client, handler, event, data):
+    with assert_max_queries(handler.query_budget):
+        client.emit(event, data)
+    errors = [packet['args'] for packet in client.get_received() if packet['name'] == 'error']
+    assert not errors, errors
+
+
+def add(app, row):
+    with app.app_context():
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+def open_job(app, users, **fields):
+    return add(app, Job(title='Engineer', company='Acme', department='CSE', description='Build things',
+                        posted_by=users['hr'], application_deadline=datetime.utcnow() + timedelta(days=30),
+                        **fields))
+
+
+@pytest.fixture(autouse=True)
+def online(sockets):
+    return sockets
+
+
+def test_create_job(app, tokens):
+    call(app, 'POST', '/api/jobs', tokens['hr'], json={
+        'title': 'Analyst', 'company': 'Acme', 'department': 'CSE', 'description': 'Numbers',
+        'application_deadline': '2099-01-01'
+    })
+
+
+def test_approve_job(app, users, tokens):
+    job_id = open_job(app, users)
+    call(app, 'POST', f'/api/jobs/{job_id}/approve', tokens['admin'])
+
+
+def test_apply_and_shortlist(app, users, tokens):
+    job_id = open_job(app, users, status='approved')
+    call(app, 'POST', f'/api/jobs/{job_id}/apply', tokens['student'], json={'cover_letter': 'Hello'})
+    with app.app_context():
+        application_id = db.session.execute(
+            db.select(JobApplication.id).filter_by(job_id=job_id)
+        ).scalar_one()
+    call(app, 'POST', f'/api/applications/{application_id}/shortlist', tokens['hod'])
+
+
+def test_request_and_respond_mentorship(app, users, tokens):
+    call(app, 'POST', '/api/mentorship-requests', tokens['student'],
+         json={'alumni_id': users['alumni'], 'message': 'Mentor me'})
+    with app.app_context():
+        request_id = db.session.execute(
+            db.select(MentorshipRequest.id).filter_by(student_id=users['student'])
+        ).scalar_one()
+    call(app, 'POST', f'/api/mentorship-requests/{request_id}/respond', tokens['alumni'],
+         json={'status': 'accepted', 'response_message': 'Sure'})
+
+
+def test_read_notifications(app, users, tokens):
+    notification_id = add(app, Notification(user_id=users['student'], title='Hi', message='Hello', type='system'))
+    call(app, 'POST', f'/api/notifications/{notification_id}/read', tokens['student'])
+    add(app, Notification(user_id=users['student'], title='Hi', message='Again', type='system'))
+    call(app, 'POST', '/api/notifications/read', tokens['student'], json={'all': True})
+
+
+@pytest.mark.parametrize('role', ['student', 'alumni', 'hod', 'hr', 'admin'])
+@pytest.mark.parametrize('path', [
+    '/api/profile', '/api/jobs', '/api/applications', '/api/mentorship-requests', '/api/notifications',
+    '/api/dashboard/stats', '/api/dashboard/bootstrap'
+])
+def test_reads(app, tokens, path, role):
+    call(app, 'GET', path, tokens[role])
+
+
+@pytest.mark.parametrize('role, path', [
+    ('hod', '/api/hod/applications?status=applied&sort=-cgpa'),
+    ('student', '/api/mentors/recommended'),
+    ('admin', '/api/analytics/funnel?group_by=company&interval=month'),
+])
+def test_role_reads(app, tokens, role, path):
+    call(app, 'GET', path, tokens[role])
+
+
+def test_chat(app, users, tokens, sockets):
+    add(app, ChatMessage(sender_id=users['alumni'], receiver_id=users['student'], message='Welcome'))
+    call(app, 'GET', f"/api/chat/{users['alumni']}/messages", tokens['student'])
+    student, alumni = sockets['student'], sockets['alumni']
+    emit(student, socket_events.handle_join_chat, 'join_chat',
+         {'token': tokens['student'], 'other_user_id': users['alumni']})
+    emit(student, socket_events.handle_send_message, 'send_message',
+         {'token': tokens['student'], 'receiver_id': users['alumni'], 'message': 'Thanks'})
+    emit(alumni, socket_events.handle_mark_messages_read, 'mark_messages_read',
+         {'token': tokens['alumni'], 'sender_id': users['student']})
+    emit(alumni, socket_events.handle_get_online_users, 'get_online_users', {'token': tokens['alumni']})
+
+
+def test_every_budgeted_route_is_exercised(app):
+    budgeted = {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+    assert budgeted <= covered, sorted(budgeted - covered)
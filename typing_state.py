@@ -0,0 +1,124 @@
+"""Server-side typing indicator state.
+
+Clients report ``typing`` on every keystroke; only changes of a user's state
+in a room are broadcast. A change arriving within ``TYPING_COALESCE_SECONDS``
+of the previous broadcast is held back and sent by the sweep once the window
+has passed (and dropped if the state flipped back meanwhile). A user who
+stops reporting is marked as not typing after ``TYPING_TIMEOUT_SECONDS``.
+"""
+import threading
+import time
+from flask import current_app
+from extensions import socketio
+import wire_format
+
+_lock = threading.Lock()
+_states = {}  # (room, user id) -> TypingState
+_sweeper_started = False
+
+
+class TypingState:
+    __slots__ = ('sid', 'emitted', 'emitted_at', 'pending', 'expires_at')
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.emitted = False
+        self.emitted_at = 0.0
+        self.pending = None
+        self.expires_at = 0.0
+
+
+def _transition(outbox, room, user_id, state, is_typing, now):
+    state.emitted = is_typing
+    state.emitted_at = now
+    state.pending = None
+    outbox.append((room, user_id, state.sid, is_typing))
+
+
+def _apply(outbox, room, user_id, state, is_typing, now, window):
+    if is_typing == state.emitted:
+        state.pending = None
+    elif now - state.emitted_at >= window:
+        _transition(outbox, room, user_id, state, is_typing, now)
+    else:
+        state.pending = is_typing
+
+
+def _send(outbox):
+    # Emit outside the lock: sending may yield to other green threads
+    for room, user_id, sid, is_typing in outbox:
+        wire_format.send('typing_indicator', {'user_id': user_id, 'is_typing': is_typing}, to=room, skip_sid=sid)
+
+
+def update(room, user_id, sid, is_typing):
+    """Record a typing report from ``user_id`` in ``room``"""
+    config = current_app.config
+    now = time.monotonic()
+    outbox = []
+    _ensure_sweeper()
+    with _lock:
+        state = _states.get((room, user_id))
+        if state is None:
+            if not is_typing:
+                return
+            state = _states[(room, user_id)] = TypingState(sid)
+        state.sid = sid
+        if is_typing:
+            state.expires_at = now + config['TYPING_TIMEOUT_SECONDS']
+        _apply(outbox, room, user_id, state, is_typing, now, config['TYPING_COALESCE_SECONDS'])
+    _send(outbox)
+
+
+def clear(room, user_id):
+    """The user sent a message: they are no longer typing, whatever the window"""
+    outbox = []
+    with _lock:
+        state = _states.pop((room, user_id), None)
+        if state is not None and state.emitted:
+            _transition(outbox, room, user_id, state, False, time.monotonic())
+    _send(outbox)
+
+
+def clear_sid(sid):
+    """Stop every typing state held by a disconnecting socket"""
+    now = time.monotonic()
+    outbox = []
+    with _lock:
+        for key in [key for key, state in _states.items() if state.sid == sid]:
+            state = _states.pop(key)
+            if state.emitted:
+                _transition(outbox, key[0], key[1], state, False, now)
+    _send(outbox)
+
+
+def sweep(window):
+    """Expire stale typing states and flush coalesced transitions"""
+    now = time.monotonic()
+    outbox = []
+    with _lock:
+        for key, state in list(_states.items()):
+            if state.emitted and now >= state.expires_at:
+                _apply(outbox, key[0], key[1], state, False, now, window)
+            if state.pending is not None and now - state.emitted_at >= window:
+                _transition(outbox, key[0], key[1], state, state.pending, now)
+            if not state.emitted and state.pending is None:
+                del _states[key]
+    _send(outbox)
+
+
+def _sweeper(interval, window):
+    while True:
+        socketio.sleep(interval)
+        sweep(window)
+
+
+def _ensure_sweeper():
+    global _sweeper_started
+    if _sweeper_started:
+        return
+    with _lock:
+        if _sweeper_started:
+            return
+        _sweeper_started = True
+    config = current_app.config
+    socketio.start_background_task(_sweeper, config['TYPING_SWEEP_INTERVAL'], config['TYPING_COALESCE_SECONDS'])
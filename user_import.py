@@ -0,0 +1,225 @@
+"""Bulk import of student and alumni accounts from CSV or XLSX.
+
+Rows are read as a stream and handled in chunks of ``IMPORT_CHUNK_SIZE``:
+each chunk is validated, checked for existing emails (in any letter case)
+with one query, has its initial passwords hashed on a process pool and is
+inserted with one bulk INSERT and committed. Rows that fail are reported by
+row number and never stop the rest of the file.
+
+    flask import-users cohort.xlsx --role student --report errors.csv
+
+The upload endpoint never forks a pool inside the web server: it takes
+files of up to ``IMPORT_HTTP_MAX_ROWS`` rows and hashes them in the request,
+as registration does. Larger files go through the command.
+"""
+import csv
+import io
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice, repeat
+import bcrypt as bcrypt_backend
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import User
+from mentor_recommendations import request_refreshes
+from notifications import start_counters
+
+IMPORT_ROLES = ('student', 'alumni')
+REQUIRED_FIELDS = ('email', 'first_name', 'last_name', 'password')
+TEXT_FIELDS = ('department', 'phone', 'student_id', 'company', 'designation', 'current_company',
+               'current_designation', 'linkedin_url', 'github_url', 'bio')
+NUMBER_FIELDS = {'cgpa': float, 'graduation_year': int, 'experience_years': int}
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def _hash_password(password, rounds):
+    # Runs in a pool process: plain bcrypt, same format as Flask-Bcrypt
+    return bcrypt_backend.hashpw(password.encode('utf-8'), bcrypt_backend.gensalt(rounds)).decode('utf-8')
+
+
+def _header(name):
+    return str(name or '').strip().lower().replace(' ', '_')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Spreadsheet numbers such as student ids and phone numbers
+    return str(value).strip()
+
+
+def read_rows(stream, filename):
+    """Yield ``(row number, {column: text})`` from a CSV or XLSX upload, header row excluded"""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_header(name) for name in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield number, {name: _text(value) for name, value in zip(header, values) if name}
+        finally:
+            workbook.close()
+    elif filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = [_header(name) for name in next(reader, ())]
+        for number, values in enumerate(reader, start=2):
+            if any(value.strip() for value in values):
+                yield number, {name: value.strip() for name, value in zip(header, values) if name}
+        text.detach()
+    else:
+        raise ValueError('Upload a .csv or .xlsx file')
+
+
+def validate_row(row, default_role=None):
+    """Return ``(user values, None)`` for a valid row, or ``(None, error message)``"""
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return None, f'{field} is required'
+    role = (row.get('role') or default_role or '').lower()
+    if role not in IMPORT_ROLES:
+        return None, f'role must be one of {", ".join(IMPORT_ROLES)}'
+    if not EMAIL_PATTERN.match(row['email']):
+        return None, 'email is not a valid address'
+
+    values = {'email': row['email'], 'first_name': row['first_name'], 'last_name': row['last_name'], 'role': role}
+    for field in TEXT_FIELDS:
+        if row.get(field):
+            values[field] = row[field]
+    for field, convert in NUMBER_FIELDS.items():
+        if row.get(field):
+            try:
+                values[field] = convert(float(row[field])) if convert is int else convert(row[field])
+            except ValueError:
+                return None, f'{field} must be a number'
+
+    columns = User.__table__.c
+    for field, value in values.items():
+        length = getattr(columns[field].type, 'length', None)
+        if length and isinstance(value, str) and len(value) > length:
+            return None, f'{field} is longer than {length} characters'
+    return values, None
+
+
+def _existing_emails(emails):
+    """The lowercased ``emails`` already registered, whatever their case in the database"""
+    lowered = func.lower(User.email)
+    return set(db.session.execute(
+        db.select(lowered).where(lowered.in_([email.lower() for email in emails]))
+    ).scalars())
+
+
+def _insert_users(mappings):
+    db.session.execute(db.insert(User), mappings)
+    connection = db.session.connection()
+    start_counters(connection, [mapping['id'] for mapping in mappings])
+    # New students get recommendations at the next refresh, as registered ones do
+    request_refreshes(connection, 'student', [mapping['id'] for mapping in mappings if mapping['role'] == 'student'])
+
+
+def import_users(rows, default_role=None, chunk_size=None, workers=None):
+    """Create accounts from ``(row number, row)`` pairs; return ``{'rows', 'created', 'errors'}``.
+
+    ``errors`` lists ``{'row', 'email', 'error'}`` for every row not imported.
+    With ``workers=1`` passwords are hashed in this process, without a pool.
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config['IMPORT_CHUNK_SIZE']
+    workers = workers or config['IMPORT_HASH_WORKERS'] or os.cpu_count()
+    rounds = config.get('BCRYPT_LOG_ROUNDS', 12)
+    report = {'rows': 0, 'created': 0, 'errors': []}
+    seen = set()
+    rows = iter(rows)
+
+    def reject(number, row, error):
+        report['errors'].append({'row': number, 'email': row.get('email'), 'error': error})
+
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                report['errors'].sort(key=lambda error: error['row'])
+                return report
+            report['rows'] += len(chunk)
+
+            valid = []
+            for number, row in chunk:
+                values, error = validate_row(row, default_role)
+                if error:
+                    reject(number, row, error)
+                elif values['email'].lower() in seen:
+                    reject(number, row, 'email appears earlier in the file')
+                else:
+                    seen.add(values['email'].lower())
+                    valid.append((number, row, values))
+            if not valid:
+                continue
+
+            existing = _existing_emails([values['email'] for _, _, values in valid])
+            accepted = []
+            for number, row, values in valid:
+                if values['email'].lower() in existing:
+                    reject(number, row, 'email already registered')
+                else:
+                    accepted.append((number, row, values))
+            if not accepted:
+                continue
+
+            passwords = [row['password'] for _, row, _ in accepted]
+            if pool is None:
+                hashes = map(_hash_password, passwords, repeat(rounds))
+            else:
+                hashes = pool.map(_hash_password, passwords, repeat(rounds),
+                                  chunksize=max(1, len(passwords) // (workers * 4)))
+            mappings = [dict(values, id=str(uuid.uuid4()), password_hash=password_hash)
+                        for (_, _, values), password_hash in zip(accepted, hashes)]
+            try:
+                _insert_users(mappings)
+                db.session.commit()
+            except IntegrityError:
+                # Registered concurrently since the check: drop those rows and retry once
+                db.session.rollback()
+                existing = _existing_emails([mapping['email'] for mapping in mappings])
+                retry = []
+                for (number, row, _), mapping in zip(accepted, mappings):
+                    if mapping['email'].lower() in existing:
+                        reject(number, row, 'email already registered')
+                    else:
+                        retry.append(mapping)
+                if retry:
+                    _insert_users(retry)
+                    db.session.commit()
+                mappings = retry
+            report['created'] += len(mappings)
+
+
+@click.command('import-users')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--role', type=click.Choice(IMPORT_ROLES), help='Role of rows without a role column.')
+@click.option('--chunk-size', type=int, help='Rows validated and inserted per transaction.')
+@click.option('--workers', type=int, help='Password hashing processes (default: CPU count).')
+@click.option('--report', type=click.Path(dir_okay=False), help='Write rejected rows to this CSV file.')
+@with_appcontext
+def import_users_command(path, role, chunk_size, workers, report):
+    """Create student or alumni accounts from a CSV or XLSX file."""
+    with open(path, 'rb') as stream:
+        result = import_users(read_rows(stream, path), role, chunk_size, workers)
+    click.echo(f"{result['created']} of {result['rows']} rows imported, {len(result['errors'])} rejected")
+    if report:
+        with open(report, 'w', newline='') as output:
+            writer = csv.DictWriter(output, fieldnames=('row', 'email', 'error'))
+            writer.writeheader()
+            writer.writerows(result['errors'])
+    else:
+        for error in result['errors']:
+            click.echo(f"row {error['row']}: {error['error']} ({error['email']})")
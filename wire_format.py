@@ -0,0 +1,208 @@
+"""Per-client wire format of the Socket.IO events the server sends.
+
+A client picks its format when it connects (``auth: {token, format}``):
+
+- ``json`` (the default) gets every event as before.
+- ``msgpack`` gets each event's data as one msgpack-encoded binary argument,
+  laid out in the compact schemas of ``COMPACT``. Unset fields are dropped.
+  A message leaves out ``is_read`` when false and ``message_type`` when
+  ``'text'``, and its ``created_at`` is in epoch milliseconds. Typing,
+  presence, read receipts and unread counts shrink to bare values.
+
+A server without msgpack installed, or with it left out of
+``SOCKET_WIRE_FORMATS``, answers every client in JSON. Clients tell the
+formats apart by the argument type: binary data is msgpack.
+
+Each socket joins the variant of a room for its own format
+(``<room>~msgpack`` for msgpack sockets), so :func:`send` emits once per
+format. python-socketio encodes a room emit once for all its members, and
+:class:`Packed` values are encoded once however many events carry them. A
+format with no socket in a room is not encoded at all.
+
+Which format each socket uses is tracked per process, like presence. With
+a message queue, a room's members may be in other processes, so both
+variants of a room are always sent.
+"""
+import threading
+from datetime import datetime, timezone
+from flask import current_app, request
+from flask_socketio import join_room as _join_room, leave_room as _leave_room
+from socketio import PubSubManager
+from extensions import socketio
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, every client then gets JSON
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+
+_lock = threading.Lock()
+_formats = {}  # sid -> format, for sockets not using JSON
+
+
+class Packed:
+    """A value carried by several events: msgpack-encoded at most once, in the ``schema`` of ``COMPACT``"""
+    __slots__ = ('value', 'schema', '_encoded')
+
+    def __init__(self, value, schema):
+        self.value = value
+        self.schema = schema
+        self._encoded = None
+
+    def encoded(self):
+        if self._encoded is None:
+            self._encoded = msgpack.packb(COMPACT[self.schema](self.value))
+        return self._encoded
+
+
+def _epoch_ms(iso):
+    return int(datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp() * 1000) if iso else None
+
+
+def _without_unset(data):
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def _message(message):
+    compact = _without_unset(message)
+    if not compact.get('is_read'):
+        compact.pop('is_read', None)
+    if compact.get('message_type') == 'text':
+        del compact['message_type']
+    if 'created_at' in compact:
+        compact['created_at'] = _epoch_ms(compact['created_at'])
+    return compact
+
+
+def _messages(data):
+    compact = _without_unset(data)
+    compact['messages'] = [_message(message) for message in data['messages']]
+    return compact
+
+
+def _notification(notification):
+    compact = _without_unset(notification)
+    if isinstance(compact.get('data'), dict) and notification.get('type') == 'new_message':
+        compact['data'] = _message(compact['data'])
+    return compact
+
+
+def _pending_deliveries(batch):
+    return {
+        'items': [{
+            'id': item['id'],
+            'event': item['event'],
+            'data': COMPACT[item['event']](item['data']) if item['event'] in COMPACT else item['data'],
+            'created_at': _epoch_ms(item['created_at'])
+        } for item in batch['items']],
+        'more': batch['more']
+    }
+
+
+# Event (or Packed schema) -> function turning its JSON data into the msgpack layout
+COMPACT = {
+    'message': _message,
+    'new_message': lambda data: data['message'],
+    'chat_history': _messages,
+    'notification': _notification,
+    'typing_indicator': lambda data: [data['user_id'], data['is_typing']],
+    'user_online': lambda data: data['user_id'],
+    'user_offline': lambda data: data['user_id'],
+    'messages_read': lambda data: data['reader_id'],
+    'unread_count': lambda data: data['unread_count'],
+    'online_users': lambda data: [_without_unset(entry) for entry in data['users']],
+    'pending_deliveries': _pending_deliveries,
+    'error': lambda data: data['message'],
+}
+
+
+def plain(data):
+    """``data`` with its :class:`Packed` values unwrapped, as JSON clients and storage take it"""
+    if isinstance(data, Packed):
+        return data.value
+    if isinstance(data, dict):
+        return {key: value.value if isinstance(value, Packed) else value for key, value in data.items()}
+    return data
+
+
+def _pack(event, data):
+    if event in COMPACT:
+        data = COMPACT[event](data)
+    if isinstance(data, Packed):
+        return data.encoded()
+    if isinstance(data, dict) and any(isinstance(value, Packed) for value in data.values()):
+        # Splice already encoded values into the map instead of encoding them again
+        packer = msgpack.Packer()
+        parts = [packer.pack_map_header(len(data))]
+        for key, value in data.items():
+            parts.append(packer.pack(key))
+            parts.append(value.encoded() if isinstance(value, Packed) else packer.pack(value))
+        return b''.join(parts)
+    return msgpack.packb(data)
+
+
+def negotiate(sid, auth):
+    """Record the format socket ``sid`` asked for in its connect ``auth``; return the one it gets"""
+    requested = (auth or {}).get('format', JSON)
+    if requested == MSGPACK and msgpack is not None and MSGPACK in current_app.config['SOCKET_WIRE_FORMATS']:
+        with _lock:
+            _formats[sid] = MSGPACK
+        return MSGPACK
+    return JSON
+
+
+def format_of(sid):
+    return _formats.get(sid, JSON)
+
+
+def forget(sid):
+    with _lock:
+        _formats.pop(sid, None)
+
+
+def room_for(room, wire_format):
+    return room if wire_format == JSON else f'{room}~{wire_format}'
+
+
+def join_room(room, sid=None):
+    """Put the current socket (or ``sid``) in the variant of ``room`` for its format"""
+    sid = sid or request.sid
+    _join_room(room_for(room, format_of(sid)), sid=sid)
+
+
+def leave_room(room, sid=None):
+    sid = sid or request.sid
+    _leave_room(room_for(room, format_of(sid)), sid=sid)
+
+
+def _shared():
+    """Whether rooms span processes (a message queue is configured)"""
+    return isinstance(socketio.server.manager, PubSubManager)
+
+
+def _has_members(room):
+    if _shared():
+        # Other processes may have members: always send
+        return True
+    return bool(socketio.server.manager.rooms.get('/', {}).get(room))
+
+
+def send(event, data, to, skip_sid=None, callback=None):
+    """Emit ``event`` to a room or a socket id, in the format of each receiving socket"""
+    with _lock:
+        sid_format = _formats.get(to)
+    if sid_format is not None:
+        socketio.emit(event, _pack(event, data), to=to, skip_sid=skip_sid, callback=callback)
+        return
+    # Without a message queue, a process knows every socket that could be in the msgpack room
+    if msgpack is not None and (_formats or _shared()) and _has_members(room_for(to, MSGPACK)):
+        socketio.emit(event, _pack(event, data), to=room_for(to, MSGPACK), skip_sid=skip_sid, callback=callback)
+    if _has_members(to):
+        socketio.emit(event, plain(data), to=to, skip_sid=skip_sid, callback=callback)
+
+
+def reply(event, data):
+    """Emit ``event`` to the socket whose event is being handled"""
+    send(event, data, to=request.sid)